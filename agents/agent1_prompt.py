@@ -1,13 +1,42 @@
+import json
+import os
 from typing import Optional
+from config import Config
 from data_models import UserInput, EngineeredPrompt
 from api_client import OpenRouterClient
-from agents.base_agent import BaseAgent
+from agents.base_agent import BaseAgent, CancelScope
+
+
+# Agent 1 ends its prompt with this line; everything after it is dropped
+# and the stream is closed so Agent 2 can start right away.
+PROMPT_END_MARKER = "<<END_OF_PROMPT>>"
+
+
+PROMPT_ENGINEERING_INSTRUCTIONS = (
+    "Given the research goal and constraints provided by the user, generate an optimized, detailed prompt "
+    "that will guide another advanced AI agent to produce high-quality research content.\n\n"
+    "IMPORTANT:\n"
+    "1. All math formulas in the research content must use LaTeX syntax.\n"
+    "   - Inline math: $...$\n"
+    "   - Display math: $$...$$\n"
+    "2. Do not convert formulas to Unicode symbols.\n"
+    "3. Ensure the output is clean, Markdown-ready, and ready to render in PDFs.\n"
+    "4. Provide detailed explanations, equations, and properly formatted LaTeX where applicable.\n\n"
+    "The prompt you create should guide an AI to produce a final output that can be directly converted "
+    "to PDF with proper LaTeX rendering.\n\n"
+    f"Output only the prompt itself, then finish with a line containing exactly {PROMPT_END_MARKER}"
+)
+
 
 class PromptEngineeringAgent(BaseAgent):
     """
     Agent 1: Generates an optimized prompt for Agent 2 using an LLM
     """
 
+    inputs = ("user_input",)
+    optional_inputs = ("cancel_scope",)
+    outputs = ("engineered_prompt",)
+
     def __init__(self,  api_client: OpenRouterClient):
         """
         Args:
@@ -16,33 +45,44 @@ class PromptEngineeringAgent(BaseAgent):
         super().__init__(name="PromptEngineeringAgent")
         self.api_client = api_client
 
-    def generate_prompt(self, user_input: UserInput) -> Optional[EngineeredPrompt]:
+    def generate_prompt(self, user_input: UserInput,
+                        cancel_scope: Optional[CancelScope] = None) -> Optional[EngineeredPrompt]:
         """
         Use LLM to engineer the best prompt for the research task
+        
+        Args:
+            user_input: UserInput for the request
+            cancel_scope: Stops the stream when cancelled (e.g. on a DAG timeout)
         """
-        # Create an instruction for the LLM about what type of prompt we want.
-        system_instruction = (
-            "Given the research goal and constraints below, generate an optimized, detailed prompt "
-            "that will guide another advanced AI agent to produce high-quality research content.\n"
+        # Fixed instructions go first (system role) so providers can reuse
+        # the cached prefix; only the request-specific fields vary.
+        request_details = (
             f"Paper Format: {user_input.paper_format}\n"
             f"Writing Style: {user_input.writing_style}\n"
             f"Length: {user_input.length}\n"
-            f"Topic or Query: {user_input.topic}\n\n"
-            "IMPORTANT:\n"
-            "1. All math formulas in the research content must use LaTeX syntax.\n"
-            "   - Inline math: $...$\n"
-            "   - Display math: $$...$$\n"
-            "2. Do not convert formulas to Unicode symbols.\n"
-            "3. Ensure the output is clean, Markdown-ready, and ready to render in PDFs.\n"
-            "4. Provide detailed explanations, equations, and properly formatted LaTeX where applicable.\n\n"
-            "The prompt you create should guide an AI to produce a final output that can be directly converted "
-            "to PDF with proper LaTeX rendering."
+            f"Topic or Query: {user_input.topic}"
         )
 
-
         try:    
-            prompt_response = self.api_client.generate_completion(system_instruction)
-            if not prompt_response:
+            stream = self.api_client.stream_completion(
+                request_details,
+                system_prompt=PROMPT_ENGINEERING_INSTRUCTIONS
+            )
+            if not stream:
+                return None
+            if cancel_scope is not None:
+                cancel_scope.on_cancel(stream.cancel)
+            
+            # Stop reading as soon as the prompt is complete
+            tail = ""
+            for chunk in stream:
+                tail = tail[-len(PROMPT_END_MARKER):] + chunk
+                if PROMPT_END_MARKER in tail:
+                    stream.cancel()
+                    break
+            
+            prompt_text = stream.text.split(PROMPT_END_MARKER, 1)[0].strip()
+            if not prompt_text or (cancel_scope is not None and cancel_scope.cancelled):
                 return None
             
             metadata = {
@@ -54,15 +94,52 @@ class PromptEngineeringAgent(BaseAgent):
 
             return EngineeredPrompt(
                 original_topic=user_input.topic,
-                formatted_prompt=str(prompt_response),
+                formatted_prompt=prompt_text,
                 metadata=metadata
             )
         except Exception as e:
             print(f"Error generating engineered prompt: {str(e)}")
             return None
 
-    def run(self, user_input: UserInput) -> Optional[EngineeredPrompt]:
+    def template_prompt(self, user_input: UserInput) -> EngineeredPrompt:
+        """
+        Build a prompt from the static template, without calling the LLM
+        
+        Uses template.json when present, otherwise the built-in template.
+        
+        Args:
+            user_input: User input
+            
+        Returns:
+            EngineeredPrompt filled from the template
+        """
+        template = Config.FALLBACK_PROMPT_TEMPLATE
+        if os.path.exists(Config.TEMPLATE_PATH):
+            try:
+                with open(Config.TEMPLATE_PATH, encoding="utf-8") as f:
+                    template = json.load(f)["template"]
+            except Exception as e:
+                print(f"Template Load Error: {str(e)}")
+        
+        return EngineeredPrompt(
+            original_topic=user_input.topic,
+            formatted_prompt=template.format(
+                paper_input=user_input.paper_format,
+                style_input=user_input.writing_style,
+                length_input=user_input.length,
+                user_input=user_input.topic
+            ),
+            metadata={
+                'paper_format': user_input.paper_format,
+                'writing_style': user_input.writing_style,
+                'length': user_input.length,
+                'original_topic': user_input.topic
+            }
+        )
+
+    def run(self, user_input: UserInput,
+            cancel_scope: Optional[CancelScope] = None) -> Optional[EngineeredPrompt]:
         """
         Run the prompt generation process with an LLM
         """
-        return self.generate_prompt(user_input)
+        return self.generate_prompt(user_input, cancel_scope)
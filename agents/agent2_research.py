@@ -3,11 +3,214 @@ Agent 2: Research Generator Agent
 Responsibility: Generate research content from engineered prompts
 """
 
-from typing import Optional
-from api_client import OpenRouterClient
-from data_models import EngineeredPrompt
+import difflib
+import re
+import threading
+import time
+from dataclasses import replace
+from typing import Callable, List, Optional, Tuple
+from api_client import CompletionStream, OpenRouterClient
+from config import Config
+from data_models import EngineeredPrompt, GenerationResult, TokenUsage
+from retrieval.corpus_index import Passage, format_sources
 from utils import remove_think_tags
-from agents.base_agent import BaseAgent
+from agents.base_agent import BaseAgent, CancelScope
+
+
+WORD = re.compile(r'\S+')
+SENTENCE_END = re.compile(r'[.!?)](?=\s)')
+HEADING_LINE = re.compile(r'#{1,6}[ \t]')
+FENCE_LINE = re.compile(r'[ \t]*(```|~~~)')
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class ReasoningFilter:
+    """Drops <think>...</think> reasoning from streamed text chunk by chunk"""
+    
+    __slots__ = ("_pending", "_thinking")
+    
+    def __init__(self):
+        self._pending = ""  # possible start of a tag split across chunks
+        self._thinking = False
+    
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk of text
+        
+        Args:
+            chunk: Text following everything fed so far
+            
+        Returns:
+            The part of the chunk that is document text
+        """
+        text, self._pending = self._pending + chunk, ""
+        visible = []
+        while text:
+            tag = THINK_CLOSE if self._thinking else THINK_OPEN
+            index = text.find(tag)
+            if index >= 0:
+                if not self._thinking:
+                    visible.append(text[:index])
+                text = text[index + len(tag):]
+                self._thinking = not self._thinking
+                continue
+            keep = next((n for n in range(min(len(tag) - 1, len(text)), 0, -1) if tag.startswith(text[-n:])), 0)
+            if not self._thinking:
+                visible.append(text[:len(text) - keep])
+            self._pending = text[len(text) - keep:]
+            break
+        return "".join(visible)
+    
+    def flush(self) -> str:
+        """Text held back as a possible tag once the stream has ended"""
+        pending, self._pending = self._pending, ""
+        return "" if self._thinking else pending
+
+
+def strip_reasoning(text: str) -> str:
+    """
+    Document text of a completion, without reasoning
+    
+    Unlike remove_think_tags, an unclosed <think> (a stream stopped while
+    reasoning) also hides everything after it.
+    
+    Args:
+        text: Raw completion text
+        
+    Returns:
+        Text outside <think> blocks, without leading whitespace
+    """
+    reasoning = ReasoningFilter()
+    return (reasoning.feed(text) + reasoning.flush()).lstrip()
+
+
+class SectionTracker:
+    """Spots completed Markdown heading lines in streamed text, outside code fences"""
+    
+    __slots__ = ("_line", "_in_fence")
+    
+    def __init__(self):
+        self._line = ""
+        self._in_fence = False
+    
+    def feed(self, chunk: str) -> bool:
+        """
+        Add a chunk of text
+        
+        Args:
+            chunk: Text following everything fed so far
+            
+        Returns:
+            True if a heading line was completed, i.e. a new section started
+        """
+        lines = (self._line + chunk).split("\n")
+        self._line = lines.pop()
+        started = False
+        for line in lines:
+            if FENCE_LINE.match(line):
+                self._in_fence = not self._in_fence
+            elif not self._in_fence and HEADING_LINE.match(line):
+                started = True
+        return started
+
+
+class WordCounter:
+    """Counts the words of streamed text chunk by chunk"""
+    
+    __slots__ = ("count", "_in_word")
+    
+    def __init__(self, text: str = ""):
+        self.count = 0
+        self._in_word = False
+        self.feed(text)
+    
+    def feed(self, chunk: str) -> int:
+        """
+        Add a chunk of text
+        
+        Args:
+            chunk: Text following everything fed so far
+            
+        Returns:
+            Word count so far
+        """
+        for match in WORD.finditer(chunk):
+            # A word split across chunks is counted once
+            if not (match.start() == 0 and self._in_word):
+                self.count += 1
+        if chunk:
+            self._in_word = not chunk[-1].isspace()
+        return self.count
+
+
+def length_target(engineered_prompt: Optional[EngineeredPrompt]) -> Optional[Tuple[int, int]]:
+    """
+    Word range requested for a generation
+    
+    Args:
+        engineered_prompt: Prompt whose metadata holds the LENGTH_OPTIONS choice
+        
+    Returns:
+        (min_words, max_words), or None if the length is unknown
+    """
+    if engineered_prompt is None:
+        return None
+    return Config.LENGTH_TARGETS.get(engineered_prompt.metadata.get('length'))
+
+
+def trim_to_length(text: str, max_words: int, min_words: int = 0) -> str:
+    """
+    Cut text at the last paragraph (or sentence) boundary within max_words
+    
+    Args:
+        text: Generated Markdown
+        max_words: Words allowed
+        min_words: Words a paragraph cut must keep before a sentence cut is used
+        
+    Returns:
+        Trimmed text, without a trailing heading that lost its body
+    """
+    words = list(WORD.finditer(text))
+    if not words:
+        return text
+    head = text[:words[min(max_words, len(words)) - 1].end()]
+    
+    cut = head.rfind("\n\n")
+    if cut == -1 or len(WORD.findall(head[:cut])) < min_words:
+        sentences = list(SENTENCE_END.finditer(head))
+        cut = sentences[-1].end() if sentences else len(head)
+    trimmed = head[:cut].rstrip()
+    
+    while True:
+        line_start = trimmed.rfind("\n") + 1
+        if line_start == 0 or not trimmed[line_start:].lstrip().startswith("#"):
+            return trimmed
+        trimmed = trimmed[:line_start].rstrip()
+
+
+def join_continuation(text: str, part: str) -> str:
+    """
+    Append a continuation, dropping any repeat of the current ending
+    
+    Args:
+        text: Document so far
+        part: Text of the continuation request
+        
+    Returns:
+        Combined text
+    """
+    stripped = part.lstrip()
+    for size in range(min(len(text), len(stripped), 500), 19, -1):
+        if text.endswith(stripped[:size]):
+            return text + stripped[size:]
+    
+    if not stripped or text[-1:].isspace():
+        return text + stripped
+    if text.rstrip()[-1:] in ".!?:)":
+        return text.rstrip() + "\n\n" + stripped
+    # Cut off mid-sentence (e.g. by the token limit)
+    return text + " " + stripped
 
 
 class ResearchGeneratorAgent(BaseAgent):
@@ -15,6 +218,10 @@ class ResearchGeneratorAgent(BaseAgent):
     Agent 2: Handles research content generation
     """
     
+    inputs = ("engineered_prompt",)
+    optional_inputs = ("speculation", "sources", "on_partial", "cancel_scope")
+    outputs = ("research_result",)
+    
     def __init__(self, api_client: OpenRouterClient):
         """
         Initialize the agent
@@ -25,49 +232,329 @@ class ResearchGeneratorAgent(BaseAgent):
         super().__init__(name="ResearchGeneratorAgent")
         self.api_client = api_client
     
-    def generate_research(self, engineered_prompt: EngineeredPrompt) -> Optional[str]:
+    def generate_research(self, engineered_prompt: EngineeredPrompt,
+                          on_partial: Optional[Callable[[str], None]] = None,
+                          cancel_scope: Optional[CancelScope] = None) -> Optional[GenerationResult]:
         """
         Generate research content from engineered prompt
         
         Args:
             engineered_prompt: EngineeredPrompt object from Agent 1
+            on_partial: Called with the text so far whenever a new section starts
+            cancel_scope: Stops the streams when cancelled (e.g. on a DAG timeout)
             
         Returns:
-            Generated research content or None on error
+            Generated research result or None on error
         """
-
-        result = self.api_client.generate_completion(
-            engineered_prompt.formatted_prompt
+        return self.finish(self.start(engineered_prompt), on_partial, engineered_prompt, cancel_scope)
+    
+    def start(self, engineered_prompt: EngineeredPrompt) -> Optional[CompletionStream]:
+        """
+        Start streaming the research content
+        
+        Args:
+            engineered_prompt: EngineeredPrompt object from Agent 1
+            
+        Returns:
+            CompletionStream (cancellable) or None on error
+        """
+        return self.api_client.stream_completion(engineered_prompt.formatted_prompt)
+    
+    def finish(self, stream: Optional[CompletionStream],
+               on_partial: Optional[Callable[[str], None]] = None,
+               engineered_prompt: Optional[EngineeredPrompt] = None,
+               cancel_scope: Optional[CancelScope] = None) -> Optional[GenerationResult]:
+        """
+        Read a started stream to the end
+        
+        When the prompt's length option is known, the word count is
+        monitored: past the maximum the stream is stopped and trimmed to a
+        paragraph boundary, and below the minimum the document is continued
+        from its current tail instead of being regenerated.
+        
+        Args:
+            stream: Stream returned by start()
+            on_partial: Called with the text so far whenever a new section starts
+            engineered_prompt: Prompt the stream was started from (enables length control)
+            cancel_scope: Stops the streams when cancelled
+            
+        Returns:
+            Raw research result, or None on error or cancellation
+        """
+        if stream is None:
+            return None
+        if cancel_scope is not None:
+            cancel_scope.on_cancel(stream.cancel)
+        target = length_target(engineered_prompt)
+        
+        try:
+            text, stopped = self._read(stream, stream, "", target, on_partial)
+        except Exception:
+            return None
+        if (stream.cancelled and not stopped) or not text:
+            return None
+        result = stream.to_result()
+        
+        usage = [result.usage]
+        continuations = 0
+        while (target and not stopped and WordCounter(text).count < target[0]
+               and continuations < Config.LENGTH_MAX_CONTINUATIONS):
+            continuation = self.api_client.stream_completion(
+                self._continuation_prompt(engineered_prompt, text, target)
+            )
+            if continuation is None:
+                break
+            # Cancelling the document (scope or origin stream) closes this connection at once
+            if cancel_scope is not None:
+                cancel_scope.on_cancel(continuation.cancel)
+            stream.on_cancel(continuation.cancel)
+            continuations += 1
+            try:
+                part, stopped = self._read(continuation, stream, text, target, on_partial)
+            except Exception:
+                break
+            if stream.cancelled:
+                return None
+            text = join_continuation(text, part)
+            usage.append(continuation.usage)
+            result.timings['api'] += continuation.to_result().timings['api']
+        
+        if stopped:
+            text = trim_to_length(text, target[1], target[0])
+        if target:
+            result.metadata['length_control'] = {
+                'target': list(target),
+                'words': WordCounter(text).count,
+                'continuations': continuations,
+                'trimmed': stopped
+            }
+        return replace(result, content=text, sections=[], usage=TokenUsage(
+            prompt_tokens=sum(u.prompt_tokens for u in usage),
+            completion_tokens=sum(u.completion_tokens for u in usage),
+            total_tokens=sum(u.total_tokens for u in usage),
+            cached_tokens=sum(u.cached_tokens for u in usage)
+        ))
+    
+    @staticmethod
+    def _read(stream: CompletionStream, origin: CompletionStream, prefix: str,
+              target: Optional[Tuple[int, int]],
+              on_partial: Optional[Callable[[str], None]]) -> Tuple[str, bool]:
+        """
+        Consume one stream, stopping once the document reaches its maximum length
+        
+        Args:
+            stream: Stream to read
+            origin: First stream of the document; cancelling it aborts continuations too
+            prefix: Document text before this stream
+            target: (min_words, max_words), or None
+            on_partial: Called with the document so far whenever a new section starts
+            
+        Returns:
+            (text of this stream without reasoning, whether it was stopped at the length limit)
+        """
+        # Reasoning of thinking models is neither counted nor part of the document
+        reasoning = ReasoningFilter()
+        counter = WordCounter(prefix)
+        sections = SectionTracker()
+        stopped = False
+        for chunk in stream:
+            if origin.cancelled:
+                break
+            visible = reasoning.feed(chunk)
+            # A heading line means the previous section is complete
+            if sections.feed(visible) and on_partial is not None:
+                text = strip_reasoning(stream.text)
+                on_partial(join_continuation(prefix, text) if prefix else text)
+            if target and counter.feed(visible) >= target[1]:
+                stopped = True
+                break
+        if stopped or origin.cancelled:
+            stream.cancel()
+        return strip_reasoning(stream.text), stopped
+    
+    @staticmethod
+    def _continuation_prompt(engineered_prompt: EngineeredPrompt, text: str,
+                             target: Tuple[int, int]) -> str:
+        """Ask for the rest of a document that ended short of its target"""
+        words = list(WORD.finditer(text))
+        tail_start = words[-Config.LENGTH_CONTINUATION_TAIL_WORDS].start() \
+            if len(words) > Config.LENGTH_CONTINUATION_TAIL_WORDS else 0
+        return Config.CONTINUATION_PROMPT_TEMPLATE.format(
+            prompt=engineered_prompt.formatted_prompt,
+            tail=text[tail_start:],
+            remaining=(target[0] + target[1]) // 2 - len(words)
         )
-        return result
     
-    def process_output(self, raw_output: str) -> str:
+    def process_output(self, raw_output: GenerationResult) -> GenerationResult:
         """
         Process the raw output
         
         Args:
-            raw_output: Raw output from API
+            raw_output: Raw result from API
             
         Returns:
-            Processed output
+            Processed result with cleaned content and re-parsed sections
         """
-        cleaned = remove_think_tags(raw_output)
-        return cleaned
+        started = time.perf_counter()
+        cleaned = remove_think_tags(raw_output.content)
+        timings = {**raw_output.timings, 'processing': time.perf_counter() - started}
+        return replace(raw_output, content=cleaned, sections=[], timings=timings)
     
-    def run(self, engineered_prompt: EngineeredPrompt) -> Optional[str]:
+    @staticmethod
+    def ground(engineered_prompt: EngineeredPrompt, sources: List[Passage]) -> EngineeredPrompt:
+        """
+        Append retrieved passages and citations to the prompt
+        
+        Args:
+            engineered_prompt: EngineeredPrompt from Agent 1
+            sources: Passages from the retrieval agent
+            
+        Returns:
+            New EngineeredPrompt; the citations are recorded in its metadata
+        """
+        return EngineeredPrompt(
+            original_topic=engineered_prompt.original_topic,
+            formatted_prompt=f"{engineered_prompt.formatted_prompt}\n\n{format_sources(sources)}",
+            metadata={
+                **engineered_prompt.metadata,
+                'sources': list(dict.fromkeys(p.citation for p in sources))
+            }
+        )
+    
+    def run(self, engineered_prompt: EngineeredPrompt,
+            speculation: Optional["SpeculativeRun"] = None,
+            sources: Optional[List[Passage]] = None,
+            on_partial: Optional[Callable[[str], None]] = None,
+            cancel_scope: Optional[CancelScope] = None) -> Optional[GenerationResult]:
         """
         Run the research generator agent
         
         Args:
             engineered_prompt: EngineeredPrompt from Agent 1
+            speculation: Generation already started from a provisional prompt;
+                kept if the final prompt is close enough, cancelled otherwise
+            sources: Passages from the local corpus to ground the content in
+            on_partial: Called with the text so far whenever a new section starts
+            cancel_scope: Stops the generation (and any speculation) when cancelled
             
         Returns:
-            Processed research content or None on error
+            Processed research result or None on error
         """
-        raw_output = self.generate_research(engineered_prompt)
+        if speculation is not None and cancel_scope is not None:
+            cancel_scope.on_cancel(speculation.cancel)
+        
+        if sources:
+            engineered_prompt = self.ground(engineered_prompt, sources)
+        
+        if speculation is not None:
+            # A speculative run never saw the sources, so it cannot be kept
+            if not sources and speculation.matches(engineered_prompt):
+                return speculation.result()
+            speculation.cancel()
+        
+        raw_output = self.generate_research(engineered_prompt, on_partial, cancel_scope)
         
         if raw_output:
             processed_output = self.process_output(raw_output)
+            processed_output.metadata.update(engineered_prompt.metadata)
             return processed_output
         
         return None
+
+
+class SpeculativeRun:
+    """
+    Agent 2 generation started before the final engineered prompt exists
+    """
+    
+    def __init__(self, agent: ResearchGeneratorAgent, engineered_prompt: EngineeredPrompt):
+        """
+        Start generating in the background
+        
+        Args:
+            agent: Research generator agent
+            engineered_prompt: Provisional prompt (e.g. from the template)
+        """
+        self.agent = agent
+        self.engineered_prompt = engineered_prompt
+        self.stream = agent.start(engineered_prompt)
+        self._result: Optional[GenerationResult] = None
+        self._thread = threading.Thread(target=self._consume, daemon=True)
+        self._thread.start()
+    
+    def _consume(self):
+        """Read the stream on the background thread"""
+        self._result = self.agent.finish(self.stream, engineered_prompt=self.engineered_prompt)
+    
+    def matches(self, final_prompt: EngineeredPrompt) -> bool:
+        """
+        Check whether the final prompt is close enough to keep this run
+        
+        Args:
+            final_prompt: Engineered prompt produced by Agent 1
+            
+        Returns:
+            True if the prompts do not differ materially
+        """
+        matcher = difflib.SequenceMatcher(
+            None, self.engineered_prompt.formatted_prompt, final_prompt.formatted_prompt
+        )
+        return (
+            matcher.real_quick_ratio() >= Config.SPECULATION_MIN_SIMILARITY
+            and matcher.ratio() >= Config.SPECULATION_MIN_SIMILARITY
+        )
+    
+    def result(self) -> Optional[GenerationResult]:
+        """
+        Wait for the speculative generation
+        
+        Returns:
+            Processed research result or None on error
+        """
+        self._thread.join()
+        if not self._result:
+            return None
+        processed = self.agent.process_output(self._result)
+        processed.metadata.update(self.engineered_prompt.metadata)
+        processed.metadata['speculative'] = True
+        return processed
+    
+    def cancel(self):
+        """Abort the generation and free its HTTP connection"""
+        if self.stream is not None:
+            self.stream.cancel()
+
+
+class SpeculationAgent(BaseAgent):
+    """
+    Starts Agent 2 from the static template while Agent 1 is still running
+    """
+    
+    inputs = ("user_input",)
+    outputs = ("speculation",)
+    
+    def __init__(self, prompt_agent, research_agent: ResearchGeneratorAgent):
+        """
+        Initialize the agent
+        
+        Args:
+            prompt_agent: PromptEngineeringAgent providing the template prompt
+            research_agent: Agent used for the speculative generation
+        """
+        super().__init__(name="SpeculationAgent")
+        self.prompt_agent = prompt_agent
+        self.research_agent = research_agent
+    
+    def run(self, user_input) -> Optional[SpeculativeRun]:
+        """
+        Start a speculative generation if enabled
+        
+        Args:
+            user_input: UserInput for the request
+            
+        Returns:
+            SpeculativeRun, or None when speculation is disabled
+        """
+        if not Config.PIPELINE_SPECULATIVE:
+            return None
+        return SpeculativeRun(self.research_agent, self.prompt_agent.template_prompt(user_input))
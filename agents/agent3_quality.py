@@ -0,0 +1,108 @@
+"""
+Agent 3: Quality Gate Agent
+Responsibility: Check generated Markdown and repair what would not render or export
+"""
+
+import re
+import time
+from dataclasses import replace
+from typing import List, Optional
+from config import Config
+from data_models import GenerationResult
+from api_client import OpenRouterClient
+from agents.base_agent import BaseAgent
+from markdown_checks import check_markdown, find_issues, repair_fragments
+from utils import remove_think_tags
+
+
+REPAIR_INSTRUCTIONS = (
+    "You fix broken Markdown fragments of a research document so they render with pandoc and XeLaTeX.\n\n"
+    "RULES:\n"
+    "1. Fix only Markdown structure and LaTeX math syntax; do not change the wording.\n"
+    "2. Inline math uses $...$ and display math uses $$...$$.\n"
+    "3. Use only LaTeX, amsmath and amssymb macros (no mhchem, siunitx, physics or cancel).\n"
+    "4. Return every fragment, in order, each preceded by its original marker line "
+    "(<<<FRAGMENT n>>>), and nothing else."
+)
+
+FRAGMENT_MARKER = re.compile(r'^<<<FRAGMENT (\d+)>>>[ \t]*$', re.MULTILINE)
+
+
+class QualityGateAgent(BaseAgent):
+    """
+    Agent 3: Checks generated Markdown and repairs it before rendering and export
+    """
+
+    inputs = ("research_result",)
+    outputs = ("checked_result",)
+
+    def __init__(self, api_client: OpenRouterClient):
+        """
+        Initialize Quality Gate Agent
+
+        Args:
+            api_client: OpenRouter API client, used only for fragments local fixes cannot repair
+        """
+        super().__init__(name="QualityGateAgent")
+        self.api_client = api_client
+
+    def repair(self, fragments: List[str]) -> List[Optional[str]]:
+        """
+        Ask the LLM to fix broken fragments, all in one request
+
+        Args:
+            fragments: Markdown paragraphs with problems
+
+        Returns:
+            Repaired fragments in the same order (None where no answer came back)
+        """
+        prompt = "\n".join(
+            f"<<<FRAGMENT {i}>>>\n{fragment}" for i, fragment in enumerate(fragments, 1)
+        )
+        response = self.api_client.generate_completion(prompt, system_prompt=REPAIR_INSTRUCTIONS)
+        if response is None:
+            return [None] * len(fragments)
+
+        text = remove_think_tags(response.content)
+        markers = list(FRAGMENT_MARKER.finditer(text))
+        repaired: List[Optional[str]] = [None] * len(fragments)
+        for marker, following in zip(markers, markers[1:] + [None]):
+            index = int(marker.group(1)) - 1
+            end = following.start() if following else len(text)
+            if 0 <= index < len(fragments):
+                repaired[index] = text[marker.end():end].strip()
+        return repaired
+
+    def run(self, research_result: GenerationResult) -> GenerationResult:
+        """
+        Run the quality gate
+
+        Deterministic fixes are always applied; remaining problems are sent
+        to the LLM fragment by fragment, and a repair is kept only if it
+        passes the same local checks.
+
+        Args:
+            research_result: Processed result from Agent 2
+
+        Returns:
+            Result with checked content and a quality summary in its metadata
+        """
+        started = time.perf_counter()
+        report = check_markdown(research_result.content)
+        content = report.content
+        issues = report.issues
+
+        repaired = 0
+        if issues and Config.QUALITY_LLM_REPAIR:
+            content, repaired = repair_fragments(
+                content, issues, self.repair, Config.QUALITY_MAX_REPAIR_FRAGMENTS
+            )
+            if repaired:
+                issues = find_issues(content)
+
+        metadata = {
+            **research_result.metadata,
+            'quality': {'fixes': report.fixes, 'repaired': repaired, 'remaining': len(issues)}
+        }
+        timings = {**research_result.timings, 'quality': time.perf_counter() - started}
+        return replace(research_result, content=content, sections=[], metadata=metadata, timings=timings)
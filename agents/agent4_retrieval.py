@@ -0,0 +1,47 @@
+"""
+Agent 4: Retrieval Agent
+Responsibility: Find passages and citations in the user's local corpus
+"""
+
+from typing import List, Optional
+from config import Config
+from data_models import UserInput
+from retrieval.corpus_index import Passage, get_corpus_index
+from agents.base_agent import BaseAgent
+
+
+class RetrievalAgent(BaseAgent):
+    """
+    Agent 4: Grounds generations in local documents, without network access
+    """
+    
+    inputs = ("user_input",)
+    outputs = ("sources",)
+    
+    def __init__(self):
+        """Initialize the agent"""
+        super().__init__(name="RetrievalAgent")
+    
+    def run(self, user_input: UserInput) -> Optional[List[Passage]]:
+        """
+        Retrieve the passages most relevant to the topic
+        
+        Runs alongside Agent 1; changed corpus files are re-indexed first.
+        
+        Args:
+            user_input: UserInput for the request
+            
+        Returns:
+            Passages, best first, or None when retrieval is disabled or finds nothing
+        """
+        if not Config.RETRIEVAL_ENABLED:
+            return None
+        try:
+            index = get_corpus_index()
+            index.refresh()
+            
+            passages = index.search(user_input.topic)
+            return passages or None
+        except Exception as e:
+            print(f"Error retrieving sources: {str(e)}")
+            return None
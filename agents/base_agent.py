@@ -2,12 +2,65 @@
 Base agent class for all agents
 """
 
+import threading
 from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class CancelScope:
+    """
+    Cancellation handle for one agent invocation
+    
+    The DAG executor passes it as the optional input "cancel_scope" and
+    cancels it when the node times out; agents register callbacks that
+    stop their work (e.g. CompletionStream.cancel).
+    """
+    
+    def __init__(self):
+        self._callbacks: List[Callable[[], None]] = []
+        self._cancelled = False
+        self._lock = threading.Lock()
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancel() was called"""
+        return self._cancelled
+    
+    def on_cancel(self, callback: Callable[[], None]):
+        """
+        Register a callback, run immediately if already cancelled
+        
+        Args:
+            callback: Stops some work of the agent
+        """
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+    
+    def cancel(self):
+        """Cancel the invocation and run every registered callback once"""
+        with self._lock:
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel Error: {e}")
 
 
 class BaseAgent(ABC):
     """Abstract base class for all agents"""
     
+    # Named values the agent consumes and produces when run in a DAG
+    # (see agents/dag_executor.py). Input names match run() parameters;
+    # agents that can stop early list "cancel_scope" as an optional input.
+    inputs: Tuple[str, ...] = ()
+    optional_inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    
     def __init__(self, name: str):
         """
         Initialize base agent
@@ -26,5 +79,24 @@ class BaseAgent(ABC):
         """
         pass
     
+    def invoke(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the agent with named inputs
+        
+        Args:
+            values: Available values by name
+            
+        Returns:
+            Produced values by output name
+        """
+        kwargs = {name: values.get(name) for name in self.inputs + self.optional_inputs}
+        result = self.run(**kwargs)
+        
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        if result is None:
+            return {}
+        return dict(zip(self.outputs, result))
+    
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(name='{self.name}')"
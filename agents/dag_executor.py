@@ -0,0 +1,316 @@
+"""
+DAG executor for agents
+Runs agents as soon as their inputs are available, independent ones concurrently
+"""
+
+import dataclasses
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from agents.base_agent import BaseAgent, CancelScope
+from config import Config
+from data_models import EngineeredPrompt, GenerationResult
+from shared_store import get_shared_store
+
+
+# Node states
+SUCCEEDED = "succeeded"
+CACHED = "cached"
+EMPTY = "empty"  # ran but produced no value (agent returned None)
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+SKIPPED = "skipped"  # a required input was missing
+
+# Injected into every node's inputs; not part of cache keys
+CANCEL_SCOPE = "cancel_scope"
+
+# Output types that can be shared through the store, as JSON via to_dict/from_dict
+SHAREABLE_TYPES = {cls.__name__: cls for cls in (EngineeredPrompt, GenerationResult)}
+
+# Shared by every DAG run in the process
+_shared_pool = ThreadPoolExecutor(max_workers=Config.DAG_MAX_WORKERS, thread_name_prefix="dag")
+
+
+@dataclass(slots=True)
+class Node:
+    """An agent placed in the DAG"""
+    name: str
+    agent: BaseAgent
+    timeout: float = Config.DAG_NODE_TIMEOUT
+    cacheable: bool = False
+
+
+@dataclass(slots=True)
+class NodeTrace:
+    """What happened to one node during a run"""
+    name: str
+    status: str
+    started: float = 0.0
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class DagRun:
+    """Values and traces of a completed run"""
+    values: Dict[str, Any]
+    traces: Dict[str, NodeTrace] = field(default_factory=dict)
+
+    def succeeded(self, name: str) -> bool:
+        """Whether the node produced its outputs"""
+        trace = self.traces.get(name)
+        return trace is not None and trace.status in (SUCCEEDED, CACHED)
+
+    def timings(self) -> Dict[str, float]:
+        """Per-node durations, keyed as node.<name>"""
+        return {f"node.{t.name}": t.duration for t in self.traces.values() if t.duration}
+
+
+def _fingerprint(value: Any) -> Any:
+    """JSON-friendly representation of a value for cache keys"""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    return value
+
+
+def _encode_outputs(outputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """JSON form of node outputs for the shared store, or None if a value has none"""
+    encoded = {}
+    for name, value in outputs.items():
+        kind = type(value).__name__
+        if SHAREABLE_TYPES.get(kind) is type(value):
+            encoded[name] = {"type": kind, "data": value.to_dict()}
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            return None
+        encoded[name] = {"value": value}
+    return encoded
+
+
+def _decode_outputs(encoded: Dict[str, Any]) -> Dict[str, Any]:
+    """Node outputs from their JSON form"""
+    return {
+        name: SHAREABLE_TYPES[item["type"]].from_dict(item["data"]) if "type" in item else item["value"]
+        for name, item in encoded.items()
+    }
+
+
+class DagExecutor:
+    """Execute agents in dependency order with per-node caching and timeouts"""
+
+    def __init__(self, nodes: List[Node], pool: ThreadPoolExecutor = None,
+                 cache_size: int = Config.DAG_CACHE_SIZE):
+        """
+        Validate the graph
+
+        Args:
+            nodes: Nodes of the DAG; each output name must be produced once
+            pool: Thread pool to run nodes on (defaults to the shared pool)
+            cache_size: Maximum cached node results
+
+        Raises:
+            ValueError: If an output is produced twice or the graph has a cycle
+        """
+        self.nodes = {node.name: node for node in nodes}
+        self.pool = pool or _shared_pool
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._producers: Dict[str, str] = {}
+        for node in nodes:
+            for output in node.agent.outputs:
+                if output in self._producers:
+                    raise ValueError(f"'{output}' is produced by both {self._producers[output]} and {node.name}")
+                self._producers[output] = node.name
+        self._check_acyclic()
+
+    def _dependencies(self, node: Node) -> List[str]:
+        """Names of the nodes a node waits for"""
+        names = node.agent.inputs + node.agent.optional_inputs
+        return [self._producers[n] for n in names if n in self._producers]
+
+    def _check_acyclic(self):
+        """Raise ValueError if the nodes form a cycle"""
+        visiting, visited = set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle detected at node {name}")
+            visiting.add(name)
+            for dependency in self._dependencies(self.nodes[name]):
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.nodes:
+            visit(name)
+
+    def _cache_key(self, node: Node, values: Dict[str, Any]) -> Optional[str]:
+        """Hash a node's inputs, or None if they cannot be serialized"""
+        names = [n for n in node.agent.inputs + node.agent.optional_inputs if n != CANCEL_SCOPE]
+        try:
+            payload = json.dumps(
+                {name: _fingerprint(values.get(name)) for name in names},
+                sort_keys=True
+            )
+        except TypeError:
+            return None
+        return f"{node.name}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def _cache_get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Look up cached outputs, then those shared by other worker processes"""
+        if key is None:
+            return None
+        with self._cache_lock:
+            outputs = self._cache.get(key)
+            if outputs is not None:
+                self._cache.move_to_end(key)
+                return outputs
+
+        try:
+            encoded = get_shared_store().get_json("dag", key)
+            if encoded is None:
+                return None
+            outputs = _decode_outputs(encoded)
+        except Exception as e:
+            print(f"DAG cache Error: {e}")
+            return None
+        self._cache_put(key, outputs, share=False)
+        return outputs
+
+    def _cache_put(self, key: Optional[str], outputs: Dict[str, Any], share: bool = True):
+        """Store outputs, evicting the least recently used entry"""
+        if key is None:
+            return
+        with self._cache_lock:
+            self._cache[key] = outputs
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        if share:
+            # JSON rather than pickle: loading from the store must never run code
+            encoded = _encode_outputs(outputs)
+            if encoded is None:
+                return
+            try:
+                get_shared_store().set_json("dag", key, encoded)
+            except Exception as e:
+                print(f"DAG cache Error: {e}")
+
+    def run(self, initial: Dict[str, Any],
+            on_start: Callable[[str], None] = None,
+            on_complete: Callable[[str, Dict[str, Any]], None] = None,
+            use_cache: bool = True) -> DagRun:
+        """
+        Run every node whose outputs are not already known
+
+        Values present in `initial` are treated as produced, so a resumed
+        job skips the nodes that already ran.
+
+        Args:
+            initial: Starting values by name
+            on_start: Called with a node name before it runs
+            on_complete: Called with a node name and its outputs on success
+            use_cache: Look up cached outputs; when False every node runs,
+                and the fresh outputs still replace the cached ones
+
+        Returns:
+            DagRun with all values and per-node traces
+        """
+        values = dict(initial)
+        run = DagRun(values=values)
+        pending = {
+            name for name, node in self.nodes.items()
+            if not all(output in values for output in node.agent.outputs)
+        }
+        running: Dict[Future, Node] = {}
+        scopes: Dict[Future, CancelScope] = {}
+        cache_keys: Dict[str, Optional[str]] = {}
+
+        while pending or running:
+            # Start or skip every node whose dependencies are settled
+            for name in sorted(pending):
+                node = self.nodes[name]
+                if any(dep in pending or dep in (n.name for n in running.values())
+                       for dep in self._dependencies(node)):
+                    continue
+                pending.discard(name)
+
+                if any(values.get(i) is None for i in node.agent.inputs):
+                    run.traces[name] = NodeTrace(name=name, status=SKIPPED)
+                    continue
+
+                cache_key = self._cache_key(node, values) if node.cacheable else None
+                cache_keys[name] = cache_key
+                cached = self._cache_get(cache_key) if use_cache else None
+                if cached is not None:
+                    values.update(cached)
+                    run.traces[name] = NodeTrace(name=name, status=CACHED, started=time.time())
+                    if on_complete:
+                        on_complete(name, cached)
+                    continue
+
+                if on_start:
+                    on_start(name)
+                run.traces[name] = NodeTrace(name=name, status=FAILED, started=time.time())
+                scope = CancelScope()
+                future = self.pool.submit(node.agent.invoke, {**values, CANCEL_SCOPE: scope})
+                running[future] = node
+                scopes[future] = scope
+
+            if not running:
+                continue
+
+            # Wait for the next node to finish or the earliest deadline
+            now = time.time()
+            deadline = min(run.traces[n.name].started + n.timeout for n in running.values())
+            done, _ = wait(list(running), timeout=max(0.0, deadline - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                node = running.pop(future)
+                scopes.pop(future)
+                trace = run.traces[node.name]
+                trace.duration = time.time() - trace.started
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    trace.error = str(e)
+                    print(f"Node Error ({node.name}): {str(e)}")
+                    continue
+
+                if any(outputs.get(o) is None for o in node.agent.outputs):
+                    trace.status = EMPTY
+                    continue
+
+                trace.status = SUCCEEDED
+                values.update(outputs)
+                self._cache_put(cache_keys.get(node.name), outputs)
+                if on_complete:
+                    on_complete(node.name, outputs)
+
+            # Abandon nodes past their deadline; their dependents are skipped.
+            # A node that has started only stops if its agent takes a cancel
+            # scope; otherwise it keeps running (and holding a pool thread)
+            # until it returns on its own.
+            now = time.time()
+            for future, node in list(running.items()):
+                trace = run.traces[node.name]
+                if now >= trace.started + node.timeout:
+                    future.cancel()
+                    scopes.pop(future).cancel()
+                    running.pop(future)
+                    trace.status = TIMED_OUT
+                    trace.duration = now - trace.started
+                    print(f"Node Timeout ({node.name}) after {node.timeout}s")
+
+        return run
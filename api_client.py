@@ -2,9 +2,161 @@
 API client for OpenRouter
 """
 
-from typing import Optional
-from openai import OpenAI
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Union
 from config import Config
+from data_models import GenerationResult, TokenUsage
+from rate_limiter import get_rate_limiter
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Check whether an SDK error is an HTTP 429, without importing the SDK
+    
+    Args:
+        error: Exception raised by the OpenAI or LangChain client
+        
+    Returns:
+        True if the provider rejected the request for rate limiting
+    """
+    return getattr(error, "status_code", None) == 429
+
+
+def supports_cache_control(model: str) -> bool:
+    """
+    Check whether the model's providers accept explicit cache breakpoints
+    
+    Args:
+        model: OpenRouter model ID
+        
+    Returns:
+        True if cache_control hints should be sent
+    """
+    return model.startswith(Config.CACHE_CONTROL_MODEL_PREFIXES)
+
+
+def cacheable_content(text: str, model: str) -> Union[str, List[dict]]:
+    """
+    Message content for a static prompt prefix
+    
+    Providers with automatic prefix caching only need the prefix to be
+    byte-stable; the others get an explicit cache breakpoint.
+    
+    Args:
+        text: Static prompt text
+        model: OpenRouter model ID
+        
+    Returns:
+        Plain text, or a text part carrying a cache_control hint
+    """
+    if not supports_cache_control(model):
+        return text
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+class CompletionStream:
+    """Streamed completion that can be cancelled from another thread"""
+    
+    def __init__(self, stream, model: str, started: Optional[float] = None):
+        """
+        Wrap an OpenAI stream
+        
+        Args:
+            stream: Stream returned by chat.completions.create(stream=True)
+            model: Requested model ID
+            started: perf_counter() value when the request was sent
+        """
+        self._stream = stream
+        self._cancelled = threading.Event()
+        self._on_cancel: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._parts: List[str] = []
+        self.model = model
+        self.usage = TokenUsage()
+        self.started = started if started is not None else time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        """
+        Yield content deltas as they arrive
+        
+        Yields:
+            Text chunks
+        """
+        try:
+            for chunk in self._stream:
+                if self._cancelled.is_set():
+                    break
+                if chunk.model:
+                    self.model = chunk.model
+                if chunk.usage:
+                    self.usage = OpenRouterClient._parse_usage(chunk.usage)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if self.first_token_at is None:
+                        self.first_token_at = time.perf_counter()
+                    self._parts.append(delta)
+                    yield delta
+        except Exception as e:
+            # Closing the connection from cancel() interrupts the read
+            if not self._cancelled.is_set():
+                print(f"API Stream Error: {str(e)}")
+                raise
+        finally:
+            self.finished_at = time.perf_counter()
+            self._stream.close()
+    
+    def cancel(self):
+        """Stop the generation and release the HTTP connection"""
+        with self._lock:
+            self._cancelled.set()
+            callbacks, self._on_cancel = self._on_cancel, []
+        self._stream.close()
+        for callback in callbacks:
+            callback()
+    
+    def on_cancel(self, callback: Callable[[], None]):
+        """
+        Run a callback when this stream is cancelled (at once if it already was)
+        
+        Args:
+            callback: E.g. the cancel() of a stream continuing this one
+        """
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._on_cancel.append(callback)
+                return
+        callback()
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether the stream was cancelled"""
+        return self._cancelled.is_set()
+    
+    @property
+    def text(self) -> str:
+        """Content received so far"""
+        return "".join(self._parts)
+    
+    def to_result(self) -> GenerationResult:
+        """
+        Build a GenerationResult from the received content
+        
+        Returns:
+            GenerationResult with usage and timings
+        """
+        finished = self.finished_at or time.perf_counter()
+        timings = {'api': finished - self.started}
+        if self.first_token_at is not None:
+            timings['first_token'] = self.first_token_at - self.started
+        return GenerationResult(
+            content=self.text,
+            model=self.model,
+            usage=self.usage,
+            timings=timings
+        )
 
 
 class OpenRouterClient:
@@ -17,33 +169,128 @@ class OpenRouterClient:
         Args:
             api_key: OpenRouter API key
         """
-        self.client = OpenAI(
-            base_url=Config.OPENROUTER_BASE_URL,
-            api_key=api_key
-        )
+        self.api_key = api_key
+        self._client = None
+    
+    @property
+    def client(self):
+        """OpenAI SDK client, imported and created on first use"""
+        if self._client is None:
+            from openai import OpenAI
+            from llm_replay import http_client
+            self._client = OpenAI(
+                base_url=Config.OPENROUTER_BASE_URL,
+                api_key=self.api_key,
+                http_client=http_client()
+            )
+        return self._client
     
-    def generate_completion(self, prompt: str) -> Optional[str]:
+    def generate_completion(self, prompt: str, system_prompt: Optional[str] = None) -> Optional[GenerationResult]:
         """
         Generate completion from the API
         
         Args:
             prompt: The formatted prompt string
+            system_prompt: Static instructions sent first, as a cacheable prefix
             
         Returns:
-            Generated text content or None on error
+            GenerationResult with content, usage and timing, or None on error
         """
+        if not self._admit():
+            return None
+        
         try:
+            started = time.perf_counter()
             completion = self.client.chat.completions.create(
                 model=Config.MODEL_NAME,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=self._build_messages(prompt, system_prompt),
                 max_tokens=200000
             )
-            return completion.choices[0].message.content
+            elapsed = time.perf_counter() - started
+            
+            content = completion.choices[0].message.content
+            if content is None:
+                return None
+            
+            return GenerationResult(
+                content=content,
+                model=completion.model or Config.MODEL_NAME,
+                usage=self._parse_usage(completion.usage),
+                timings={'api': elapsed}
+            )
+        except Exception as e:
+            if is_rate_limit_error(e):
+                print(f"API Rate Limit: {str(e)}")
+                get_rate_limiter().backoff(Config.MODEL_NAME)
+                return None
+            print(f"API Error: {str(e)}")
+            return None
+
+    def stream_completion(self, prompt: str, system_prompt: Optional[str] = None) -> Optional[CompletionStream]:
+        """
+        Start a streamed completion
+        
+        Args:
+            prompt: The formatted prompt string
+            system_prompt: Static instructions sent first, as a cacheable prefix
+            
+        Returns:
+            CompletionStream to iterate (or cancel), or None on error
+        """
+        if not self._admit():
+            return None
+        
+        try:
+            started = time.perf_counter()
+            stream = self.client.chat.completions.create(
+                model=Config.MODEL_NAME,
+                messages=self._build_messages(prompt, system_prompt),
+                max_tokens=200000,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            return CompletionStream(stream, Config.MODEL_NAME, started)
         except Exception as e:
+            if is_rate_limit_error(e):
+                print(f"API Rate Limit: {str(e)}")
+                get_rate_limiter().backoff(Config.MODEL_NAME)
+                return None
             print(f"API Error: {str(e)}")
             return None
+    
+    @staticmethod
+    def _admit() -> bool:
+        """Wait for a slot in the model's rate limit budget"""
+        # Replayed requests never reach the provider
+        if Config.LLM_REPLAY_MODE == "replay" or get_rate_limiter().acquire(Config.MODEL_NAME):
+            return True
+        print(f"API Error: rate limit budget for {Config.MODEL_NAME} exhausted, request shed")
+        return False
+    
+    @staticmethod
+    def _build_messages(prompt: str, system_prompt: Optional[str]) -> List[dict]:
+        """Build the chat messages, static system prefix first"""
+        messages = []
+        if system_prompt:
+            messages.append({
+                "role": "system",
+                "content": cacheable_content(system_prompt, Config.MODEL_NAME)
+            })
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+        return messages
+    
+    @staticmethod
+    def _parse_usage(usage) -> TokenUsage:
+        """Convert API usage, including prefix-cache hits, to TokenUsage"""
+        if usage is None:
+            return TokenUsage()
+        details = getattr(usage, "prompt_tokens_details", None)
+        return TokenUsage(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            total_tokens=usage.total_tokens,
+            cached_tokens=(getattr(details, "cached_tokens", None) or 0) if details else 0
+        )
@@ -6,12 +6,61 @@ Prevents unnecessary reruns and page refresh
 from utils import load_environment, get_api_key
 from api_client import OpenRouterClient
 from agents.agent1_prompt import PromptEngineeringAgent
-from agents.agent2_research import ResearchGeneratorAgent
+from agents.agent2_research import ResearchGeneratorAgent, SpeculationAgent
+from agents.agent3_quality import QualityGateAgent
+from agents.agent4_retrieval import RetrievalAgent
+from agents.dag_executor import DagExecutor, Node
 from ui.interface import UIInterface
 from chatbot.chatbot_service import ResearchAgentChatbot
+from chatbot.context_builder import ContextBuilder
 from config import Config
+from data_models import UserInput, EngineeredPrompt, GenerationResult
+from jobs.job_queue import Job, JobQueue, JobWorkerPool, FAILED
+from rate_limiter import get_rate_limiter
+from similarity_cache import SimilarityCache
+from history.generation_history import get_history
 import streamlit as st
+from dataclasses import replace
+from typing import Dict, List
 from uuid import uuid4
+import time
+
+
+# LLM requests a generation may need: Agent 1, Agent 2, its length
+# continuations and, if enabled, the speculative run and the quality repair
+REQUESTS_PER_GENERATION = (
+    2
+    + Config.LENGTH_MAX_CONTINUATIONS
+    + (1 if Config.PIPELINE_SPECULATIVE else 0)
+    + (1 if Config.QUALITY_LLM_REPAIR else 0)
+)
+
+STAGE_MESSAGES = {
+    None: "🪄 ScholarCraft is channeling your request...",
+    "prompt": "🪄 ScholarCraft is channeling your request...",
+    "research": "⏳ Compiling your scholarly insights...",
+    "quality": "🔎 Checking formatting and math..."
+}
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Open the persistent job queue shared by all sessions"""
+    return JobQueue()
+
+
+@st.cache_resource
+def get_similarity_cache() -> SimilarityCache:
+    """Index of finished generations, shared by all sessions of this process"""
+    return SimilarityCache(get_job_queue())
+
+
+@st.cache_resource
+def start_job_workers(_handler) -> JobWorkerPool:
+    """Start this process's generation workers (once per process)"""
+    pool = JobWorkerPool(get_job_queue(), _handler)
+    pool.start()
+    return pool
 
 
 class ResearchToolApp:
@@ -31,42 +80,61 @@ class ResearchToolApp:
         self.prompt_agent = PromptEngineeringAgent(OpenRouterClient(api_key))
         self.research_agent = ResearchGeneratorAgent(OpenRouterClient(api_key))
         
+        # Agent graph: speculation (if enabled) and retrieval run alongside Agent 1;
+        # new stages are added as nodes without lengthening the chain
+        self.pipeline = DagExecutor([
+            Node("prompt", self.prompt_agent, cacheable=True),
+            Node("speculation", SpeculationAgent(self.prompt_agent, self.research_agent)),
+            Node("retrieval", RetrievalAgent(), timeout=Config.RETRIEVAL_TIMEOUT),
+            Node("research", self.research_agent),
+            Node("quality", QualityGateAgent(OpenRouterClient(api_key)))
+        ])
+        
         # Initialize chatbot service
         self.chatbot = ResearchAgentChatbot(api_key, Config.CHATBOT_MODEL)
         
         # Initialize UI
         self.ui = UIInterface()
-
-    def _get_generated_content_context(self) -> str:
-        """Extract context from generated content"""
-        context = "ScholarMind APP CONTEXT:\n\n"
-        
-        context += "Available Formats:\n"
-        context += "- " + "\n- ".join(Config.PAPER_FORMATS) + "\n\n"
-        
-        context += "Available Styles:\n"
-        context += "- " + "\n- ".join(Config.WRITING_STYLES) + "\n\n"
         
-        context += "Available Lengths:\n"
-        context += "- " + "\n- ".join(Config.LENGTH_OPTIONS) + "\n\n"
+        # Generations run as durable background jobs
+        self.jobs = get_job_queue()
+        self.similar = get_similarity_cache()
+        start_job_workers(self._generate)
+
+    def _get_generated_content_context(self) -> List[str]:
+        """Extract context from generated content, as segments"""
+        context = ContextBuilder(["ScholarMind APP CONTEXT:\n\n"])
+        context.add_lines("Available Formats", Config.PAPER_FORMATS)
+        context.add_lines("Available Styles", Config.WRITING_STYLES)
+        context.add_lines("Available Lengths", Config.LENGTH_OPTIONS)
         
-        if "generated_content" in st.session_state:
-            context += f"Recently Generated: {st.session_state.generated_content.get('title', 'N/A')}\n"
+        last_result = self._get_last_result()
+        if last_result:
+            context.add(f"Recently Generated: {last_result.title}\n")
         
-        return context
+        return context.segments
 
     def render_floating_chatbot(self):
         """Render chatbot in sidebar - SEPARATE from main area"""
         
-        # Initialize session state for chatbot
+        # Initialize session state for chatbot; the session ID lives in the
+        # URL so a reconnect to any worker process resumes the conversation
         if "chatbot_session_id" not in st.session_state:
-            st.session_state.chatbot_session_id = str(uuid4())
-            context = self._get_generated_content_context()
-            self.chatbot.create_session(
-                st.session_state.chatbot_session_id,
-                context,
-                session_state=st.session_state
-            )
+            session_id = st.query_params.get("chat")
+            if session_id and self.chatbot.restore_session(session_id, session_state=st.session_state):
+                st.session_state.chatbot_session_id = session_id
+                st.session_state.chat_messages = list(
+                    self.chatbot.get_messages(session_id, session_state=st.session_state)
+                )
+            else:
+                st.session_state.chatbot_session_id = str(uuid4())
+                context = self._get_generated_content_context()
+                self.chatbot.create_session(
+                    st.session_state.chatbot_session_id,
+                    context,
+                    session_state=st.session_state
+                )
+            st.query_params["chat"] = st.session_state.chatbot_session_id
         
         if "chat_messages" not in st.session_state:
             st.session_state.chat_messages = []
@@ -112,30 +180,334 @@ class ResearchToolApp:
             
             # Render messages
             with messages_container:
-                for msg in st.session_state.chat_messages:
-                    st.markdown('---')
-                    with st.chat_message(msg["role"]):
-                        st.write(msg["content"])
+                self.ui.render_chat_messages(st.session_state.chat_messages)
 
-    def _update_chatbot_with_document(self, research_content: str):
-        """Update chatbot with generated document"""
+    def _library_id(self) -> str:
+        """
+        ID of this user's document library
         
-        new_context = self._get_generated_content_context()
+        Like the chatbot session, it lives in the URL, so a reload or a
+        reconnect to another worker process keeps the same library.
+        """
+        if "library_id" not in st.session_state:
+            st.session_state.library_id = st.query_params.get("library") or uuid4().hex
+            st.query_params["library"] = st.session_state.library_id
+        return st.session_state.library_id
+
+    def _store_result(self, result: GenerationResult):
+        """
+        Keep a generation result in the session, once, keyed by its ID,
+        and in the user's library
+        
+        Args:
+            result: Generated research result
+        """
+        if "results" not in st.session_state:
+            st.session_state.results = {}
+        st.session_state.results[result.result_id] = result
+        st.session_state.last_result_id = result.result_id
+        st.query_params["doc"] = result.result_id
+        try:
+            get_history().keep(self._library_id(), result.result_id)
+        except Exception as e:
+            print(f"History Error: {e}")
+
+    def _get_last_result(self):
+        """
+        Get the most recent generation result of this session, if any
         
-        new_context += f"\n\nCURRENT DOCUMENT:\n"
-        new_context += f"{'='*60}\n"
-        new_context += research_content
-        new_context += f"\n{'='*60}\n"
-        new_context += "\nHelp the user with this document."
+        After a reconnect to another worker process the session is new, so
+        the document named in the URL is loaded from the user's library.
+        """
+        result_id = st.session_state.get("last_result_id")
+        if result_id is not None:
+            return st.session_state.results.get(result_id)
+        
+        result_id = st.query_params.get("doc")
+        if result_id is None:
+            return None
+        try:
+            result = get_history().get(self._library_id(), result_id)
+        except Exception as e:
+            print(f"History Error: {e}")
+            return None
+        if result is not None:
+            self._store_result(result)
+        return result
+
+    def _begin_chatbot_document(self):
+        """Point the chatbot at a document that is about to stream in"""
+        st.session_state.chat_doc_offset = 0
+        if "chatbot_session_id" not in st.session_state:
+            return
+        
+        new_context = ContextBuilder(self._get_generated_content_context())
+        new_context.add("\n\nCURRENT DOCUMENT (still being generated):\n")
+        new_context.add(f"{'='*60}\n")
+        self.chatbot.update_context(
+            st.session_state.chatbot_session_id,
+            new_context.segments,
+            session_state=st.session_state
+        )
+
+    def _feed_partial_document(self, partial: str):
+        """
+        Append newly completed sections of a generating document to the chatbot
+        
+        Args:
+            partial: Document text generated so far
+        """
+        if "chatbot_session_id" not in st.session_state:
+            return
+        if "chat_doc_offset" not in st.session_state:
+            self._begin_chatbot_document()
+        
+        # Skip reasoning blocks; the last section may still be incomplete
+        think_end = partial.rfind("</think>")
+        if "<think>" in partial and think_end < 0:
+            return
+        body_start = think_end + len("</think>") if think_end >= 0 else 0
+        
+        offset = max(st.session_state.chat_doc_offset, body_start)
+        cut = partial.rfind("\n#")
+        if cut <= offset:
+            return
+        
+        self.chatbot.append_context(
+            st.session_state.chatbot_session_id,
+            partial[offset:cut],
+            session_state=st.session_state
+        )
+        st.session_state.chat_doc_offset = cut
+
+    def _update_chatbot_with_document(self, result: GenerationResult):
+        """Update chatbot with generated document"""
+        
+        # Segments reference the document; it is copied once, when the
+        # system prompt is joined for the next message
+        new_context = ContextBuilder(self._get_generated_content_context())
+        new_context.add("\n\nCURRENT DOCUMENT:\n")
+        new_context.add(f"{'='*60}\n")
+        new_context.add(result.content)
+        new_context.add(f"\n{'='*60}\n")
+        new_context.add("\nHelp the user with this document.")
+        st.session_state.pop("chat_doc_offset", None)
         
         if "chatbot_session_id" in st.session_state:
             self.chatbot.update_context(
                 st.session_state.chatbot_session_id,
-                new_context,
+                new_context.segments,
                 session_state=st.session_state
             )
             st.success("✅ Chatbot loaded with your document!")
 
+    @staticmethod
+    def _partial_checkpointer(job: Job, jobs: JobQueue):
+        """
+        Build the on_partial callback that checkpoints a streaming document
+        
+        Each checkpoint rewrites the whole partial text, so they are limited
+        to one per JOB_PARTIAL_CHECKPOINT_INTERVAL; the finished result
+        follows anyway.
+        
+        Args:
+            job: Job being generated
+            jobs: Job queue used for checkpoints
+            
+        Returns:
+            Callback taking the document text so far
+        """
+        last = [float("-inf")]
+        
+        def on_partial(text: str):
+            now = time.monotonic()
+            if now - last[0] < Config.JOB_PARTIAL_CHECKPOINT_INTERVAL:
+                return
+            last[0] = now
+            jobs.checkpoint(job.id, "research", {"partial_content": text})
+        
+        return on_partial
+    
+    def _generate(self, job: Job, jobs: JobQueue) -> Dict:
+        """
+        Run the agent graph for a queued job
+        
+        Executes on a background worker, so it must not touch Streamlit
+        elements. The engineered prompt is checkpointed, so a job that is
+        recovered after a restart resumes at Agent 2.
+        
+        Args:
+            job: Claimed generation job
+            jobs: Job queue used for checkpoints
+            
+        Returns:
+            Serialized GenerationResult
+        """
+        initial = {
+            "user_input": UserInput.from_dict(job.payload),
+            # Lets sessions feed finished sections to the chatbot while Agent 2 streams
+            "on_partial": self._partial_checkpointer(job, jobs)
+        }
+        if "engineered_prompt" in job.checkpoint:
+            initial["engineered_prompt"] = EngineeredPrompt.from_dict(job.checkpoint["engineered_prompt"])
+        
+        def on_start(node_name: str):
+            if node_name in STAGE_MESSAGES:
+                jobs.checkpoint(job.id, node_name)
+        
+        def on_complete(node_name: str, outputs: Dict):
+            if "engineered_prompt" in outputs:
+                jobs.checkpoint(job.id, node_name, {"engineered_prompt": outputs["engineered_prompt"].to_dict()})
+        
+        # "Generate fresh" must not get the cached engineered prompt back
+        run = self.pipeline.run(initial, on_start=on_start, on_complete=on_complete,
+                                use_cache=not job.payload.get("fresh", False))
+        
+        speculation = run.values.get("speculation")
+        if speculation and not run.succeeded("research"):
+            speculation.cancel()
+        
+        if run.values.get("engineered_prompt") is None:
+            raise RuntimeError("Failed to prepare request. Please try again.")
+        
+        # An unchecked document is still better than none
+        result = run.values.get("checked_result") or run.values.get("research_result")
+        if not result or result.content == "":
+            raise RuntimeError("Failed to generate research. Please try again.")
+        
+        result.timings.update(run.timings())
+        try:
+            get_history().add(result)
+        except Exception as e:
+            print(f"History Error: {e}")
+        return result.to_dict()
+
+    def _attach_job(self, job_id: str):
+        """Follow a job from this session; the URL lets a reload reattach"""
+        st.session_state.job_id = job_id
+        st.query_params["job"] = job_id
+        self._begin_chatbot_document()
+
+    def _submit(self, user_input: UserInput, fresh: bool = False):
+        """
+        Queue a generation and follow it from this session
+        
+        Args:
+            user_input: Validated user request
+            fresh: Recompute every stage instead of reusing cached ones
+        """
+        quota = get_rate_limiter().status(Config.MODEL_NAME)
+        
+        # Admission control: shed before queueing work that cannot finish today
+        if quota.limited and quota.day_remaining < REQUESTS_PER_GENERATION:
+            self.ui.show_error("❌ Daily request limit reached. Please try again tomorrow.")
+            return
+        
+        # Identical active requests (other users, double clicks)
+        # share the same job
+        payload = user_input.to_dict()
+        if fresh:
+            payload["fresh"] = True
+        self._attach_job(self.jobs.submit(user_input.cache_key(), payload))
+
+    def _open_result(self, result: GenerationResult):
+        """
+        Make a result the current document of this session
+        
+        Args:
+            result: Result to show and discuss with the chatbot
+        """
+        self._store_result(result)
+        self._update_chatbot_with_document(result)
+
+    def render_library(self):
+        """Browse and reopen the user's earlier documents, one page at a time"""
+        query = self.ui.render_library_search()
+        if query is None:
+            return
+        
+        history = get_history()
+        library_id = self._library_id()
+        if st.session_state.get("library_query") != query:
+            st.session_state.library_query = query
+            st.session_state.library_page = 0
+        
+        page_count = max(1, -(-history.count(library_id, query) // Config.HISTORY_PAGE_SIZE))
+        page = min(st.session_state.get("library_page", 0), page_count - 1)
+        entries = history.page(library_id, query, offset=page * Config.HISTORY_PAGE_SIZE)
+        
+        opened, requested_page = self.ui.render_library_page(entries, page, page_count)
+        if requested_page != page:
+            st.session_state.library_page = requested_page
+            st.rerun()
+        
+        if opened:
+            result = history.get(library_id, opened)
+            if result is None:
+                self.ui.show_error("❌ This document is no longer in the library.")
+            else:
+                self._open_result(result)
+
+    def _reuse_generation(self, job_id: str) -> bool:
+        """
+        Show an earlier generation instead of generating again
+        
+        Args:
+            job_id: Finished job holding the generation
+            
+        Returns:
+            False if the generation is no longer available
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.result is None:
+            self.similar.forget(job_id)
+            return False
+        
+        result = replace(GenerationResult.from_dict(job.result), cache_source=f"similar:{job_id}")
+        self._open_result(result)
+        return True
+
+    def _detach_job(self):
+        """Stop following the current job"""
+        st.session_state.pop("job_id", None)
+        st.query_params.pop("job", None)
+
+    def _await_job(self, job_id: str):
+        """
+        Wait for a job, showing its progress, and store its result
+        
+        Args:
+            job_id: Job to wait for
+        """
+        progress = self.ui.show_progress(STAGE_MESSAGES[None])
+        
+        job = self.jobs.get(job_id)
+        while job and not job.finished:
+            progress.info(STAGE_MESSAGES.get(job.stage, STAGE_MESSAGES[None]))
+            if "partial_content" in job.checkpoint:
+                self._feed_partial_document(job.checkpoint["partial_content"])
+            time.sleep(Config.JOB_POLL_INTERVAL)
+            job = self.jobs.get(job_id)
+        
+        self.ui.clear_progress(progress)
+        self._detach_job()
+        
+        if job is None:
+            self.ui.show_error("❌ This request has expired. Please generate again.")
+            return
+        
+        if job.status == FAILED:
+            self.ui.show_error(f"❌ {job.error}")
+            return
+        
+        # ✅ CACHE THE RESULT in session_state
+        # This prevents regeneration on future reruns
+        result = GenerationResult.from_dict(job.result)
+        self._store_result(result)
+        
+        # Update chatbot with document
+        self._update_chatbot_with_document(result)
+
     def run(self):
         """Run the application"""
         
@@ -150,79 +522,60 @@ class ResearchToolApp:
         user_input = self.ui.render_input_form()
         
         # Generate button
-        if self.ui.render_generate_button():
+        generate_clicked = self.ui.render_generate_button()
+        self.ui.render_quota(get_rate_limiter().status(Config.MODEL_NAME))
+        
+        if generate_clicked:
             if not user_input.is_valid():
                 self.ui.show_error("❌ Please fill in all fields")
                 return
             
+            # Near-duplicates of earlier requests are offered instantly;
+            # the offer survives the rerun triggered by its buttons
+            match = self.similar.lookup(user_input)
+            if match:
+                st.session_state.similar_offer = (match, user_input)
+            else:
+                st.session_state.pop("similar_offer", None)
+                self._submit(user_input)
+        
+        offer = st.session_state.get("similar_offer")
+        if offer:
+            match, offered_input = offer
+            choice = self.ui.render_similar_offer(match)
+            if choice:
+                del st.session_state.similar_offer
+            if choice == "fresh" or (choice == "reuse" and not self._reuse_generation(match.job_id)):
+                self._submit(offered_input, fresh=choice == "fresh")
+        
+        # Follow a running job, including after a page reload
+        job_id = st.session_state.get("job_id") or st.query_params.get("job")
+        if job_id:
             try:
-                # Agent 1: Engineer prompt
-                progress = self.ui.show_progress("🪄 ScholarCraft is channeling your request...")
-                engineered_prompt = self.prompt_agent.run(user_input)
-                
-                if not engineered_prompt:
-                    self.ui.show_error("❌ Failed to prepare request. Please try again.")
-                    return
-                
-                # Agent 2: Generate research
-                progress.info("⏳ Compiling your scholarly insights...")
-                st.divider()
-                
-                research_content = self.research_agent.run(engineered_prompt)
-                
-                if not research_content or research_content == "":
-                    self.ui.show_error("❌ Failed to generate research. Please try again.")
-                    return
-                
-                # Clear progress
-                self.ui.clear_progress(progress)
-                
-                # ✅ CACHE THE CONTENT in session_state
-                # This prevents regeneration on future reruns
-                st.session_state.last_content = research_content
-                st.session_state.last_title = (
-                    engineered_prompt.get("title", "Untitled") 
-                    if isinstance(engineered_prompt, dict) 
-                    else "Generated Content"
-                )
-                
-                # Display results
-                st.markdown("### ScholarMind Has Crafted Your Findings")
-                st.divider()
-                
-                self.ui.display_content(research_content)
-                st.divider()
-                
-                self.ui.render_download_button(research_content)
-                
-                # Store for chatbot
-                st.session_state.generated_content = {
-                    "title": st.session_state.last_title,
-                    "content": research_content
-                }
-                
-                # Update chatbot with document
-                self._update_chatbot_with_document(research_content)
-            
+                self._await_job(job_id)
             except Exception as e:
                 self.ui.show_error(f"❌ Error: {str(e)}")
                 import traceback
                 traceback.print_exc()
         
+        # Earlier documents, loaded only while the library is open
+        self.render_library()
+        
         # DISPLAY CACHED CONTENT IF IT EXISTS
         # This prevents regeneration when sidebar changes
-        elif "last_content" in st.session_state:
+        result = self._get_last_result()
+        if result:
             st.markdown("### ScholarMind Has Crafted Your Findings")
+            if result.cache_source:
+                st.caption("♻️ Reused from an earlier request on a similar topic")
             st.divider()
             
-            self.ui.display_content(st.session_state.last_content)
+            self.ui.display_content(result)
             st.divider()
             
-            self.ui.render_download_button(st.session_state.last_content)
+            self.ui.render_download_button(result.content)
             
             st.markdown("""
             ---
             💡 Tip: Consult ScholarBot in the sidebar for deeper understanding!
             """)
-
-
@@ -0,0 +1,124 @@
+"""
+Generation pipeline benchmark against recorded LLM responses
+Record once against the provider, then replay offline with the original or
+scaled timing so runs can be compared deterministically
+
+Usage:
+    python benchmarks/replay_benchmark.py record --cassette FILE [--topic TEXT]
+    python benchmarks/replay_benchmark.py replay --cassette FILE [--runs N] [--time-scale X]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+from data_models import UserInput  # noqa: E402
+
+
+def run_pipeline(user_input: UserInput, api_key: str) -> Dict[str, float]:
+    """
+    Run Agents 1-3 sequentially and time each stage
+
+    Args:
+        user_input: Request to generate
+        api_key: OpenRouter API key (unused when replaying)
+
+    Returns:
+        Seconds per stage, plus the API timings of the research result
+    """
+    from api_client import OpenRouterClient
+    from agents.agent1_prompt import PromptEngineeringAgent
+    from agents.agent2_research import ResearchGeneratorAgent
+    from agents.agent3_quality import QualityGateAgent
+
+    client = OpenRouterClient(api_key)
+    timings: Dict[str, float] = {}
+
+    started = time.perf_counter()
+    engineered_prompt = PromptEngineeringAgent(client).run(user_input)
+    timings['prompt'] = time.perf_counter() - started
+    if engineered_prompt is None:
+        raise RuntimeError("Prompt engineering failed (request missing from the cassette?)")
+
+    started = time.perf_counter()
+    research_result = ResearchGeneratorAgent(client).run(engineered_prompt)
+    timings['research'] = time.perf_counter() - started
+    if research_result is None:
+        raise RuntimeError("Research generation failed (request missing from the cassette?)")
+
+    started = time.perf_counter()
+    QualityGateAgent(client).run(research_result)
+    timings['quality'] = time.perf_counter() - started
+
+    timings['first_token'] = research_result.timings.get('first_token', 0.0)
+    timings['total'] = timings['prompt'] + timings['research'] + timings['quality']
+    return timings
+
+
+def format_report(runs: List[Dict[str, float]], mode: str) -> str:
+    """
+    Summarize the runs as a Markdown table
+
+    Args:
+        runs: Stage timings of each run
+        mode: "record" or "replay"
+
+    Returns:
+        Report text
+    """
+    title = f"replay, time scale {Config.LLM_REPLAY_TIME_SCALE:g}" if mode == "replay" else mode
+    lines = [
+        f"# Pipeline benchmark ({title})",
+        "",
+        "| Stage | Median (ms) | Min (ms) | Max (ms) |",
+        "|---|---:|---:|---:|"
+    ]
+    for stage in runs[0]:
+        values = [run[stage] * 1000 for run in runs]
+        lines.append(
+            f"| {stage} | {statistics.median(values):.0f} | {min(values):.0f} | {max(values):.0f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    """Record or replay the pipeline and print the timings"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", default=Config.LLM_CASSETTE_PATH, help="JSONL cassette")
+    parser.add_argument("--runs", type=int, default=1, help="Pipeline runs")
+    parser.add_argument("--time-scale", type=float, default=Config.LLM_REPLAY_TIME_SCALE,
+                        help="Replay speed factor for recorded latencies (0 = instant)")
+    parser.add_argument("--topic", default="The impact of quantum computing on modern cryptography")
+    parser.add_argument("--format", default=Config.PAPER_FORMATS[0])
+    parser.add_argument("--style", default=Config.WRITING_STYLES[0])
+    parser.add_argument("--length", default=Config.LENGTH_OPTIONS[0])
+    args = parser.parse_args()
+
+    Config.LLM_REPLAY_MODE = args.mode
+    Config.LLM_CASSETTE_PATH = args.cassette
+    Config.LLM_REPLAY_TIME_SCALE = args.time_scale
+
+    if args.mode == "record":
+        from utils import load_environment
+        load_environment()
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        if not api_key:
+            parser.error("OPENROUTER_API_KEY is required to record")
+    else:
+        api_key = "replay"
+
+    user_input = UserInput(args.format, args.style, args.length, args.topic)
+    runs = [run_pipeline(user_input, api_key) for _ in range(args.runs)]
+    print(format_report(runs, args.mode))
+
+
+if __name__ == "__main__":
+    main()
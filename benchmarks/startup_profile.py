@@ -0,0 +1,141 @@
+"""
+Startup-time profile of the application's entry modules
+Runs each import in a fresh interpreter with -X importtime and reports
+wall time, import time, peak memory and the heaviest packages
+
+Usage:
+    python benchmarks/startup_profile.py [module ...] [--top N] [--output FILE]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points: the Streamlit app, PDF worker processes, job workers and agents
+DEFAULT_MODULES = ["app", "export.pdf_service", "jobs.job_queue", "agents.agent2_research"]
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+# Prints peak RSS in KiB (Linux) or bytes (macOS); unavailable on Windows
+PROBE = """
+import {module}
+try:
+    import resource
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+except ImportError:
+    print(-1)
+"""
+
+
+@dataclass(slots=True)
+class StartupProfile:
+    """Import cost of one module in a fresh interpreter"""
+    module: str
+    wall_ms: float
+    import_ms: float
+    peak_rss_mb: Optional[float]
+    packages_ms: Dict[str, float] = field(default_factory=dict)
+
+
+def profile_module(module: str) -> StartupProfile:
+    """
+    Import a module in a new interpreter and parse its import-time log
+
+    Args:
+        module: Dotted module name, relative to the repository root
+
+    Returns:
+        StartupProfile of the import
+    """
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    import_us = 0
+    packages: Dict[str, int] = defaultdict(int)
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        packages[name.split(".")[0]] += int(self_us)
+        if not indent and name == module:
+            import_us = int(cumulative_us)
+
+    rss = int(completed.stdout.strip().splitlines()[-1])
+    if rss < 0:
+        peak_rss_mb = None
+    else:
+        peak_rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+    return StartupProfile(
+        module=module,
+        wall_ms=wall_ms,
+        import_ms=import_us / 1000,
+        peak_rss_mb=peak_rss_mb,
+        packages_ms={name: us / 1000 for name, us in packages.items()}
+    )
+
+
+def format_report(profiles: List[StartupProfile], top: int) -> str:
+    """
+    Render profiles as a Markdown report
+
+    Args:
+        profiles: Profiles to report
+        top: Number of heaviest packages listed per module
+
+    Returns:
+        Report text
+    """
+    lines = [
+        "# Startup profile",
+        "",
+        f"Python {sys.version.split()[0]} on {sys.platform}",
+        "",
+        "| Module | Wall (ms) | Import (ms) | Peak RSS (MB) |",
+        "|---|---:|---:|---:|"
+    ]
+    for p in profiles:
+        rss = f"{p.peak_rss_mb:.1f}" if p.peak_rss_mb is not None else "n/a"
+        lines.append(f"| {p.module} | {p.wall_ms:.0f} | {p.import_ms:.0f} | {rss} |")
+
+    for p in profiles:
+        lines += ["", f"## {p.module}: heaviest packages (self time)", ""]
+        heaviest = sorted(p.packages_ms.items(), key=lambda item: item[1], reverse=True)[:top]
+        lines += [f"- {name}: {ms:.1f} ms" for name, ms in heaviest]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    """Profile the requested modules and print the report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--top", type=int, default=10, help="Packages listed per module")
+    parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = format_report([profile_module(m) for m in args.modules], args.top)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
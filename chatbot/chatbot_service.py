@@ -1,14 +1,41 @@
 """
 Chatbot service for Research-Agent
-Stores sessions in Streamlit session_state to survive reruns
+Stores sessions in Streamlit session_state to survive reruns, and in the
+shared store so any worker process can pick a conversation up
 """
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage
-from typing import Dict
+from api_client import cacheable_content, is_rate_limit_error
+from chatbot.context_builder import ContextBuilder
+from config import Config
+from rate_limiter import get_rate_limiter
+from shared_store import get_shared_store
+from typing import Dict, List, Union
 import os
 
 
+# Session fields that are persisted; the LLM and joined prompt are rebuilt
+PERSISTED_FIELDS = ("context_segments", "messages", "history", "usage")
+
+# Static part of the system prompt. Kept byte-identical across sessions and
+# turns so providers can serve it from their prompt-prefix cache.
+BASE_SYSTEM_PROMPT = """You are Research Assistant for the ScholarMind application.
+
+You help users understand their generated research papers, essays, blog posts, technical reports, literature reviews, case studies, and white papers.
+
+Your role:
+- Answer questions about the user's generated content
+- Explain writing styles used (Academic, Professional, Conversational, Technical, Persuasive, Analytical, Descriptive)
+- Help clarify content topics and structure
+- Provide suggestions for improvement or revision
+- Maintain context about all previous conversations
+
+Guidelines:
+- Provide clear, concise answers
+- Reference specific parts of the content when relevant
+- Maintain a professional and helpful tone
+- Remember the conversation history"""
+
+
 class ResearchAgentChatbot:
     """Chatbot service - sessions stored in Streamlit session_state"""
 
@@ -18,64 +45,120 @@ class ResearchAgentChatbot:
         self.model = model
         # NOT storing sessions here - they'll be in st.session_state instead
 
-    def create_session(self, session_id: str, internal_context: str = None, session_state=None):
+    def create_session(self, session_id: str, internal_context: Union[str, List[str]] = None, session_state=None):
         """
         Create a new conversation session
         
         Args:
             session_id: Unique session identifier
-            internal_context: Context from generated content
+            internal_context: Context from generated content (text or segments)
             session_state: Streamlit session_state object
         """
         
         if session_state is None:
             raise ValueError("session_state is required")
         
-        # Initialize LLM
-        llm = ChatOpenAI(
-            api_key=self.api_key,
-            model=self.model,
-            temperature=0.3,
-            base_url="https://openrouter.ai/api/v1"
-        )
-
-        # Build system prompt
-        system_prompt = self._build_system_prompt(internal_context)
-
         # Store in session_state (survives Streamlit reruns!)
+        # The system prompt is assembled from the segments when first needed
         session_state.chatbot_sessions = session_state.get("chatbot_sessions", {})
         session_state.chatbot_sessions[session_id] = {
-            "llm": llm,
-            "system_prompt": system_prompt,
-            "context": internal_context,
+            "llm": None,  # created on the first message
+            "context_segments": self._as_segments(internal_context),
+            "system_prompt": None,
             "messages": [],
-            "history": []
+            "history": [],
+            "usage": {"prompt_tokens": 0, "cached_tokens": 0}
         }
+        self._persist(session_id, session_state.chatbot_sessions[session_id])
 
-    def _build_system_prompt(self, internal_context: str = None) -> str:
-        """Build system prompt with context about Research-Agent"""
+    def restore_session(self, session_id: str, session_state=None) -> bool:
+        """
+        Load a session saved by any worker process into session_state
+        
+        Args:
+            session_id: Session identifier
+            session_state: Streamlit session_state object
+            
+        Returns:
+            True if the session exists (already loaded or restored)
+        """
+        if session_state is None:
+            raise ValueError("session_state is required")
+        
+        session_state.chatbot_sessions = session_state.get("chatbot_sessions", {})
+        if session_id in session_state.chatbot_sessions:
+            return True
         
-        base_prompt = """You are Research Assistant for the ScholarMind application.
+        try:
+            saved = get_shared_store().get_json("chat", session_id)
+        except Exception as e:
+            print(f"Chat session Error: {e}")
+            return False
+        if saved is None:
+            return False
+        
+        session_state.chatbot_sessions[session_id] = {"llm": None, "system_prompt": None, **saved}
+        return True
 
-You help users understand their generated research papers, essays, blog posts, technical reports, literature reviews, case studies, and white papers.
+    @staticmethod
+    def _persist(session_id: str, session: Dict):
+        """Save the serializable part of a session to the shared store"""
+        try:
+            get_shared_store().set_json(
+                "chat", session_id,
+                {field: session[field] for field in PERSISTED_FIELDS},
+                ttl=Config.SESSION_TTL
+            )
+        except Exception as e:
+            print(f"Chat session Error: {e}")
 
-Your role:
-- Answer questions about the user's generated content
-- Explain writing styles used (Academic, Professional, Conversational, Technical, Persuasive, Analytical, Descriptive)
-- Help clarify content topics and structure
-- Provide suggestions for improvement or revision
-- Maintain context about all previous conversations
+    def _get_llm(self, session: Dict):
+        """
+        Get the session's LLM, importing LangChain on first use
+        
+        Args:
+            session: Chatbot session
+            
+        Returns:
+            ChatOpenAI instance
+        """
+        if session["llm"] is None:
+            from langchain_openai import ChatOpenAI
+            from llm_replay import http_client
+            session["llm"] = ChatOpenAI(
+                api_key=self.api_key,
+                model=self.model,
+                temperature=0.3,
+                base_url="https://openrouter.ai/api/v1",
+                http_client=http_client()
+            )
+        return session["llm"]
 
-Guidelines:
-- Provide clear, concise answers
-- Reference specific parts of the content when relevant
-- Maintain a professional and helpful tone
-- Remember the conversation history"""
+    @staticmethod
+    def _as_segments(internal_context: Union[str, List[str], None]) -> List[str]:
+        """Normalize context given as text or segments to a segment list"""
+        if not internal_context:
+            return []
+        if isinstance(internal_context, str):
+            return [internal_context]
+        return list(internal_context)
 
-        if internal_context:
-            base_prompt += f"\n\nCONTEXT ABOUT USER'S CONTENT:\n{internal_context}"
+    def _build_system_prompt(self, internal_context: Union[str, List[str]] = None) -> str:
+        """Build system prompt with context about Research-Agent"""
+        
+        builder = ContextBuilder([BASE_SYSTEM_PROMPT])
+        
+        segments = self._as_segments(internal_context)
+        if segments:
+            builder.add("\n\nCONTEXT ABOUT USER'S CONTENT:\n").extend(segments)
+        
+        return builder.build()
 
-        return base_prompt
+    def _get_system_prompt(self, session: Dict) -> str:
+        """Get the session's system prompt, joining the segments only once per change"""
+        if session["system_prompt"] is None:
+            session["system_prompt"] = self._build_system_prompt(session["context_segments"])
+        return session["system_prompt"]
 
     def send_message(self, session_id: str, user_message: str, session_state=None) -> Dict:
         """
@@ -103,12 +186,14 @@ Guidelines:
             }
 
         try:
+            from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+            
             session = sessions[session_id]
-            llm = session["llm"]
+            llm = self._get_llm(session)
             history = session["history"]
             
-            # Build message list
-            messages = [HumanMessage(content=session["system_prompt"])]
+            # Build message list: stable system prefix first, then the turns
+            messages = [SystemMessage(content=cacheable_content(self._get_system_prompt(session), self.model))]
             
             # Add history (last 10 messages to save tokens)
             for msg in history[-10:]:
@@ -120,21 +205,37 @@ Guidelines:
             # Add current message
             messages.append(HumanMessage(content=user_message))
             
-            # Get response
-            response = llm.invoke(messages)
+            # Get response (admission control shared with the generators)
+            limiter = get_rate_limiter()
+            replaying = Config.LLM_REPLAY_MODE == "replay"
+            if not replaying and not limiter.acquire(self.model, max_wait=Config.CHATBOT_RATE_LIMIT_WAIT):
+                return {
+                    "success": False,
+                    "error": "Request limit reached. Please try again later.",
+                    "session_id": session_id
+                }
+            try:
+                response = llm.invoke(messages)
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    limiter.backoff(self.model)
+                raise
             response_text = response.content
+            cached_ratio = self._record_usage(session, response)
             
             # Store in history
             history.append({"role": "user", "content": user_message})
             history.append({"role": "assistant", "content": response_text})
             session["messages"].append({"role": "user", "content": user_message})
             session["messages"].append({"role": "assistant", "content": response_text})
+            self._persist(session_id, session)
 
             return {
                 "success": True,
                 "response": response_text,
                 "session_id": session_id,
-                "message_count": len(session["messages"])
+                "message_count": len(session["messages"]),
+                "cached_token_ratio": cached_ratio
             }
 
         except Exception as e:
@@ -144,6 +245,52 @@ Guidelines:
                 "session_id": session_id
             }
 
+    def _record_usage(self, session: Dict, response) -> float:
+        """
+        Accumulate prompt-cache statistics from the response usage
+        
+        Args:
+            session: Chatbot session
+            response: AIMessage returned by the model
+            
+        Returns:
+            Cached share of this turn's prompt tokens
+        """
+        usage_metadata = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens = usage_metadata.get("input_tokens", 0)
+        cached_tokens = (usage_metadata.get("input_token_details") or {}).get("cache_read", 0) or 0
+        
+        usage = session.setdefault("usage", {"prompt_tokens": 0, "cached_tokens": 0})
+        usage["prompt_tokens"] += prompt_tokens
+        usage["cached_tokens"] += cached_tokens
+        
+        return cached_tokens / prompt_tokens if prompt_tokens else 0.0
+
+    def get_cache_stats(self, session_id: str, session_state=None) -> Dict:
+        """
+        Get prompt-cache statistics for a session
+        
+        Args:
+            session_id: Session identifier
+            session_state: Streamlit session_state object
+            
+        Returns:
+            Prompt and cached token totals with the overall cached ratio
+        """
+        if session_state is None:
+            raise ValueError("session_state is required")
+        
+        sessions = session_state.get("chatbot_sessions", {})
+        if session_id not in sessions:
+            return {}
+        
+        usage = sessions[session_id].get("usage", {"prompt_tokens": 0, "cached_tokens": 0})
+        prompt_tokens = usage["prompt_tokens"]
+        return {
+            **usage,
+            "cached_token_ratio": usage["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+        }
+
     def get_messages(self, session_id: str, session_state=None) -> list:
         """Get messages for a session"""
         if session_state is None:
@@ -162,9 +309,45 @@ Guidelines:
         sessions = session_state.get("chatbot_sessions", {})
         if session_id in sessions:
             del sessions[session_id]
+        get_shared_store().delete("chat", session_id)
+
+    def update_context(self, session_id: str, new_context: Union[str, List[str]], session_state=None):
+        """
+        Replace the context of an existing session
+        
+        Args:
+            session_id: Session identifier
+            new_context: New context, as text or a list of segments
+            session_state: Streamlit session_state object
+            
+        Returns:
+            True if the session exists
+        """
+        if session_state is None:
+            raise ValueError("session_state is required")
+        
+        sessions = session_state.get("chatbot_sessions", {})
+        if session_id not in sessions:
+            return False
+        
+        sessions[session_id]["context_segments"] = self._as_segments(new_context)
+        sessions[session_id]["system_prompt"] = None
+        self._persist(session_id, sessions[session_id])
+        return True
 
-    def update_context(self, session_id: str, new_context: str, session_state=None):
-        """Update context for existing session"""
+    def append_context(self, session_id: str, text: str, session_state=None):
+        """
+        Append a segment to the context, e.g. a section of a document
+        that is still being generated
+        
+        Args:
+            session_id: Session identifier
+            text: Context segment to append
+            session_state: Streamlit session_state object
+            
+        Returns:
+            True if the session exists
+        """
         if session_state is None:
             raise ValueError("session_state is required")
         
@@ -172,7 +355,7 @@ Guidelines:
         if session_id not in sessions:
             return False
         
-        sessions[session_id]["context"] = new_context
-        sessions[session_id]["system_prompt"] = self._build_system_prompt(new_context)
+        sessions[session_id]["context_segments"].append(text)
+        sessions[session_id]["system_prompt"] = None
         return True
 
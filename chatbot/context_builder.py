@@ -0,0 +1,66 @@
+"""
+Segment-based context assembly for the chatbot
+Text is collected as a list of segments and joined once, when it is sent
+"""
+
+from typing import Iterable, List
+
+
+class ContextBuilder:
+    """Accumulate prompt context without repeated string concatenation"""
+
+    def __init__(self, segments: Iterable[str] = ()):
+        """
+        Initialize the builder
+
+        Args:
+            segments: Initial text segments
+        """
+        self.segments: List[str] = list(segments)
+
+    def add(self, text: str) -> "ContextBuilder":
+        """
+        Append a segment (the string is referenced, not copied)
+
+        Args:
+            text: Text to append
+
+        Returns:
+            The builder, for chaining
+        """
+        self.segments.append(text)
+        return self
+
+    def extend(self, texts: Iterable[str]) -> "ContextBuilder":
+        """
+        Append several segments
+
+        Args:
+            texts: Texts to append
+
+        Returns:
+            The builder, for chaining
+        """
+        self.segments.extend(texts)
+        return self
+
+    def add_lines(self, title: str, items: Iterable[str]) -> "ContextBuilder":
+        """
+        Append a titled bullet list
+
+        Args:
+            title: List heading
+            items: List entries
+
+        Returns:
+            The builder, for chaining
+        """
+        self.segments.append(f"{title}:\n- " + "\n- ".join(items) + "\n\n")
+        return self
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.segments)
+
+    def build(self) -> str:
+        """Join the segments into the final text"""
+        return "".join(self.segments)
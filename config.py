@@ -2,6 +2,8 @@
 Configuration settings for the Research Tool
 """
 
+import os
+
 class Config:
     """Application configuration"""
     # API Configuration
@@ -55,3 +57,137 @@ class Config:
     CHATBOT_BUTTON_SIZE = 60  # pixels
     CHATBOT_WINDOW_WIDTH = 380  # pixels
     CHATBOT_WINDOW_HEIGHT = 600  # pixels
+
+    # Export Settings
+    EXPORT_MAX_WORKERS = 2  # Background conversion threads
+    EXPORT_CACHE_SIZE = 32  # Cached conversions (document x format)
+    EXPORT_DOCUMENT_TITLE = "Research Content"
+    EXPORT_POLL_INTERVAL = 1.0  # seconds between checks while conversions are pending
+    EXPORT_FAILURE_TTL = 300  # seconds a transient PDF failure (timeout, dead worker) blocks retries
+    MATHJAX_URL = "https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"
+
+    # PDF Rendering Settings
+    WINDOWS_PANDOC_DIR = r"C:\Program Files\Pandoc"  # Searched when pandoc is not on PATH
+    PDF_MAIN_FONT = "Noto Serif"  # Unicode-safe font available on Streamlit Cloud
+    PDF_FORMAT_NAME = "scholarpdf"  # Precompiled LaTeX format (preamble dump)
+    PDF_MAX_WORKERS = 1  # Warm xelatex worker processes
+    PDF_COMPILE_TIMEOUT = 120  # seconds
+
+    # Results Pane Settings
+    RENDER_CACHE_SIZE = 256  # Cached HTML renders (per section or chat message)
+    RESULTS_PAGE_HEADING_LEVEL = 2  # Headings up to this level start a new section
+    RESULTS_SECTIONS_PER_PAGE = 4
+    
+    # Delta Transport Settings
+    # Chat and results are kept in the browser and only changed parts are sent
+    DELTA_TRANSPORT_ENABLED = True
+    TRANSPORT_COMPRESS_MIN_BYTES = 2048  # Larger updates are sent zlib-compressed
+
+    # Job Queue Settings
+    JOBS_DB_PATH = "data/jobs.db"
+    JOB_WORKERS = 2  # Generation worker threads per process
+    JOB_POLL_INTERVAL = 1.0  # seconds
+    JOB_PARTIAL_CHECKPOINT_INTERVAL = 5.0  # seconds between checkpoints of a streaming document
+    JOB_HEARTBEAT_INTERVAL = 15.0  # seconds between liveness updates of running jobs
+    JOB_STALE_SECONDS = 120  # running jobs not updated for this long are requeued
+    JOB_RETENTION_SECONDS = 7 * 24 * 3600  # Keep finished jobs for a week
+
+    # Prompt Caching Settings
+    # Models whose providers need explicit cache_control breakpoints;
+    # others (OpenAI, DeepSeek, ...) cache byte-stable prefixes automatically
+    CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/", "google/gemini")
+
+    # Pipelining Settings
+    # Start Agent 2 from the static template while Agent 1 is still running.
+    # Costs an extra request whenever the engineered prompt differs materially.
+    PIPELINE_SPECULATIVE = False
+    SPECULATION_MIN_SIMILARITY = 0.6  # difflib ratio needed to keep the speculative run
+    FALLBACK_PROMPT_TEMPLATE = (
+        "Write a {paper_input} in {style_input} style about {user_input}. "
+        "The output should be approximately {length_input} in length. "
+        "Use LaTeX syntax for all math ($...$ inline, $$...$$ display) and clean Markdown."
+    )
+
+    # Length Control Settings
+    # Word range per LENGTH_OPTIONS entry: generation stops (and is trimmed to
+    # a paragraph boundary) past the maximum, and continues below the minimum.
+    LENGTH_TARGETS = {
+        'Short (500 words)': (400, 650),
+        'Medium (1000 words)': (850, 1300),
+        'Long (2000 words)': (1700, 2500),
+        'Very Long (3000+ words)': (3000, 4500)
+    }
+    LENGTH_MAX_CONTINUATIONS = 2  # Extra requests when the output ends early
+    LENGTH_CONTINUATION_TAIL_WORDS = 250  # Words of the current ending sent back
+    CONTINUATION_PROMPT_TEMPLATE = (
+        "{prompt}\n\n"
+        "The document has already been partly written. It currently ends with:\n\n"
+        "<<<TAIL\n{tail}\nTAIL>>>\n\n"
+        "Continue the document from exactly where it stops, in the same style and formatting. "
+        "Write about {remaining} more words and finish with a proper conclusion. "
+        "Do not repeat earlier text, restart the document or add any preamble."
+    )
+
+    # Agent DAG Settings
+    DAG_MAX_WORKERS = 8  # Shared thread pool for agent nodes
+    DAG_NODE_TIMEOUT = 600  # seconds
+    DAG_CACHE_SIZE = 128  # Cached node results (cacheable nodes only)
+
+    # Rate Limit Settings
+    RATE_LIMIT_DB_PATH = "data/rate_limits.db"
+    # Budget -> (requests per minute, requests per day); budgets without an
+    # entry are unlimited. All ":free" models share the "free" budget.
+    RATE_LIMITS = {
+        "free": (20, 50)
+    }
+    RATE_LIMIT_MAX_WAIT = 90  # seconds a request may queue before being shed
+    RATE_LIMIT_BACKOFF = 60  # seconds to pause a budget after a 429
+    CHATBOT_RATE_LIMIT_WAIT = 15  # chat replies queue for less time than generations
+
+    # Similar Request Cache Settings
+    # Requests with the same format, style and length whose topics score at
+    # least this cosine similarity reuse an earlier generation
+    SIMILARITY_THRESHOLD = 0.8
+    SIMILARITY_MAX_ENTRIES = 1000  # Most recent generations kept in the index
+    SIMILARITY_DIMENSIONS = 2 ** 14  # Hashed feature space
+
+    # History Settings
+    HISTORY_DB_PATH = "data/history.db"
+    HISTORY_PAGE_SIZE = 10  # Documents per library page
+
+    # Quality Gate Settings
+    QUALITY_LLM_REPAIR = True  # Ask the LLM to fix what local fixes cannot
+    QUALITY_MAX_REPAIR_FRAGMENTS = 6  # Paragraphs sent in the single repair request
+
+    # Retrieval Settings
+    # Passages from a local folder of PDFs (needs pypdf), Markdown and BibTeX
+    # files are added to the engineered prompt; no network is involved
+    RETRIEVAL_ENABLED = True  # Inactive while CORPUS_DIR does not exist
+    CORPUS_DIR = "corpus"
+    RETRIEVAL_INDEX_DIR = "data/retrieval"
+    RETRIEVAL_TOP_K = 6  # Passages added to the prompt
+    RETRIEVAL_PASSAGE_WORDS = 180  # Approximate passage size
+    RETRIEVAL_REFRESH_INTERVAL = 60  # seconds between corpus scans
+    RETRIEVAL_REFRESH_LEASE = 600  # seconds before a crashed process's refresh lease expires
+    RETRIEVAL_TIMEOUT = 30  # seconds Agent 2 waits for sources (first indexing may take longer)
+    
+    # Shared Store Settings
+    # Caches and chat sessions shared by every worker process on the host
+    SHARED_STORE_PATH = "data/shared.db"
+    SHARED_STORE_TOUCH_INTERVAL = 60  # seconds between recency updates of a read entry
+    SHARED_STORE_EVICT_EVERY = 50  # writes to a namespace (per process) between its eviction passes
+    SHARED_STORE_LIMITS = {"export": 64, "export_failed": 256, "render": 256, "dag": 256, "chat": 1000}
+    SHARED_STORE_DEFAULT_LIMIT = 256
+    SESSION_TTL = 24 * 3600  # seconds a chat session survives without activity
+    
+    # Serving Settings (serve.py)
+    SERVE_PORT = 8501  # Public port of the load balancer
+    SERVE_BASE_PORT = 8600  # Workers listen on SERVE_BASE_PORT, SERVE_BASE_PORT + 1, ...
+    SERVE_WORKERS = 0  # Streamlit worker processes (0 = one per CPU core)
+    
+    # LLM Record/Replay Settings (llm_replay.py)
+    # "record" saves every LLM exchange to the cassette, "replay" serves them
+    # back offline; set through the environment for benchmark runs
+    LLM_REPLAY_MODE = os.getenv("LLM_REPLAY_MODE", "off")  # "off", "record" or "replay"
+    LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE", "data/cassettes/default.jsonl")
+    LLM_REPLAY_TIME_SCALE = float(os.getenv("LLM_REPLAY_TIME_SCALE", "1.0"))  # 0 = no waits
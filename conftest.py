@@ -0,0 +1,20 @@
+"""
+Pytest configuration
+test_chatbot.py and test.py are manual scripts (they need an API key or print
+versions at import time), not test modules
+"""
+
+import pytest
+
+import shared_store
+
+
+collect_ignore = ["test_chatbot.py", "test.py"]
+
+
+@pytest.fixture(autouse=True)
+def isolated_shared_store(tmp_path, monkeypatch):
+    """Give every test its own shared store instead of data/shared.db"""
+    store = shared_store.SharedStore(str(tmp_path / "shared.db"))
+    monkeypatch.setattr(shared_store, "_store", store)
+    return store
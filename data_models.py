@@ -2,11 +2,17 @@
 Data structures for the Research Tool
 """
 
-from dataclasses import dataclass
-from typing import Dict
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from uuid import uuid4
 
 
-@dataclass
+HEADING_PATTERN = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t#]*$')
+FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+
+
+@dataclass(slots=True)
 class UserInput:
     """User input data structure"""
     paper_format: str
@@ -31,9 +37,29 @@ class UserInput:
             'length': self.length,
             'topic': self.topic
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "UserInput":
+        """Create from a dictionary produced by to_dict (other keys, e.g. job options, are ignored)"""
+        return cls(
+            paper_format=data['paper_format'],
+            writing_style=data['writing_style'],
+            length=data['length'],
+            topic=data['topic']
+        )
+    
+    def cache_key(self) -> str:
+        """
+        Build a normalized key identifying equivalent requests
+        
+        Returns:
+            Key that ignores case and whitespace differences in the topic
+        """
+        topic = " ".join(self.topic.lower().split())
+        return "|".join([self.paper_format, self.writing_style, self.length, topic])
 
 
-@dataclass
+@dataclass(slots=True)
 class EngineeredPrompt:
     """Engineered prompt data structure"""
     original_topic: str
@@ -42,3 +68,144 @@ class EngineeredPrompt:
     
     def __str__(self) -> str:
         return self.formatted_prompt
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary"""
+        return {
+            'original_topic': self.original_topic,
+            'formatted_prompt': self.formatted_prompt,
+            'metadata': self.metadata
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "EngineeredPrompt":
+        """Create from a dictionary produced by to_dict"""
+        return cls(**data)
+
+
+@dataclass(slots=True)
+class TokenUsage:
+    """Token usage reported by the API"""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cached_tokens: int = 0  # Prompt tokens served from the provider's prefix cache
+    
+    @property
+    def cached_ratio(self) -> float:
+        """Share of prompt tokens that were cache hits"""
+        if not self.prompt_tokens:
+            return 0.0
+        return self.cached_tokens / self.prompt_tokens
+
+
+@dataclass(slots=True)
+class Section:
+    """Markdown section located by character offsets into the content"""
+    title: str
+    level: int
+    start: int
+    end: int
+
+
+def parse_sections(content: str) -> List[Section]:
+    """
+    Locate Markdown headings in the content
+    
+    Args:
+        content: Markdown text
+        
+    Returns:
+        Sections in document order; each ends where the next one starts
+    """
+    sections = []
+    offset = 0
+    in_fence = False
+    for line in content.splitlines(keepends=True):
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = HEADING_PATTERN.match(line.rstrip('\r\n'))
+            if match:
+                if sections:
+                    sections[-1].end = offset
+                sections.append(Section(
+                    title=match.group(2),
+                    level=len(match.group(1)),
+                    start=offset,
+                    end=len(content)
+                ))
+        offset += len(line)
+    return sections
+
+
+@dataclass(slots=True)
+class GenerationResult:
+    """Output of an LLM generation with its provenance"""
+    content: str
+    model: str
+    usage: TokenUsage = field(default_factory=TokenUsage)
+    timings: Dict[str, float] = field(default_factory=dict)
+    metadata: Dict = field(default_factory=dict)
+    cache_source: Optional[str] = None  # None when freshly generated
+    sections: List[Section] = field(default_factory=list)
+    result_id: str = field(default_factory=lambda: uuid4().hex)
+    
+    def __post_init__(self):
+        if not self.sections:
+            self.sections = parse_sections(self.content)
+    
+    def __str__(self) -> str:
+        return self.content
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary (sections are re-parsed on load)"""
+        return {
+            'result_id': self.result_id,
+            'content': self.content,
+            'model': self.model,
+            'usage': {
+                'prompt_tokens': self.usage.prompt_tokens,
+                'completion_tokens': self.usage.completion_tokens,
+                'total_tokens': self.usage.total_tokens,
+                'cached_tokens': self.usage.cached_tokens
+            },
+            'timings': self.timings,
+            'metadata': self.metadata,
+            'cache_source': self.cache_source
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "GenerationResult":
+        """Create from a dictionary produced by to_dict"""
+        return cls(
+            content=data['content'],
+            model=data['model'],
+            usage=TokenUsage(**data.get('usage', {})),
+            timings=data.get('timings', {}),
+            metadata=data.get('metadata', {}),
+            cache_source=data.get('cache_source'),
+            result_id=data['result_id']
+        )
+    
+    @property
+    def title(self) -> str:
+        """Title taken from the first top-level heading"""
+        for section in self.sections:
+            if section.level == 1:
+                return section.title
+        if self.sections:
+            return self.sections[0].title
+        return self.metadata.get('original_topic') or "Generated Content"
+    
+    def section_text(self, section: Section) -> str:
+        """
+        Get the text of one section
+        
+        Args:
+            section: Section of this result
+            
+        Returns:
+            The section's Markdown, heading included
+        """
+        return self.content[section.start:section.end]
@@ -0,0 +1,326 @@
+"""
+Export service for generated content
+Pluggable converter registry with content-hash caching and background conversion
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from utils import load_pandoc
+from export.pdf_service import DocumentError, render_pdf
+from markdown_checks import find_issues
+from shared_store import get_shared_store
+
+
+@dataclass
+class Converter:
+    """Export format definition"""
+    key: str
+    label: str
+    extension: str
+    mime: str
+    convert: Callable[[str], Optional[bytes]]
+    expensive: bool = False
+
+
+def _pandoc_converter(to: str, extra_args: List[str], binary: bool) -> Callable[[str], Optional[bytes]]:
+    """
+    Build a converter function backed by pandoc
+
+    Args:
+        to: Pandoc output format
+        extra_args: Extra command line arguments for pandoc
+        binary: Whether pandoc must write the result to a file
+
+    Returns:
+        Function converting Markdown text to bytes (None on error)
+    """
+    def convert(markdown_text: str) -> Optional[bytes]:
+        try:
+            if not binary:
+                output = load_pandoc().convert_text(
+                    markdown_text, to=to, format="md", extra_args=extra_args
+                )
+                return output.encode("utf-8")
+
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                output_path = os.path.join(tmp_dir, f"export.{to}")
+                load_pandoc().convert_text(
+                    markdown_text,
+                    to=to,
+                    format="md",
+                    outputfile=output_path,
+                    extra_args=extra_args
+                )
+                with open(output_path, "rb") as f:
+                    return f.read()
+        except Exception as e:
+            print(f"[Export Error] {to}: {e}")
+            return None
+
+    return convert
+
+
+def _checked(convert: Callable[[str], Optional[bytes]]) -> Callable[[str], Optional[bytes]]:
+    """
+    Skip a slow conversion when the local checks are sure it will fail
+
+    Only blocking issues (e.g. unsupported macros) skip the compile; the
+    skip is not final, since only xelatex itself can reject a document.
+
+    Args:
+        convert: Converter function to guard
+
+    Returns:
+        Function returning None without converting broken documents
+    """
+    def checked(markdown_text: str) -> Optional[bytes]:
+        issues = [issue for issue in find_issues(markdown_text) if issue.blocking]
+        if issues:
+            print(f"[Export Skipped] {len(issues)} issue(s), first: {issues[0].message}")
+            return None
+        return convert(markdown_text)
+
+    return checked
+
+
+def _cache_key(markdown_text: str, format_key: str) -> str:
+    """Build the cache key for a document/format pair"""
+    digest = hashlib.sha256(markdown_text.encode("utf-8")).hexdigest()
+    return f"{format_key}:{digest}"
+
+
+class ExportService:
+    """Convert Markdown into export formats, lazily and off the request thread"""
+
+    def __init__(self, max_workers: int = Config.EXPORT_MAX_WORKERS,
+                 cache_size: int = Config.EXPORT_CACHE_SIZE):
+        """
+        Initialize the export service
+
+        Args:
+            max_workers: Number of background conversion threads
+            cache_size: Maximum number of cached conversions
+        """
+        self.converters: Dict[str, Converter] = {}
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._futures: "OrderedDict[str, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, converter: Converter):
+        """
+        Register (or replace) an export format
+
+        Args:
+            converter: Converter definition
+        """
+        self.converters[converter.key] = converter
+
+    def formats(self, expensive: Optional[bool] = None) -> List[Converter]:
+        """
+        List registered formats
+
+        Args:
+            expensive: Filter by cost; None returns all formats
+
+        Returns:
+            Converter definitions in registration order
+        """
+        return [
+            c for c in self.converters.values()
+            if expensive is None or c.expensive == expensive
+        ]
+
+    def submit(self, markdown_text: str, format_key: str) -> Future:
+        """
+        Start (or join) a background conversion
+
+        Identical requests share the same future, so a document is
+        converted at most once per format while it stays in the cache;
+        finished exports are also shared with the other worker processes.
+
+        Args:
+            markdown_text: Markdown content
+            format_key: Registered format key
+
+        Returns:
+            Future resolving to the exported bytes or None on error
+        """
+        converter = self.converters[format_key]
+        key = _cache_key(markdown_text, format_key)
+
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+                return future
+            if self._known_failure(key):
+                future = Future()
+                future.set_result(None)
+                return future
+
+            future = self._executor.submit(self._convert_shared, converter, key, markdown_text)
+            self._futures[key] = future
+            while len(self._futures) > self.cache_size:
+                self._futures.popitem(last=False)
+
+        future.add_done_callback(lambda f, k=key: self._drop_failed(k, f))
+        return future
+
+    def convert(self, markdown_text: str, format_key: str) -> Optional[bytes]:
+        """
+        Convert and wait for the result
+
+        Args:
+            markdown_text: Markdown content
+            format_key: Registered format key
+
+        Returns:
+            Exported bytes or None on error
+        """
+        return self.submit(markdown_text, format_key).result()
+
+    def get_cached(self, markdown_text: str, format_key: str) -> Optional[bytes]:
+        """
+        Return a finished conversion without starting a new one
+
+        Args:
+            markdown_text: Markdown content
+            format_key: Registered format key
+
+        Returns:
+            Exported bytes, or None if not converted yet
+        """
+        key = _cache_key(markdown_text, format_key)
+        with self._lock:
+            future = self._futures.get(key)
+        if future is None:
+            # Another worker process may have converted it
+            data = get_shared_store().get("export", key)
+            if data is not None:
+                future = Future()
+                future.set_result(data)
+                with self._lock:
+                    self._futures[key] = future
+            return data
+        if not future.done():
+            return None
+        return future.result()
+
+    @staticmethod
+    def _convert_shared(converter: Converter, key: str, markdown_text: str) -> Optional[bytes]:
+        """
+        Reuse an export from the shared store, or convert and publish it
+
+        Failed expensive conversions are published too: for good when
+        xelatex rejected the document, for EXPORT_FAILURE_TTL seconds
+        otherwise (timeout, missing tools or fonts, a dead worker, a skip
+        by the local checks).
+        """
+        store = get_shared_store()
+        data = store.get("export", key)
+        if data is not None:
+            return data
+        try:
+            data = converter.convert(markdown_text)
+        except DocumentError as e:
+            print(f"[Export Skipped] {converter.key}: {e}")
+            if converter.expensive:
+                store.set("export_failed", key, b"")
+            return None
+        if data is not None:
+            store.set("export", key, data)
+        elif converter.expensive:
+            store.set("export_failed", key, b"", ttl=Config.EXPORT_FAILURE_TTL)
+        return data
+
+    @staticmethod
+    def _known_failure(key: str) -> bool:
+        """Whether any worker process already failed this expensive conversion"""
+        return get_shared_store().get("export_failed", key) is not None
+
+    def failed(self, markdown_text: str, format_key: str) -> bool:
+        """
+        Check whether an expensive conversion already failed for this document
+
+        Args:
+            markdown_text: Markdown content
+            format_key: Registered format key
+
+        Returns:
+            True if the conversion will not be attempted again (for now)
+        """
+        return self._known_failure(_cache_key(markdown_text, format_key))
+
+    def _drop_failed(self, key: str, future: Future):
+        """
+        Evict failed conversions so they may be retried
+
+        Expensive formats are only retried once the failure recorded by
+        _convert_shared expires.
+        """
+        if future.exception() is None and future.result() is not None:
+            return
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+
+def _build_default_service() -> ExportService:
+    """Create the service with the built-in formats"""
+    service = ExportService()
+    title_args = ["--metadata", f"title={Config.EXPORT_DOCUMENT_TITLE}"]
+
+    service.register(Converter(
+        key="html",
+        label="🌐 Download as HTML",
+        extension="html",
+        mime="text/html",
+        convert=_pandoc_converter(
+            "html5",
+            ["--standalone", f"--mathjax={Config.MATHJAX_URL}", *title_args],
+            binary=False
+        )
+    ))
+    service.register(Converter(
+        key="tex",
+        label="📐 Download as LaTeX",
+        extension="tex",
+        mime="application/x-tex",
+        convert=_pandoc_converter("latex", ["--standalone"], binary=False)
+    ))
+    service.register(Converter(
+        key="docx",
+        label="📝 Download as DOCX",
+        extension="docx",
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        convert=_pandoc_converter("docx", [], binary=True)
+    ))
+    service.register(Converter(
+        key="epub",
+        label="📖 Download as EPUB",
+        extension="epub",
+        mime="application/epub+zip",
+        convert=_pandoc_converter("epub", ["--mathml", *title_args], binary=True)
+    ))
+    service.register(Converter(
+        key="pdf",
+        label="📄 Download as PDF",
+        extension="pdf",
+        mime="application/pdf",
+        convert=_checked(render_pdf),
+        expensive=True
+    ))
+    return service
+
+
+# Shared across sessions of the Streamlit process
+export_service = _build_default_service()
@@ -0,0 +1,329 @@
+"""
+Warm PDF rendering service
+Compiles Markdown to PDF in long-lived worker processes with a precompiled LaTeX format
+"""
+
+import atexit
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from config import Config
+from utils import load_pandoc
+
+
+# Exercises every optional block of pandoc's LaTeX template so the
+# generated preamble covers any document we may render later.
+PROBE_MARKDOWN = r"""
+Probe with ~~strikeout~~, a [link](https://example.com), a footnote[^1] and $x^2$.
+
+$$E = mc^2$$
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+```python
+print("probe")
+```
+
+![figure](probe.png)
+
+- [ ] task
+
+[^1]: Note.
+"""
+
+DOCUMENT_NAME = "document"
+
+# Per-process state of a worker (set by _init_worker)
+_worker_dir = None
+
+
+class DocumentError(Exception):
+    """The document itself does not compile; rendering it again will fail the same way"""
+
+
+# xelatex errors caused by the installation rather than the document
+ENVIRONMENT_ERRORS = re.compile(
+    r"fontspec Error|Font .* not loadable|File `[^']+' not found|"
+    r"can't find the format file|Fatal format file error|TeX capacity exceeded"
+)
+
+
+def _run_tex(args, cwd: str) -> subprocess.CompletedProcess:
+    """Run a TeX engine in batch mode"""
+    return subprocess.run(
+        args,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        timeout=Config.PDF_COMPILE_TIMEOUT
+    )
+
+
+def _font_setup() -> str:
+    """
+    Font selection, executed after the format is loaded
+
+    XeTeX cannot dump natively loaded fonts into a format, so fontspec and
+    unicode-math are precompiled while the font choice itself runs per document.
+    """
+    font = Config.PDF_MAIN_FONT
+    return f"\\setmainfont{{{font}}}\n\\setmathfont{{{font}}}\n"
+
+
+def _build_document(preamble: str, body: str) -> str:
+    """Assemble a complete LaTeX document around a pandoc body"""
+    return (
+        preamble
+        + "\\providecommand{\\endofdump}{}\n\\endofdump\n"
+        + _font_setup()
+        + "\\begin{document}\n"
+        + body
+        + "\n\\end{document}\n"
+    )
+
+
+def _first_error(log: bytes) -> Optional[str]:
+    """First "! ..." error line of a TeX log, or None if there is none"""
+    for line in log.decode("utf-8", "replace").splitlines():
+        if line.startswith("! "):
+            return line[2:].strip()
+    return None
+
+
+def _init_worker(base_dir: str):
+    """Give each worker process its own reusable working directory"""
+    global _worker_dir
+    _worker_dir = tempfile.mkdtemp(prefix="worker-", dir=base_dir)
+
+
+def _clear_worker_dir():
+    """Remove the previous document's files (.aux, .toc, ...) so they cannot leak into the next one"""
+    for name in os.listdir(_worker_dir):
+        path = os.path.join(_worker_dir, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def _prepare_format(base_dir: str) -> bool:
+    """
+    Generate the shared preamble and precompile it into a format file
+
+    Args:
+        base_dir: Service directory holding the preamble and format
+
+    Returns:
+        True if the format is available
+    """
+    try:
+        standalone = load_pandoc().convert_text(
+            PROBE_MARKDOWN, to="latex", format="md", extra_args=["--standalone"]
+        )
+        preamble = standalone.split("\\begin{document}", 1)[0]
+        with open(os.path.join(base_dir, "preamble.tex"), "w", encoding="utf-8") as f:
+            f.write(preamble)
+
+        # mylatexformat dumps everything up to \endofdump into the format
+        with open(os.path.join(base_dir, f"{DOCUMENT_NAME}.tex"), "w", encoding="utf-8") as f:
+            f.write(_build_document(preamble, ""))
+
+        _run_tex(
+            [
+                "xelatex", "-ini", "-interaction=nonstopmode",
+                f"-jobname={Config.PDF_FORMAT_NAME}",
+                "&xelatex", "mylatexformat.ltx", f"{DOCUMENT_NAME}.tex"
+            ],
+            cwd=base_dir
+        )
+        return os.path.exists(os.path.join(base_dir, f"{Config.PDF_FORMAT_NAME}.fmt"))
+    except Exception as e:
+        print(f"[PDF Format Error] {e}")
+        return False
+
+
+def _render(markdown_text: str, base_dir: str) -> Optional[bytes]:
+    """
+    Compile Markdown to PDF inside the current worker
+
+    Args:
+        markdown_text: Markdown content
+        base_dir: Service directory holding the preamble and format
+
+    Returns:
+        PDF bytes or None on error
+
+    Raises:
+        DocumentError: If LaTeX reports an error in the document itself
+    """
+    try:
+        with open(os.path.join(base_dir, "preamble.tex"), encoding="utf-8") as f:
+            preamble = f.read()
+
+        body = load_pandoc().convert_text(markdown_text, to="latex", format="md")
+        _clear_worker_dir()
+        tex_path = os.path.join(_worker_dir, f"{DOCUMENT_NAME}.tex")
+        with open(tex_path, "w", encoding="utf-8") as f:
+            f.write(_build_document(preamble, body))
+
+        args = ["xelatex", "-interaction=nonstopmode", "-halt-on-error"]
+        format_path = os.path.join(base_dir, Config.PDF_FORMAT_NAME)
+        if os.path.exists(format_path + ".fmt"):
+            args.append(f"-fmt={format_path}")
+        args.append(f"{DOCUMENT_NAME}.tex")
+
+        # Second pass only when LaTeX asks for it (cross references, outlines)
+        for _ in range(2):
+            result = _run_tex(args, cwd=_worker_dir)
+            if b"Rerun to get" not in result.stdout:
+                break
+
+        pdf_path = os.path.join(_worker_dir, f"{DOCUMENT_NAME}.pdf")
+        if result.returncode != 0 or not os.path.exists(pdf_path):
+            error = _first_error(result.stdout)
+            if error is None or ENVIRONMENT_ERRORS.search(error):
+                print(f"[PDF Generation Error] xelatex exited with {result.returncode}: {error}")
+                return None
+            raise DocumentError(error)
+
+        with open(pdf_path, "rb") as f:
+            return f.read()
+
+    except DocumentError:
+        raise
+    except Exception as e:
+        print(f"[PDF Generation Error] {e}")
+        return None
+
+
+class PdfRenderService:
+    """Keep a warm LaTeX toolchain and render PDFs in worker processes"""
+
+    def __init__(self, max_workers: int = Config.PDF_MAX_WORKERS):
+        """
+        Initialize the service and start precompiling the format
+
+        Args:
+            max_workers: Number of worker processes
+        """
+        self.base_dir = tempfile.mkdtemp(prefix="scholar-pdf-")
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        """Start the worker pool and queue the format precompile"""
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.base_dir,)
+        )
+        self._ready: Future = self._executor.submit(_prepare_format, self.base_dir)
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """
+        Replace a pool whose worker died (e.g. killed xelatex or out of memory)
+
+        Args:
+            broken: The pool that raised BrokenProcessPool; already replaced pools are left alone
+        """
+        with self._lock:
+            if self._executor is not broken:
+                return
+            print("[PDF Generation Error] worker process died, restarting the PDF workers")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._start()
+
+    def submit(self, markdown_text: str) -> Future:
+        """
+        Queue a PDF render
+
+        Args:
+            markdown_text: Markdown content
+
+        Returns:
+            Future resolving to PDF bytes or None on error
+        """
+        for attempt in range(2):
+            executor, ready = self._executor, self._ready
+            try:
+                # Renders need the shared preamble; the format itself is optional
+                ready.result()
+                return executor.submit(_render, markdown_text, self.base_dir)
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+                self._restart(executor)
+
+    def render(self, markdown_text: str) -> Optional[bytes]:
+        """
+        Render a PDF and wait for the result
+
+        Args:
+            markdown_text: Markdown content
+
+        Returns:
+            PDF bytes or None on error (timeouts, missing tools, a dead worker)
+
+        Raises:
+            DocumentError: If LaTeX rejects the document
+        """
+        executor = self._executor
+        try:
+            return self.submit(markdown_text).result()
+        except DocumentError:
+            raise
+        except BrokenProcessPool as e:
+            # The pool cannot be used again; later renders get a fresh one
+            print(f"[PDF Generation Error] {e}")
+            self._restart(executor)
+            return None
+        except Exception as e:
+            print(f"[PDF Generation Error] {e}")
+            return None
+
+    def shutdown(self):
+        """Stop the workers and remove the working directories"""
+        self._executor.shutdown(wait=True)
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_pdf_service() -> PdfRenderService:
+    """Return the process-wide PDF service, starting it on first use"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = PdfRenderService()
+            atexit.register(_service.shutdown)
+        return _service
+
+
+def render_pdf(markdown_text: str) -> Optional[bytes]:
+    """
+    Convert Markdown text to PDF using the warm rendering service
+
+    Args:
+        markdown_text: Markdown content
+
+    Returns:
+        PDF file bytes, or None if conversion failed.
+
+    Raises:
+        DocumentError: If LaTeX rejects the document
+    """
+    return get_pdf_service().render(markdown_text)
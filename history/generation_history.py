@@ -0,0 +1,278 @@
+"""
+Persistent library of generated documents
+Every GenerationResult is stored once in SQLite with an FTS5 index over its text;
+each library (one per user link) lists the documents its owner generated or opened
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import List, Optional
+
+from config import Config
+from data_models import GenerationResult
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    result_id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    content TEXT NOT NULL,
+    paper_format TEXT,
+    writing_style TEXT,
+    length TEXT,
+    model TEXT,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS generations_created ON generations (created_at);
+CREATE TABLE IF NOT EXISTS library (
+    owner TEXT NOT NULL,
+    result_id TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (owner, result_id)
+);
+CREATE INDEX IF NOT EXISTS library_added ON library (owner, added_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5(
+    title, topic, content,
+    content='generations', content_rowid='id',
+    tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS generations_ai AFTER INSERT ON generations BEGIN
+    INSERT INTO generations_fts (rowid, title, topic, content)
+    VALUES (new.id, new.title, new.topic, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS generations_ad AFTER DELETE ON generations BEGIN
+    INSERT INTO generations_fts (generations_fts, rowid, title, topic, content)
+    VALUES ('delete', old.id, old.title, old.topic, old.content);
+END;
+"""
+
+# Columns needed to list entries; the document itself is loaded on open
+ENTRY_COLUMNS = "g.result_id, g.title, g.topic, g.paper_format, g.writing_style, g.length, g.created_at"
+
+SEARCH_TERM_PATTERN = re.compile(r"\w+")
+
+
+@dataclass(slots=True)
+class HistoryEntry:
+    """Summary of a stored document, without its content"""
+    result_id: str
+    title: str
+    topic: str
+    paper_format: Optional[str]
+    writing_style: Optional[str]
+    length: Optional[str]
+    created_at: float
+    snippet: Optional[str] = None
+
+
+def _match_expression(query: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 query
+
+    Every word must match; the last one also matches as a prefix so
+    results update while the user is typing.
+
+    Args:
+        query: Search text as typed by the user
+
+    Returns:
+        FTS5 MATCH expression, or None if the text has no words
+    """
+    terms = SEARCH_TERM_PATTERN.findall(query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class GenerationHistory:
+    """
+    Searchable store of every finished generation
+
+    Documents are shared (identical requests are generated once for
+    everyone), but they are listed, searched and opened only through the
+    libraries that keep them.
+    """
+
+    def __init__(self, db_path: str = Config.HISTORY_DB_PATH):
+        """
+        Open (and create if needed) the history database
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection; one per call keeps the store thread-safe"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add(self, result: GenerationResult):
+        """
+        Store a generation (again storing the same result is a no-op)
+
+        Args:
+            result: Finished generation; its metadata comes from the engineered prompt
+        """
+        metadata = result.metadata
+        # Content is stored once, in its own column; the FTS index reads it from there
+        serialized = result.to_dict()
+        del serialized["content"]
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO generations (result_id, title, topic, content, paper_format, "
+                "writing_style, length, model, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    result.result_id,
+                    result.title,
+                    metadata.get("original_topic", ""),
+                    result.content,
+                    metadata.get("paper_format"),
+                    metadata.get("writing_style"),
+                    metadata.get("length"),
+                    result.model,
+                    json.dumps(serialized),
+                    time.time()
+                )
+            )
+
+    def keep(self, owner: str, result_id: str):
+        """
+        Put a document in a library (keeping it again is a no-op)
+
+        Args:
+            owner: Library ID
+            result_id: ID of the generation
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO library (owner, result_id, added_at) VALUES (?, ?, ?)",
+                (owner, result_id, time.time())
+            )
+
+    def count(self, owner: str, query: str = "") -> int:
+        """
+        Count the documents of a library
+
+        Args:
+            owner: Library ID
+            query: Optional search text
+
+        Returns:
+            Number of documents matching the query
+        """
+        match = _match_expression(query)
+        with closing(self._connect()) as conn:
+            if match is None:
+                row = conn.execute(
+                    "SELECT COUNT(*) FROM library l JOIN generations g ON g.result_id = l.result_id "
+                    "WHERE l.owner = ?",
+                    (owner,)
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT COUNT(*) FROM generations_fts "
+                    "JOIN generations g ON g.id = generations_fts.rowid "
+                    "JOIN library l ON l.result_id = g.result_id "
+                    "WHERE generations_fts MATCH ? AND l.owner = ?",
+                    (match, owner)
+                ).fetchone()
+        return row[0]
+
+    def page(self, owner: str, query: str = "", offset: int = 0,
+             limit: int = Config.HISTORY_PAGE_SIZE) -> List[HistoryEntry]:
+        """
+        List one page of a library, newest first or by relevance when searching
+
+        Args:
+            owner: Library ID
+            query: Optional search text
+            offset: Number of entries to skip
+            limit: Page size
+
+        Returns:
+            Entries of the page, without document content
+        """
+        match = _match_expression(query)
+        with closing(self._connect()) as conn:
+            if match is None:
+                rows = conn.execute(
+                    f"SELECT {ENTRY_COLUMNS}, NULL AS snippet "
+                    "FROM library l JOIN generations g ON g.result_id = l.result_id "
+                    "WHERE l.owner = ? ORDER BY l.added_at DESC LIMIT ? OFFSET ?",
+                    (owner, limit, offset)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {ENTRY_COLUMNS}, "
+                    "snippet(generations_fts, 2, '**', '**', '…', 12) AS snippet "
+                    "FROM generations_fts JOIN generations g ON g.id = generations_fts.rowid "
+                    "JOIN library l ON l.result_id = g.result_id "
+                    "WHERE generations_fts MATCH ? AND l.owner = ? "
+                    "ORDER BY bm25(generations_fts, 10.0, 5.0, 1.0) LIMIT ? OFFSET ?",
+                    (match, owner, limit, offset)
+                ).fetchall()
+        return [HistoryEntry(**dict(row)) for row in rows]
+
+    def get(self, owner: str, result_id: str) -> Optional[GenerationResult]:
+        """
+        Load a document from a library
+
+        Args:
+            owner: Library ID
+            result_id: ID of the generation
+
+        Returns:
+            The GenerationResult, or None if unknown or not in this library
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT g.content, g.result FROM library l JOIN generations g ON g.result_id = l.result_id "
+                "WHERE l.owner = ? AND l.result_id = ?",
+                (owner, result_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return GenerationResult.from_dict({**json.loads(row["result"]), "content": row["content"]})
+
+    def delete(self, result_id: str):
+        """
+        Remove a document, from every library
+
+        Args:
+            result_id: ID of the generation
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM library WHERE result_id = ?", (result_id,))
+            conn.execute("DELETE FROM generations WHERE result_id = ?", (result_id,))
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history() -> GenerationHistory:
+    """Return the process-wide history store, opening it on first use"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = GenerationHistory()
+        return _history
@@ -0,0 +1,411 @@
+"""
+Durable job queue for generations
+Jobs live in SQLite so they survive page reloads and dropped connections
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from uuid import uuid4
+
+from config import Config
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# Identifies this process among all that ever ran, since PIDs are reused
+# after a restart (often the very same PID in a container)
+BOOT_TOKEN = uuid4().hex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    payload TEXT NOT NULL,
+    checkpoint TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    worker_token TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status);
+"""
+
+
+@dataclass(slots=True)
+class Job:
+    """Snapshot of a queued generation"""
+    id: str
+    key: str
+    status: str
+    payload: Dict
+    stage: Optional[str] = None
+    checkpoint: Dict = field(default_factory=dict)
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    worker_pid: Optional[int] = None
+    worker_token: Optional[str] = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job reached a terminal state"""
+        return self.status in (DONE, FAILED)
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        """Build a job from a database row"""
+        return cls(
+            id=row["id"],
+            key=row["key"],
+            status=row["status"],
+            payload=json.loads(row["payload"]),
+            stage=row["stage"],
+            checkpoint=json.loads(row["checkpoint"]),
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            worker_pid=row["worker_pid"],
+            worker_token=row["worker_token"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"]
+        )
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """Check whether a local process still exists"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """Persistent queue of generation jobs"""
+
+    def __init__(self, db_path: str = Config.JOBS_DB_PATH):
+        """
+        Open (and create if needed) the job database
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = db_path
+        self._wakeup = threading.Event()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Databases created before boot tokens existed
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "worker_token" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN worker_token TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection; one per call keeps the queue thread-safe"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, key: str, payload: Dict) -> str:
+        """
+        Queue a job, or return the active job with the same key
+
+        Args:
+            key: Normalized request key used for deduplication
+            payload: JSON-serializable job input
+
+        Returns:
+            Job ID
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status IN (?, ?) "
+                "ORDER BY created_at LIMIT 1",
+                (key, *ACTIVE_STATES)
+            ).fetchone()
+            if row:
+                conn.execute("COMMIT")
+                return row["id"]
+
+            job_id = uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, key, status, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, key, QUEUED, json.dumps(payload), now, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Load a job
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            Job snapshot or None if unknown
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def completed(self, since: float = 0.0, limit: int = None) -> List[Job]:
+        """
+        List finished, successful jobs
+        
+        Args:
+            since: Only jobs completed at or after this timestamp
+            limit: Maximum number of jobs, newest first
+            
+        Returns:
+            Jobs ordered from newest to oldest
+        """
+        query = "SELECT * FROM jobs WHERE status = ? AND updated_at >= ? ORDER BY updated_at DESC"
+        params = [DONE, since]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def claim(self) -> Optional[Job]:
+        """
+        Atomically take the oldest queued job for this process
+
+        Returns:
+            The claimed job or None if the queue is empty
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, worker_token = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, os.getpid(), BOOT_TOKEN, time.time(), row["id"])
+            )
+            claimed = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return Job.from_row(claimed)
+
+    def checkpoint(self, job_id: str, stage: str, data: Optional[Dict] = None):
+        """
+        Record progress so a restarted job can resume from it
+
+        Args:
+            job_id: Job ID
+            stage: Name of the stage the job is in
+            data: Partial output to merge into the checkpoint
+        """
+        with closing(self._connect()) as conn:
+            if data:
+                row = conn.execute("SELECT checkpoint FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                merged = {**json.loads(row["checkpoint"]), **data} if row else data
+                conn.execute(
+                    "UPDATE jobs SET stage = ?, checkpoint = ?, updated_at = ? WHERE id = ?",
+                    (stage, json.dumps(merged), time.time(), job_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET stage = ?, updated_at = ? WHERE id = ?",
+                    (stage, time.time(), job_id)
+                )
+
+    def complete(self, job_id: str, result: Dict):
+        """
+        Mark a job as done
+
+        Args:
+            job_id: Job ID
+            result: JSON-serializable job output
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE id = ?",
+                (DONE, json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id: str, error: str):
+        """
+        Mark a job as failed
+
+        Args:
+            job_id: Job ID
+            error: Message shown to the user
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id)
+            )
+
+    def heartbeat(self):
+        """Mark the jobs this process is running as still alive"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE status = ? AND worker_token = ?",
+                (time.time(), RUNNING, BOOT_TOKEN)
+            )
+
+    def recover(self, stale_after: float = Config.JOB_STALE_SECONDS) -> int:
+        """
+        Requeue running jobs whose worker process has died
+
+        A job of another process is orphaned when that process no longer
+        exists, when its PID is ours (reused after a restart), or when it
+        has not been updated for stale_after seconds; live workers
+        heartbeat more often than that.
+
+        Args:
+            stale_after: Seconds without an update after which a job is abandoned
+
+        Returns:
+            Number of requeued jobs
+        """
+        cutoff = time.time() - stale_after
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, worker_pid, worker_token, updated_at FROM jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            orphaned = [
+                r["id"] for r in rows
+                if r["worker_token"] != BOOT_TOKEN and (
+                    r["worker_pid"] == os.getpid()
+                    or not _pid_alive(r["worker_pid"])
+                    or r["updated_at"] < cutoff
+                )
+            ]
+            for job_id in orphaned:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker_pid = NULL, worker_token = NULL, updated_at = ? "
+                    "WHERE id = ? AND status = ?",
+                    (QUEUED, time.time(), job_id, RUNNING)
+                )
+        if orphaned:
+            self._wakeup.set()
+        return len(orphaned)
+
+    def purge(self, older_than: float = Config.JOB_RETENTION_SECONDS) -> int:
+        """
+        Delete finished jobs
+
+        Args:
+            older_than: Age in seconds after which finished jobs are removed
+
+        Returns:
+            Number of deleted jobs
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - older_than)
+            )
+            return cursor.rowcount
+
+    def wait_for_work(self, timeout: float):
+        """Block until a job is submitted in this process or the timeout expires"""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+
+class JobWorkerPool:
+    """Threads that execute queued jobs in this process"""
+
+    def __init__(self, queue: JobQueue, handler: Callable[[Job, JobQueue], Dict],
+                 workers: int = Config.JOB_WORKERS):
+        """
+        Initialize the pool
+
+        Args:
+            queue: Job queue to consume
+            handler: Function running a job and returning its result;
+                raising marks the job as failed with the exception message
+            workers: Number of worker threads
+        """
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    def start(self):
+        """Recover orphaned jobs and start the worker and heartbeat threads"""
+        self.queue.recover()
+        self.queue.purge()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._maintain, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        """Ask the worker threads to exit after their current job"""
+        self._stop.set()
+        self.queue._wakeup.set()
+
+    def _work(self):
+        """Worker loop"""
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self.queue.wait_for_work(Config.JOB_POLL_INTERVAL)
+                continue
+            try:
+                self.queue.complete(job.id, self.handler(job, self.queue))
+            except Exception as e:
+                print(f"Job Error ({job.id}): {str(e)}")
+                self.queue.fail(job.id, str(e))
+
+    def _maintain(self):
+        """Keep this process's jobs alive and take over those of dead workers"""
+        while not self._stop.wait(Config.JOB_HEARTBEAT_INTERVAL):
+            try:
+                self.queue.heartbeat()
+                self.queue.recover()
+            except Exception as e:
+                print(f"Job Heartbeat Error: {str(e)}")
@@ -0,0 +1,244 @@
+"""
+Record and replay of LLM calls
+Requests made through the OpenAI SDK (OpenRouterClient, the agents) and
+LangChain (the chatbot) are captured at the HTTP layer into JSONL cassettes,
+with response latency and streaming chunk cadence, and served back offline
+so benchmarks and regression tests are deterministic
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from config import Config
+
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+
+def request_key(request: httpx.Request) -> str:
+    """
+    Identify a request by its method, path and canonical JSON body
+
+    Args:
+        request: Outgoing request
+
+    Returns:
+        Hex digest; credentials and headers are not part of it
+    """
+    try:
+        body = json.dumps(json.loads(request.content), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        body = request.content.decode("utf-8", "replace")
+    payload = f"{request.method} {request.url.path}\n{body}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    """
+    Recorded exchanges, one JSON object per line
+
+    Each line holds the request key, status, content type, the latency until
+    the response headers and the body chunks as [milliseconds since the
+    previous chunk, text] pairs.
+    """
+
+    def __init__(self, path: str):
+        """
+        Load a cassette (a missing file is an empty cassette)
+
+        Args:
+            path: JSONL file
+        """
+        self.path = path
+        self._entries: Dict[str, List[dict]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+
+    def next(self, key: str) -> Optional[dict]:
+        """
+        Get the next recorded response for a request
+
+        Identical requests are answered in recording order; once they run
+        out, the last response is repeated.
+
+        Args:
+            key: Request key
+
+        Returns:
+            Recorded exchange, or None if the request was never recorded
+        """
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            index = min(self._cursor[key], len(entries) - 1)
+            self._cursor[key] += 1
+            return entries[index]
+
+    def append(self, entry: dict):
+        """Add an exchange and write it to the file"""
+        with self._lock:
+            self._entries[entry["key"]].append(entry)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    """Passes a response body through, noting each chunk and when it arrived"""
+
+    def __init__(self, stream: httpx.SyncByteStream, cassette: Cassette, entry: dict, received: float):
+        self._stream = stream
+        self._cassette = cassette
+        self._entry = entry
+        self._last = received
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._saved = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            now = time.perf_counter()
+            # Decoded incrementally, so characters split across chunks stay intact
+            text = self._decoder.decode(chunk)
+            if text:
+                self._entry["chunks"].append([round((now - self._last) * 1000, 1), text])
+                self._last = now
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+        if not self._saved:
+            # A stream cancelled by the reader is saved as far as it was read
+            self._saved = True
+            self._cassette.append(self._entry)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Sends requests to the provider and records the exchanges"""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self._inner = httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        # Plain bodies keep the cassette readable and the chunks decodable
+        request.headers["Accept-Encoding"] = "identity"
+        started = time.perf_counter()
+        response = self._inner.handle_request(request)
+        received = time.perf_counter()
+
+        try:
+            model = json.loads(request.content).get("model")
+        except (ValueError, AttributeError):
+            model = None
+        entry = {
+            "key": key,
+            "model": model,
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", ""),
+            "latency": round((received - started) * 1000, 1),
+            "chunks": []
+        }
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, self.cassette, entry, received),
+            extensions=response.extensions
+        )
+
+    def close(self):
+        self._inner.close()
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    """Yields recorded chunks with their original cadence, scaled"""
+
+    def __init__(self, chunks: List[list], time_scale: float):
+        self._chunks = chunks
+        self._time_scale = time_scale
+
+    def __iter__(self) -> Iterator[bytes]:
+        for delay_ms, text in self._chunks:
+            if self._time_scale > 0:
+                time.sleep(delay_ms / 1000 * self._time_scale)
+            yield text.encode("utf-8")
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Answers requests from a cassette without touching the network"""
+
+    def __init__(self, cassette: Cassette, time_scale: float = 1.0):
+        """
+        Args:
+            cassette: Recorded exchanges
+            time_scale: Multiplier for recorded latencies (0 replays instantly)
+        """
+        self.cassette = cassette
+        self.time_scale = time_scale
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        entry = self.cassette.next(request_key(request))
+        if entry is None:
+            # Not retried by the SDKs, unlike a connection error
+            return httpx.Response(
+                status_code=404,
+                json={"error": {"message": f"No recorded response for this request in {self.cassette.path}"}}
+            )
+        if self.time_scale > 0:
+            time.sleep(entry["latency"] / 1000 * self.time_scale)
+        return httpx.Response(
+            status_code=entry["status"],
+            headers={"content-type": entry["content_type"]},
+            stream=_ReplayStream(entry["chunks"], self.time_scale)
+        )
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: str = None) -> Cassette:
+    """Return the process-wide cassette for a path, loading it on first use"""
+    path = path or Config.LLM_CASSETTE_PATH
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+def http_client() -> Optional[httpx.Client]:
+    """
+    HTTP client for the OpenAI SDK and LangChain in the configured mode
+
+    Returns:
+        Recording or replaying client, or None to use the SDK default
+    """
+    mode = Config.LLM_REPLAY_MODE
+    if mode == RECORD:
+        transport = RecordingTransport(get_cassette())
+    elif mode == REPLAY:
+        transport = ReplayTransport(get_cassette(), Config.LLM_REPLAY_TIME_SCALE)
+    else:
+        return None
+    # Same timeouts as the OpenAI SDK default client
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(600, connect=5), follow_redirects=True)
@@ -0,0 +1,442 @@
+"""
+Local validation and repair of generated Markdown
+Catches broken structure and math before it reaches the renderers and xelatex
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+
+FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+HEADING_NO_SPACE = re.compile(r'^(#{1,6})(?=[A-Z])')
+HEADING_LINE = re.compile(r'^#{1,6}\s')
+INLINE_CODE = re.compile(r'(`+)(?:(?!\1).)+?\1', re.DOTALL)
+MACRO_PATTERN = re.compile(r'\\([A-Za-z]+)')
+ENVIRONMENT_PATTERN = re.compile(r'\\(begin|end)\{([^}]*)\}')
+BLANK_LINE = re.compile(r'\n[ \t]*\n')
+
+# Macros outside LaTeX + amsmath/amssymb/unicode-math (what pandoc's template
+# loads), rewritten to supported equivalents
+MACRO_REPLACEMENTS = {
+    "bm": r"\boldsymbol",
+    "mathds": r"\mathbb",
+    "R": r"\mathbb{R}",
+    "N": r"\mathbb{N}",
+    "Z": r"\mathbb{Z}",
+    "Q": r"\mathbb{Q}",
+    "C": r"\mathbb{C}",
+    "E": r"\mathbb{E}",
+    "argmax": r"\operatorname*{arg\,max}",
+    "argmin": r"\operatorname*{arg\,min}",
+    "Var": r"\operatorname{Var}",
+    "Cov": r"\operatorname{Cov}",
+    "tr": r"\operatorname{tr}",
+    "sgn": r"\operatorname{sgn}",
+    "degree": r"^{\circ}",
+}
+
+# Macros taking one argument, rewritten around it
+ARGUMENT_MACROS = {
+    "abs": r"\left|{}\right|",
+    "norm": r"\left\|{}\right\|",
+    "ket": r"\left|{}\right\rangle",
+    "bra": r"\left\langle{}\right|",
+}
+
+# Macros from packages the PDF template does not load, with no safe rewrite
+UNSUPPORTED_MACROS = frozenset({
+    "ce", "pu", "SI", "si", "qty", "unit", "num", "dv", "pdv", "braket",
+    "cancel", "bcancel", "xcancel", "mathbbm"
+})
+
+
+@dataclass(slots=True)
+class Issue:
+    """A problem the local fixes could not resolve"""
+    kind: str
+    message: str
+    start: int
+    end: int
+    blocking: bool = False  # xelatex will fail on it, not just render it oddly
+
+
+@dataclass(slots=True)
+class CheckReport:
+    """Outcome of checking a document"""
+    content: str
+    fixes: int = 0
+    issues: List[Issue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """Whether the document is safe to render"""
+        return not self.issues
+
+
+@dataclass(slots=True)
+class MathSpan:
+    """A math span found in the document"""
+    start: int
+    end: int
+    display: bool
+
+    def body(self, text: str) -> str:
+        """The LaTeX between the delimiters"""
+        width = 2 if self.display else 1
+        return text[self.start + width:self.end - width]
+
+
+def _mask_code(text: str) -> str:
+    """
+    Blank out code so math and structure checks ignore it
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        Text of the same length with code replaced by spaces
+    """
+    lines = text.splitlines(keepends=True)
+    masked = []
+    in_fence = False
+    for line in lines:
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            masked.append(" " * (len(line) - 1) + line[-1:] if line.endswith("\n") else " " * len(line))
+        elif in_fence:
+            masked.append("".join("\n" if c == "\n" else " " for c in line))
+        else:
+            masked.append(line)
+    masked_text = "".join(masked)
+    return INLINE_CODE.sub(lambda m: "".join("\n" if c == "\n" else " " for c in m.group(0)), masked_text)
+
+
+def _blocks(masked: str) -> List[Tuple[int, int]]:
+    """Paragraph ranges; math never spans a blank line"""
+    ranges, start = [], 0
+    for match in BLANK_LINE.finditer(masked):
+        ranges.append((start, match.start()))
+        start = match.end()
+    ranges.append((start, len(masked)))
+    return ranges
+
+
+def _escaped(text: str, index: int) -> bool:
+    """Whether the character at index is preceded by an odd number of backslashes"""
+    count = 0
+    while index > 0 and text[index - 1] == "\\":
+        count += 1
+        index -= 1
+    return count % 2 == 1
+
+
+def find_math(text: str) -> Tuple[List[MathSpan], List[Issue]]:
+    """
+    Locate $...$ and $$...$$ spans the way pandoc reads them
+
+    A lone $ followed by something that looks like LaTeX is reported as
+    unclosed math; a lone $ before a number or a space is treated as
+    currency. Pandoc prints unpaired dollars literally, so delimiter
+    issues are never blocking.
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        Tuple of (math spans, delimiter issues)
+    """
+    masked = _mask_code(text)
+    spans, issues = [], []
+    for block_start, block_end in _blocks(masked):
+        i = block_start
+        while i < block_end:
+            if masked[i] != "$" or _escaped(masked, i):
+                i += 1
+                continue
+
+            if masked.startswith("$$", i):
+                close = masked.find("$$", i + 2, block_end)
+                if close < 0:
+                    issues.append(Issue("math", "Unclosed $$ display math", i, block_end))
+                    break
+                spans.append(MathSpan(i, close + 2, display=True))
+                i = close + 2
+                continue
+
+            # Inline math: no space after the opener, none before the closer,
+            # and the closer must not be followed by a digit
+            close = -1
+            if i + 1 < block_end and not masked[i + 1].isspace():
+                j = i + 1
+                while j < block_end:
+                    if (masked[j] == "$" and not _escaped(masked, j) and not masked[j - 1].isspace()
+                            and not (j + 1 < len(masked) and masked[j + 1].isdigit())):
+                        close = j
+                        break
+                    j += 1
+            if close < 0:
+                line_end = masked.find("\n", i, block_end)
+                rest = masked[i + 1:line_end if line_end >= 0 else block_end]
+                # "$5 for my_app" is prose; snake_case names are not evidence of math
+                if rest[:1].strip() and not rest[:1].isdigit() and re.search(r'\\[A-Za-z]|[\^{]', rest):
+                    issues.append(Issue("math", "Unclosed $ inline math", i, block_end))
+                i += 1
+                continue
+            spans.append(MathSpan(i, close + 1, display=False))
+            i = close + 1
+    return spans, issues
+
+
+def _check_math_body(body: str) -> Optional[str]:
+    """
+    Check the LaTeX inside one math span
+
+    Args:
+        body: LaTeX source
+
+    Returns:
+        Description of the first problem, or None if the body looks valid
+    """
+    depth = 0
+    for index, char in enumerate(body):
+        if char in "{}" and _escaped(body, index):
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth < 0:
+                return "Unbalanced braces"
+    if depth:
+        return "Unbalanced braces"
+
+    if len(re.findall(r'\\left(?![A-Za-z])', body)) != len(re.findall(r'\\right(?![A-Za-z])', body)):
+        return "Unmatched \\left/\\right"
+
+    stack = []
+    for kind, name in ENVIRONMENT_PATTERN.findall(body):
+        if kind == "begin":
+            stack.append(name)
+        elif not stack or stack.pop() != name:
+            return f"Mismatched \\end{{{name}}}"
+    if stack:
+        return f"Unclosed \\begin{{{stack[-1]}}}"
+
+    for macro in MACRO_PATTERN.findall(body):
+        if macro in UNSUPPORTED_MACROS:
+            return f"Unsupported macro \\{macro}"
+    return None
+
+
+def _replace_argument_macros(body: str) -> str:
+    """Rewrite one-argument macros such as \\abs{x}"""
+    for macro, template in ARGUMENT_MACROS.items():
+        pattern = re.compile(r'\\' + macro + r'(?![A-Za-z])\s*\{')
+        while True:
+            match = pattern.search(body)
+            if match is None:
+                break
+            depth, end = 1, match.end()
+            while end < len(body) and depth:
+                if body[end] == "{" and not _escaped(body, end):
+                    depth += 1
+                elif body[end] == "}" and not _escaped(body, end):
+                    depth -= 1
+                end += 1
+            if depth:
+                break
+            argument = body[match.end():end - 1]
+            body = body[:match.start()] + template.format(argument) + body[end:]
+    return body
+
+
+def _fix_math_body(body: str) -> str:
+    """Rewrite unsupported macros that have a safe equivalent"""
+    body = _replace_argument_macros(body)
+    return MACRO_PATTERN.sub(
+        lambda m: MACRO_REPLACEMENTS.get(m.group(1), m.group(0)), body
+    )
+
+
+def _fix_structure(text: str) -> Tuple[str, int]:
+    """
+    Repair Markdown structure line by line
+
+    Adds the space missing after heading hashes, a blank line before
+    headings and the closing fence of an unterminated code block.
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        Tuple of (fixed text, number of fixes)
+    """
+    lines = text.split("\n")
+    fixed, fixes, in_fence, fence = [], 0, False, ""
+    for line in lines:
+        match = FENCE_PATTERN.match(line)
+        if match:
+            if not in_fence:
+                in_fence, fence = True, match.group(1)
+            elif match.group(1) == fence:
+                in_fence = False
+            fixed.append(line)
+            continue
+        if not in_fence:
+            if HEADING_NO_SPACE.match(line):
+                line = HEADING_NO_SPACE.sub(r'\1 ', line)
+                fixes += 1
+            if HEADING_LINE.match(line) and fixed and fixed[-1].strip():
+                fixed.append("")
+                fixes += 1
+        fixed.append(line)
+    if in_fence:
+        fixed.append(fence)
+        fixes += 1
+    return "\n".join(fixed), fixes
+
+
+def _fix_delimiters(text: str) -> Tuple[str, int]:
+    """Convert \\[...\\] and \\(...\\), which pandoc Markdown ignores, to dollars"""
+    masked = _mask_code(text)
+    pieces, fixes, last = [], 0, 0
+    for match in re.finditer(r'\\\[(.+?)\\\]|\\\((.+?)\\\)', masked, re.DOTALL):
+        if _escaped(masked, match.start()):
+            continue
+        display = match.group(1) is not None
+        start, end = match.span(1 if display else 2)
+        body = text[start:end].strip()
+        pieces.append(text[last:match.start()])
+        pieces.append(f"$${body}$$" if display else f"${body}$")
+        last = match.end()
+        fixes += 1
+    pieces.append(text[last:])
+    return "".join(pieces), fixes
+
+
+def _fix_math(text: str) -> Tuple[str, int]:
+    """Apply macro rewrites inside every math span"""
+    spans, _ = find_math(text)
+    pieces, fixes, last = [], 0, 0
+    for span in spans:
+        width = 2 if span.display else 1
+        body = span.body(text)
+        fixed = _fix_math_body(body)
+        if fixed != body:
+            pieces.append(text[last:span.start + width])
+            pieces.append(fixed)
+            last = span.end - width
+            fixes += 1
+    pieces.append(text[last:])
+    return "".join(pieces), fixes
+
+
+def find_issues(text: str) -> List[Issue]:
+    """
+    Report problems that would break rendering
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        Issues in document order
+    """
+    spans, issues = find_math(text)
+    for span in spans:
+        problem = _check_math_body(span.body(text))
+        if problem:
+            issues.append(Issue("math", problem, span.start, span.end, blocking=True))
+    return sorted(issues, key=lambda issue: issue.start)
+
+
+def auto_fix(text: str) -> Tuple[str, int]:
+    """
+    Apply every deterministic fix
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        Tuple of (fixed text, number of fixes)
+    """
+    total = 0
+    for fix in (_fix_structure, _fix_delimiters, _fix_math):
+        text, fixes = fix(text)
+        total += fixes
+    return text, total
+
+
+def check_markdown(text: str) -> CheckReport:
+    """
+    Auto-fix a document and report what is still broken
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        CheckReport with the fixed content and remaining issues
+    """
+    content, fixes = auto_fix(text)
+    return CheckReport(content=content, fixes=fixes, issues=find_issues(content))
+
+
+def fragment_bounds(text: str, issue: Issue) -> Tuple[int, int]:
+    """
+    Expand an issue to the paragraph around it
+
+    Args:
+        text: Markdown text
+        issue: Issue found in the text
+
+    Returns:
+        (start, end) of the enclosing paragraph
+    """
+    start = text.rfind("\n\n", 0, issue.start)
+    end = text.find("\n\n", issue.end)
+    return (0 if start < 0 else start + 2), (len(text) if end < 0 else end)
+
+
+def repair_fragments(text: str, issues: List[Issue],
+                     repair: Callable[[List[str]], List[Optional[str]]],
+                     max_fragments: int) -> Tuple[str, int]:
+    """
+    Replace broken paragraphs with repaired versions
+
+    Only fragments whose repair passes the local checks are accepted.
+
+    Args:
+        text: Markdown text
+        issues: Issues found in the text
+        repair: Function mapping broken fragments to repaired ones (None if it failed)
+        max_fragments: Maximum number of fragments to send for repair
+
+    Returns:
+        Tuple of (text, number of repaired fragments)
+    """
+    bounds = []
+    for issue in issues:
+        start, end = fragment_bounds(text, issue)
+        if bounds and start < bounds[-1][1]:
+            bounds[-1] = (bounds[-1][0], max(end, bounds[-1][1]))
+        else:
+            bounds.append((start, end))
+    bounds = bounds[:max_fragments]
+    if not bounds:
+        return text, 0
+
+    repaired = repair([text[start:end] for start, end in bounds])
+
+    pieces, last, count = [], 0, 0
+    for (start, end), fragment in zip(bounds, repaired):
+        if fragment is None:
+            continue
+        fragment, _ = auto_fix(fragment.strip())
+        if find_issues(fragment):
+            continue
+        pieces.append(text[last:start])
+        pieces.append(fragment)
+        last = end
+        count += 1
+    pieces.append(text[last:])
+    return "".join(pieces), count
@@ -0,0 +1,235 @@
+"""
+Rate limiting and quota tracking for OpenRouter models
+State lives in SQLite so every session and worker process shares the same budget
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from config import Config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    limit_key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_usage (
+    limit_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (limit_key, day)
+);
+"""
+
+
+@dataclass(slots=True)
+class QuotaStatus:
+    """Remaining budget for a model"""
+    limited: bool
+    minute_remaining: int = 0
+    per_minute: int = 0
+    day_remaining: int = 0
+    per_day: int = 0
+
+
+def limit_key(model: str) -> str:
+    """
+    Map a model to the budget it draws from
+
+    OpenRouter applies one shared limit to all `:free` model variants.
+
+    Args:
+        model: OpenRouter model ID
+
+    Returns:
+        Budget name used in the limit tables
+    """
+    return "free" if model.endswith(":free") else model
+
+
+def _today() -> str:
+    """Current UTC day, when OpenRouter daily limits reset"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class RateLimiter:
+    """Token bucket per minute plus daily request quota"""
+
+    def __init__(self, db_path: str = Config.RATE_LIMIT_DB_PATH):
+        """
+        Open (and create if needed) the rate limit database
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection; one per call keeps the limiter thread-safe"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _limits(key: str) -> Optional[Tuple[int, int]]:
+        """(per minute, per day) limits for a budget, or None if unlimited"""
+        return Config.RATE_LIMITS.get(key)
+
+    def _refill(self, conn: sqlite3.Connection, key: str, per_minute: int, now: float) -> float:
+        """Current bucket level after refilling for the elapsed time"""
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM buckets WHERE limit_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return float(per_minute)
+        rate = per_minute / 60.0
+        return min(float(per_minute), row["tokens"] + (now - row["updated_at"]) * rate)
+
+    def try_acquire(self, model: str) -> Tuple[bool, float]:
+        """
+        Take one request from the model's budget if available
+
+        Args:
+            model: OpenRouter model ID
+
+        Returns:
+            Tuple of (acquired, seconds until a retry may succeed);
+            the wait is infinite when the daily quota is exhausted
+        """
+        key = limit_key(model)
+        limits = self._limits(key)
+        if limits is None:
+            return True, 0.0
+        per_minute, per_day = limits
+
+        now = time.time()
+        day = _today()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT requests FROM daily_usage WHERE limit_key = ? AND day = ?", (key, day)
+            ).fetchone()
+            if row is not None and row["requests"] >= per_day:
+                conn.execute("COMMIT")
+                return False, float("inf")
+
+            tokens = self._refill(conn, key, per_minute, now)
+            if tokens < 1.0:
+                conn.execute("COMMIT")
+                return False, (1.0 - tokens) * 60.0 / per_minute
+
+            conn.execute(
+                "INSERT INTO buckets (limit_key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(limit_key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens - 1.0, now)
+            )
+            conn.execute(
+                "INSERT INTO daily_usage (limit_key, day, requests) VALUES (?, ?, 1) "
+                "ON CONFLICT(limit_key, day) DO UPDATE SET requests = requests + 1",
+                (key, day)
+            )
+            conn.execute("COMMIT")
+            return True, 0.0
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def acquire(self, model: str, max_wait: float = Config.RATE_LIMIT_MAX_WAIT) -> bool:
+        """
+        Wait for a request slot, shedding the request if none frees up in time
+
+        Args:
+            model: OpenRouter model ID
+            max_wait: Maximum seconds to queue
+
+        Returns:
+            True if the request may be sent
+        """
+        deadline = time.time() + max_wait
+        while True:
+            acquired, retry_after = self.try_acquire(model)
+            if acquired:
+                return True
+            remaining = deadline - time.time()
+            if retry_after > remaining:
+                return False
+            time.sleep(max(retry_after, 0.05))
+
+    def backoff(self, model: str, seconds: float = Config.RATE_LIMIT_BACKOFF):
+        """
+        Drain the bucket after the provider answered 429
+
+        Args:
+            model: OpenRouter model ID
+            seconds: How long no request should be admitted
+        """
+        key = limit_key(model)
+        limits = self._limits(key)
+        if limits is None:
+            return
+        tokens = -seconds * limits[0] / 60.0
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO buckets (limit_key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(limit_key) DO UPDATE SET tokens = MIN(tokens, excluded.tokens), "
+                "updated_at = excluded.updated_at",
+                (key, tokens, time.time())
+            )
+
+    def status(self, model: str) -> QuotaStatus:
+        """
+        Report the remaining budget without consuming it
+
+        Args:
+            model: OpenRouter model ID
+
+        Returns:
+            QuotaStatus for the model's budget
+        """
+        key = limit_key(model)
+        limits = self._limits(key)
+        if limits is None:
+            return QuotaStatus(limited=False)
+        per_minute, per_day = limits
+
+        with closing(self._connect()) as conn:
+            tokens = self._refill(conn, key, per_minute, time.time())
+            row = conn.execute(
+                "SELECT requests FROM daily_usage WHERE limit_key = ? AND day = ?", (key, _today())
+            ).fetchone()
+        used = row["requests"] if row else 0
+        return QuotaStatus(
+            limited=True,
+            minute_remaining=max(0, int(tokens)),
+            per_minute=per_minute,
+            day_remaining=max(0, per_day - used),
+            per_day=per_day
+        )
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter, opening it on first use"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
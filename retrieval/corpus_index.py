@@ -0,0 +1,517 @@
+"""
+Local corpus index for grounding generations
+Passages from PDFs, Markdown and BibTeX are kept in SQLite; the inverted
+index is a set of memory-mapped NumPy arrays rebuilt when files change
+"""
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+from similarity_cache import normalize_topic
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS passages (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    citation TEXT NOT NULL,
+    text TEXT NOT NULL,
+    terms TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS passages_path ON passages (path);
+CREATE TABLE IF NOT EXISTS refresh_lease (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+MARKDOWN_EXTENSIONS = (".md", ".markdown", ".txt")
+BIBTEX_EXTENSIONS = (".bib",)
+PDF_EXTENSIONS = (".pdf",)
+
+BIB_ENTRY_START = re.compile(r'@(\w+)\s*\{\s*([^,\s]+)\s*,')
+BIB_FIELD_NAME = re.compile(r'\s*(\w+)\s*=\s*')
+HEADING = re.compile(r'^#{1,6}\s+(.+?)\s*#*\s*$', re.MULTILINE)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+@dataclass(slots=True)
+class Passage:
+    """A retrieved piece of the corpus"""
+    citation: str
+    text: str
+    source: str
+    score: float = 0.0
+
+
+def _chunk_paragraphs(paragraphs: List[str], max_words: int) -> Iterator[str]:
+    """Merge consecutive paragraphs into passages of about max_words words"""
+    buffer, words = [], 0
+    for paragraph in paragraphs:
+        count = len(paragraph.split())
+        if buffer and words + count > max_words:
+            yield "\n\n".join(buffer)
+            buffer, words = [], 0
+        buffer.append(paragraph)
+        words += count
+    if buffer:
+        yield "\n\n".join(buffer)
+
+
+def _read_markdown(path: str, max_words: int) -> List[Tuple[str, str]]:
+    """(citation, text) passages of a Markdown or text file"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    heading = HEADING.search(text)
+    title = heading.group(1) if heading else os.path.splitext(os.path.basename(path))[0]
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+    return [(title, chunk) for chunk in _chunk_paragraphs(paragraphs, max_words)]
+
+
+def _read_pdf(path: str, max_words: int) -> List[Tuple[str, str]]:
+    """(citation, text) passages of a PDF, one or more per page (needs pypdf)"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        print(f"[Retrieval] Skipping {path}: install pypdf to index PDFs")
+        return []
+
+    reader = PdfReader(path)
+    title = (reader.metadata.title if reader.metadata else None) or os.path.splitext(os.path.basename(path))[0]
+    passages = []
+    for number, page in enumerate(reader.pages, 1):
+        paragraphs = [p.strip() for p in re.split(r'\n\s*\n', page.extract_text() or "") if p.strip()]
+        passages += [(f"{title}, p. {number}", chunk) for chunk in _chunk_paragraphs(paragraphs, max_words)]
+    return passages
+
+
+def _bib_value(text: str, start: int) -> Tuple[str, int]:
+    """Read a braced, quoted or bare BibTeX value starting at `start`"""
+    if start >= len(text):
+        return "", start
+    if text[start] == "{":
+        depth, i = 0, start
+        while i < len(text):
+            if text[i] == "{":
+                depth += 1
+            elif text[i] == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start + 1:i], i + 1
+            i += 1
+        return text[start + 1:], len(text)
+    if text[start] == '"':
+        end = text.find('"', start + 1)
+        end = len(text) if end < 0 else end
+        return text[start + 1:end], end + 1
+    match = re.match(r'[^,}\s]+', text[start:])
+    value = match.group(0) if match else ""
+    return value, start + len(value)
+
+
+def parse_bibtex(text: str) -> List[Dict[str, str]]:
+    """
+    Parse BibTeX entries
+
+    Args:
+        text: Contents of a .bib file
+
+    Returns:
+        One dict per entry with lowercase field names, plus "key" and "type"
+    """
+    entries = []
+    for match in BIB_ENTRY_START.finditer(text):
+        entry = {"type": match.group(1).lower(), "key": match.group(2)}
+        i = match.end()
+        while i < len(text):
+            field = BIB_FIELD_NAME.match(text, i)
+            if not field:
+                break
+            value, i = _bib_value(text, field.end())
+            entry[field.group(1).lower()] = " ".join(value.replace("{", "").replace("}", "").split())
+            while i < len(text) and text[i] in " \t\r\n,":
+                i += 1
+            if i < len(text) and text[i] == "}":
+                break
+        entries.append(entry)
+    return entries
+
+
+def format_citation(entry: Dict[str, str]) -> str:
+    """Author (year). Title. Venue."""
+    authors = entry.get("author", "").split(" and ")
+    author = authors[0] + (" et al." if len(authors) > 2 else f" and {authors[1]}" if len(authors) == 2 else "")
+    parts = [f"{author or entry['key']} ({entry.get('year', 'n.d.')})", entry.get("title", "")]
+    venue = entry.get("journal") or entry.get("booktitle") or entry.get("publisher")
+    if venue:
+        parts.append(venue)
+    return ". ".join(p for p in parts if p) + "."
+
+
+def _read_bibtex(path: str, max_words: int) -> List[Tuple[str, str]]:
+    """(citation, text) passages of a BibTeX file, one per entry"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        entries = parse_bibtex(f.read())
+    passages = []
+    for entry in entries:
+        text = " ".join(entry.get(k, "") for k in ("title", "abstract", "keywords") if entry.get(k))
+        if text:
+            passages.append((format_citation(entry), " ".join(text.split()[:max_words])))
+    return passages
+
+
+def _reader(path: str):
+    """Extraction function for a file type, or None if unsupported"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in MARKDOWN_EXTENSIONS:
+        return _read_markdown
+    if extension in BIBTEX_EXTENSIONS:
+        return _read_bibtex
+    if extension in PDF_EXTENSIONS:
+        return _read_pdf
+    return None
+
+
+def _generation_time(name: str) -> int:
+    """Creation time (ns) encoded in an index generation name, 0 if malformed"""
+    try:
+        return int(name[len("index-"):])
+    except ValueError:
+        return 0
+
+
+class CorpusIndex:
+    """BM25 search over a folder of documents"""
+
+    def __init__(self, corpus_dir: str = Config.CORPUS_DIR,
+                 index_dir: str = Config.RETRIEVAL_INDEX_DIR,
+                 passage_words: int = Config.RETRIEVAL_PASSAGE_WORDS):
+        """
+        Open (and create if needed) the index
+
+        Args:
+            corpus_dir: Folder with the user's PDFs, Markdown and BibTeX files
+            index_dir: Folder holding the passage store and index arrays
+            passage_words: Approximate passage size in words
+        """
+        self.corpus_dir = corpus_dir
+        self.index_dir = index_dir
+        self.passage_words = passage_words
+        self._lock = threading.Lock()
+        self._loaded: Optional[str] = None  # generation currently mapped
+        self._arrays: Dict = {}
+        self._lexicon: Dict[str, List[int]] = {}
+        self._last_refresh = 0.0
+        self._owner = uuid.uuid4().hex  # identifies this instance's refresh lease
+
+        os.makedirs(index_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the passage store"""
+        conn = sqlite3.connect(os.path.join(self.index_dir, "passages.db"), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        """Supported files of the corpus with their mtime and size"""
+        found = {}
+        for root, _, names in os.walk(self.corpus_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if _reader(path) is not None:
+                    stat = os.stat(path)
+                    found[os.path.relpath(path, self.corpus_dir)] = (stat.st_mtime, stat.st_size)
+        return found
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Re-index files added, changed or removed since the last refresh
+
+        Only changed files are read again; the index arrays are rebuilt
+        from the stored term counts when anything changed. One process
+        refreshes at a time; the others skip and load its result.
+
+        Args:
+            force: Scan even if the refresh interval has not elapsed
+
+        Returns:
+            Number of files (re)indexed or removed
+        """
+        with self._lock:
+            if not force and time.time() - self._last_refresh < Config.RETRIEVAL_REFRESH_INTERVAL:
+                return 0
+            self._last_refresh = time.time()
+            if not os.path.isdir(self.corpus_dir):
+                return 0
+
+            if not self._acquire_lease():
+                return 0
+            try:
+                found = self._scan()
+                with closing(self._connect()) as conn:
+                    known = {r["path"]: (r["mtime"], r["size"]) for r in conn.execute("SELECT * FROM files")}
+                    changed = [p for p, sig in found.items() if known.get(p) != sig]
+                    removed = [p for p in known if p not in found]
+
+                    for path in removed:
+                        conn.execute("DELETE FROM passages WHERE path = ?", (path,))
+                        conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                    for path in changed:
+                        self._index_file(conn, path, *found[path])
+
+                if changed or removed or self._current() is None:
+                    self._build()
+                return len(changed) + len(removed)
+            finally:
+                self._release_lease()
+
+    def _acquire_lease(self) -> bool:
+        """
+        Take the refresh lease shared by every process using this index
+
+        A lease left behind by a crashed process expires after
+        RETRIEVAL_REFRESH_LEASE seconds.
+
+        Returns:
+            True if this instance may refresh now
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT owner, expires_at FROM refresh_lease WHERE id = 0").fetchone()
+                if row is not None and row["owner"] != self._owner and row["expires_at"] > now:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO refresh_lease (id, owner, expires_at) VALUES (0, ?, ?)",
+                    (self._owner, now + Config.RETRIEVAL_REFRESH_LEASE)
+                )
+                conn.execute("COMMIT")
+                return True
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _release_lease(self):
+        """Give the refresh lease back"""
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("DELETE FROM refresh_lease WHERE id = 0 AND owner = ?", (self._owner,))
+        except sqlite3.Error as e:
+            print(f"[Retrieval] Could not release the refresh lease: {e}")
+
+    def _index_file(self, conn: sqlite3.Connection, path: str, mtime: float, size: int):
+        """Replace the stored passages of one file"""
+        full_path = os.path.join(self.corpus_dir, path)
+        try:
+            passages = _reader(full_path)(full_path, self.passage_words)
+        except Exception as e:
+            print(f"[Retrieval] Could not index {path}: {e}")
+            passages = []
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM passages WHERE path = ?", (path,))
+            for citation, text in passages:
+                terms = Counter(normalize_topic(text))
+                conn.execute(
+                    "INSERT INTO passages (path, citation, text, terms, length) VALUES (?, ?, ?, ?, ?)",
+                    (path, citation, text, json.dumps(terms), sum(terms.values()))
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                (path, mtime, size)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _current(self) -> Optional[str]:
+        """Name of the latest complete index generation"""
+        try:
+            with open(os.path.join(self.index_dir, "CURRENT"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _build(self):
+        """Write a new index generation and make it current"""
+        import numpy as np
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT id, terms, length FROM passages ORDER BY id").fetchall()
+
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc, row in enumerate(rows):
+            for term, count in json.loads(row["terms"]).items():
+                postings[term].append((doc, count))
+
+        lexicon, docs, tfs, offset = {}, [], [], 0
+        for term in sorted(postings):
+            entries = postings[term]
+            lexicon[term] = [offset, len(entries)]
+            docs.extend(d for d, _ in entries)
+            tfs.extend(c for _, c in entries)
+            offset += len(entries)
+
+        generation = f"index-{time.time_ns()}"
+        path = os.path.join(self.index_dir, generation)
+        os.makedirs(path)
+        np.save(os.path.join(path, "docs.npy"), np.array(docs, dtype=np.uint32))
+        np.save(os.path.join(path, "tfs.npy"), np.array(tfs, dtype=np.float32))
+        np.save(os.path.join(path, "ids.npy"), np.array([r["id"] for r in rows], dtype=np.int64))
+        np.save(os.path.join(path, "lengths.npy"), np.array([r["length"] for r in rows], dtype=np.float32))
+        with open(os.path.join(path, "lexicon.json"), "w", encoding="utf-8") as f:
+            json.dump(lexicon, f)
+
+        pointer = os.path.join(self.index_dir, "CURRENT.tmp")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(generation)
+        os.replace(pointer, os.path.join(self.index_dir, "CURRENT"))
+
+        # Only generations older than the new one are removed, so a build
+        # that outlived its lease never loses its files. They may still be
+        # mapped elsewhere; deletion is best effort
+        for name in os.listdir(self.index_dir):
+            if name.startswith("index-") and _generation_time(name) < _generation_time(generation):
+                shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+
+    def _load(self) -> bool:
+        """Map the current index generation if it changed"""
+        import numpy as np
+
+        generation = self._current()
+        if generation is None:
+            return False
+        if generation == self._loaded:
+            return True
+        path = os.path.join(self.index_dir, generation)
+        try:
+            with open(os.path.join(path, "lexicon.json"), encoding="utf-8") as f:
+                self._lexicon = json.load(f)
+            self._arrays = {
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                for name in ("docs", "tfs", "ids", "lengths")
+            }
+        except (OSError, ValueError) as e:
+            print(f"[Retrieval] Could not load index {generation}: {e}")
+            return False
+        self._loaded = generation
+        return True
+
+    def search(self, query: str, top_k: int = Config.RETRIEVAL_TOP_K) -> List[Passage]:
+        """
+        Find the passages most relevant to a query
+
+        Args:
+            query: Free-text query, e.g. the research topic
+            top_k: Number of passages to return
+
+        Returns:
+            Passages ordered by BM25 score, best first
+        """
+        import numpy as np
+
+        terms = [t for t in dict.fromkeys(normalize_topic(query))]
+        with self._lock:
+            if not terms or not self._load():
+                return []
+            lexicon, arrays = self._lexicon, self._arrays
+
+        lengths = arrays["lengths"]
+        count = len(lengths)
+        if count == 0:
+            return []
+        average = float(lengths.mean()) or 1.0
+        scores = np.zeros(count, dtype=np.float32)
+        for term in terms:
+            if term not in lexicon:
+                continue
+            offset, df = lexicon[term]
+            docs = arrays["docs"][offset:offset + df]
+            tfs = arrays["tfs"][offset:offset + df]
+            idf = np.log(1.0 + (count - df + 0.5) / (df + 0.5))
+            norm = K1 * (1.0 - B + B * lengths[docs] / average)
+            scores[docs] += idf * tfs * (K1 + 1.0) / (tfs + norm)
+
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        if top_k == 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+
+        ids = [int(arrays["ids"][doc]) for doc in best]
+        with closing(self._connect()) as conn:
+            rows = {
+                r["id"]: r for r in conn.execute(
+                    f"SELECT id, path, citation, text FROM passages WHERE id IN ({','.join('?' * len(ids))})", ids
+                )
+            }
+        return [
+            Passage(citation=rows[i]["citation"], text=rows[i]["text"], source=rows[i]["path"], score=float(scores[doc]))
+            for i, doc in zip(ids, best) if i in rows
+        ]
+
+
+def format_sources(passages: List[Passage]) -> str:
+    """
+    Render passages as a numbered reference block for the prompt
+
+    Args:
+        passages: Retrieved passages
+
+    Returns:
+        Text appended to the engineered prompt
+    """
+    lines = [
+        "REFERENCE MATERIAL (from the user's own library):",
+        "Ground the content in these sources. Cite them in the text as [n] and list the ones you "
+        "use in a References section. Do not invent references that are not listed here.",
+        ""
+    ]
+    citations = list(dict.fromkeys(p.citation for p in passages))
+    for number, citation in enumerate(citations, 1):
+        lines.append(f"[{number}] {citation}")
+        for passage in passages:
+            if passage.citation == citation:
+                lines.append(f"    \"{' '.join(passage.text.split())}\"")
+    return "\n".join(lines)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_corpus_index() -> CorpusIndex:
+    """Return the process-wide corpus index, opening it on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CorpusIndex()
+        return _index
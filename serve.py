@@ -0,0 +1,214 @@
+"""
+Multi-process serving mode
+Starts several Streamlit worker processes and spreads clients across them
+
+Every worker shares the job queue, rate limits, history, retrieval index and
+the shared store (exports, rendered HTML, agent results, chat sessions) through
+SQLite files under data/, so a browser that reconnects to another worker
+resumes its conversation and document from the URL. Downloads and uploads
+(/media, /_stcore/upload_file) only exist in the process that created them, so
+every connection of a client goes to the same worker, chosen by its IP address.
+
+Usage:
+    python serve.py [--workers N] [--port PORT]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+import zlib
+from typing import List, Optional
+
+from config import Config
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+RESTART_DELAY = 2.0  # seconds before a crashed worker is started again
+CONNECT_RETRIES = 3  # other workers tried when one refuses a connection
+
+
+class Worker:
+    """One Streamlit process and the connections currently routed to it"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.process: Optional[subprocess.Popen] = None
+        self.connections = 0
+
+    def start(self):
+        """Launch the Streamlit server on this worker's port"""
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "streamlit", "run", "main.py",
+                "--server.port", str(self.port),
+                "--server.address", "127.0.0.1",
+                "--server.headless", "true"
+            ],
+            cwd=ROOT
+        )
+        print(f"Worker on port {self.port} started (pid {self.process.pid})")
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        """Terminate the process, killing it if it does not exit in time"""
+        if not self.alive:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class Balancer:
+    """TCP proxy keeping each client on one live worker"""
+
+    def __init__(self, workers: List[Worker]):
+        self.workers = workers
+
+    def _pick(self, client: str, exclude: List[Worker]) -> Optional[Worker]:
+        """
+        Choose the worker for a connection
+
+        The client's IP address selects its worker, so the page, its
+        WebSocket and its download links all reach the same process.
+        Clients behind one NAT share a worker. Only when that worker is
+        down does the connection go to the least busy other one.
+
+        Args:
+            client: Client IP address
+            exclude: Workers that already refused this connection
+
+        Returns:
+            Worker to connect to, or None if none is available
+        """
+        candidates = [w for w in self.workers if w.alive and w not in exclude]
+        if not candidates:
+            return None
+        preferred = self.workers[zlib.crc32(client.encode("utf-8")) % len(self.workers)]
+        if preferred in candidates:
+            return preferred
+        return min(candidates, key=lambda w: w.connections)
+
+    async def handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        """
+        Proxy one client connection (HTTP or WebSocket) to a worker
+
+        A WebSocket stays on the worker it was opened on for its whole
+        lifetime, which keeps the Streamlit session in one process.
+        """
+        peer = client_writer.get_extra_info("peername")
+        client = peer[0] if peer else ""
+        tried: List[Worker] = []
+        while len(tried) <= CONNECT_RETRIES:
+            worker = self._pick(client, tried)
+            if worker is None:
+                break
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", worker.port)
+            except OSError:
+                # Still starting up or just crashed; try another worker
+                tried.append(worker)
+                continue
+
+            worker.connections += 1
+            try:
+                await asyncio.gather(
+                    _pipe(client_reader, upstream_writer),
+                    _pipe(upstream_reader, client_writer)
+                )
+            finally:
+                worker.connections -= 1
+            return
+
+        client_writer.close()
+
+    async def supervise(self):
+        """Restart workers that exited unexpectedly"""
+        while True:
+            await asyncio.sleep(RESTART_DELAY)
+            for worker in self.workers:
+                if worker.process is not None and not worker.alive:
+                    print(f"Worker on port {worker.port} exited with code {worker.process.returncode}, restarting")
+                    worker.start()
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Copy bytes in one direction until either side closes"""
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        try:
+            writer.close()
+        except Exception:
+            pass
+
+
+async def serve(workers: List[Worker], port: int):
+    """
+    Run the balancer on the public port until cancelled
+
+    Args:
+        workers: Started workers
+        port: Public port
+    """
+    balancer = Balancer(workers)
+    server = await asyncio.start_server(balancer.handle, "0.0.0.0", port)
+    print(f"Serving {len(workers)} workers on http://localhost:{port}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: KeyboardInterrupt ends the loop instead
+            pass
+
+    supervisor = asyncio.create_task(balancer.supervise())
+    async with server:
+        await stop.wait()
+    supervisor.cancel()
+
+
+def main():
+    """Start the workers and the balancer"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=Config.SERVE_WORKERS or os.cpu_count() or 1,
+                        help="Streamlit worker processes")
+    parser.add_argument("--port", type=int, default=Config.SERVE_PORT, help="Public port")
+    args = parser.parse_args()
+
+    workers = [Worker(Config.SERVE_BASE_PORT + i) for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    # Give the workers a head start before accepting connections
+    time.sleep(RESTART_DELAY)
+
+    try:
+        asyncio.run(serve(workers, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Stopping workers")
+        for worker in workers:
+            worker.stop()
+
+
+if __name__ == "__main__":
+    main()
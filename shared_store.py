@@ -0,0 +1,160 @@
+"""
+Shared local store for caches and session data
+One SQLite database in WAL mode, used by every Streamlit worker process on the host
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, Optional
+
+from config import Config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (namespace, accessed_at);
+"""
+
+
+class SharedStore:
+    """Namespaced key-value store with expiry and per-namespace size limits"""
+
+    def __init__(self, db_path: str = Config.SHARED_STORE_PATH):
+        """
+        Open (and create if needed) the store
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = db_path
+        self._writes: Dict[str, int] = {}  # per namespace, since its last eviction pass
+        self._writes_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection; one per call keeps the store thread-safe"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """
+        Read a value
+
+        Args:
+            namespace: Cache or data kind, e.g. "export"
+            key: Entry key
+
+        Returns:
+            Stored bytes, or None if missing or expired
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            if expires_at is not None and expires_at < now:
+                return None
+            # Recency only needs to be approximate; avoid a write per read
+            if now - accessed_at > Config.SHARED_STORE_TOUCH_INTERVAL:
+                conn.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key)
+                )
+        return bytes(value)
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None):
+        """
+        Write a value
+
+        Args:
+            namespace: Cache or data kind
+            key: Entry key
+            value: Bytes to store
+            ttl: Seconds until the entry expires (None keeps it until evicted)
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value, now + ttl if ttl else None, now)
+            )
+        with self._writes_lock:
+            writes = self._writes.get(namespace, 0) + 1
+            self._writes[namespace] = 0 if writes >= Config.SHARED_STORE_EVICT_EVERY else writes
+        if writes >= Config.SHARED_STORE_EVICT_EVERY:
+            self.evict(namespace)
+
+    def delete(self, namespace: str, key: str):
+        """
+        Remove a value
+
+        Args:
+            namespace: Cache or data kind
+            key: Entry key
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def get_json(self, namespace: str, key: str) -> Any:
+        """Read a JSON value (None if missing)"""
+        value = self.get(namespace, key)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        """Write a JSON-serializable value"""
+        self.set(namespace, key, json.dumps(value).encode("utf-8"), ttl)
+
+    def evict(self, namespace: str) -> int:
+        """
+        Drop expired entries and the least recently used beyond the namespace limit
+
+        Args:
+            namespace: Cache or data kind
+
+        Returns:
+            Number of deleted entries
+        """
+        limit = Config.SHARED_STORE_LIMITS.get(namespace, Config.SHARED_STORE_DEFAULT_LIMIT)
+        with closing(self._connect()) as conn:
+            expired = conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND expires_at < ?", (namespace, time.time())
+            ).rowcount
+            evicted = conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key IN ("
+                "SELECT key FROM entries WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (namespace, namespace, limit)
+            ).rowcount
+        return expired + evicted
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store() -> SharedStore:
+    """Return the process-wide handle to the shared store, opening it on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SharedStore()
+        return _store
@@ -0,0 +1,263 @@
+"""
+Near-duplicate request detection for finished generations
+Topics are normalized and compared with TF-IDF cosine similarity in NumPy
+"""
+
+import math
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from data_models import UserInput
+from jobs.job_queue import JobQueue
+
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be been being between by can could did do does for from has
+have how in into is it its of on or over s should than that the their them these
+this those through to towards under upon versus vs was were what when where which
+while who why will with within without would
+""".split())
+
+# Irregular forms the suffix rules below would get wrong
+LEMMA_EXCEPTIONS = {
+    "children": "child",
+    "people": "person",
+    "women": "woman",
+    "men": "man",
+    "data": "data",
+    "analyses": "analysis",
+    "hypotheses": "hypothesis",
+    "theses": "thesis",
+    "criteria": "criterion",
+    "phenomena": "phenomenon"
+}
+
+
+def lemmatize(word: str) -> str:
+    """
+    Reduce a word to an approximate lemma with light suffix rules
+
+    Args:
+        word: Lowercase word
+
+    Returns:
+        Lemma, e.g. "studies" -> "study", "learning" -> "learn"
+    """
+    if word in LEMMA_EXCEPTIONS:
+        return LEMMA_EXCEPTIONS[word]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("sses"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed") and not word.endswith("eed"):
+        return word[:-2]
+    return word
+
+
+def normalize_topic(topic: str) -> List[str]:
+    """
+    Split a topic into lemmas without stopwords
+
+    Args:
+        topic: Free-text topic
+
+    Returns:
+        Lemmas in their original order
+    """
+    text = topic.lower().replace("'s", " ").replace("’s", " ")
+    return [lemmatize(w) for w in WORD_PATTERN.findall(text) if w not in STOPWORDS]
+
+
+def topic_features(topic: str) -> Dict[str, int]:
+    """
+    Count the features of a topic
+
+    Lemmas capture the wording; character trigrams of each lemma make
+    "health care" and "healthcare" land close together.
+
+    Args:
+        topic: Free-text topic
+
+    Returns:
+        Feature -> count
+    """
+    counts: Dict[str, int] = {}
+    for lemma in normalize_topic(topic):
+        counts["w:" + lemma] = counts.get("w:" + lemma, 0) + 1
+        padded = f"#{lemma}#"
+        for i in range(len(padded) - 2):
+            gram = "c:" + padded[i:i + 3]
+            counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def _hash_features(counts: Dict[str, int], dimensions: int):
+    """
+    Sublinear term frequencies in a hashed feature space, as a sparse row
+
+    Returns:
+        Tuple of (sorted feature indices, their weights)
+    """
+    import numpy as np
+
+    weights: Dict[int, float] = {}
+    for feature, count in counts.items():
+        index = zlib.crc32(feature.encode("utf-8")) % dimensions
+        weights[index] = weights.get(index, 0.0) + 1.0 + math.log(count)
+    indices = np.array(sorted(weights), dtype=np.int32)
+    return indices, np.array([weights[i] for i in indices.tolist()], dtype=np.float32)
+
+
+@dataclass(slots=True)
+class SimilarMatch:
+    """An earlier generation that can answer a request"""
+    job_id: str
+    topic: str
+    similarity: float
+
+
+class SimilarityCache:
+    """Index of finished generations searchable by topic similarity"""
+
+    def __init__(self, jobs: JobQueue,
+                 threshold: float = Config.SIMILARITY_THRESHOLD,
+                 max_entries: int = Config.SIMILARITY_MAX_ENTRIES,
+                 dimensions: int = Config.SIMILARITY_DIMENSIONS):
+        """
+        Initialize the index; it is filled from the job queue on first lookup
+
+        Args:
+            jobs: Job queue holding finished generations
+            threshold: Minimum cosine similarity for a match
+            max_entries: Maximum number of indexed generations
+            dimensions: Size of the hashed feature space
+        """
+        self.jobs = jobs
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._entries: List[Tuple[str, str, str]] = []  # (job_id, request key, topic)
+        self._rows: list = []  # sparse term frequencies (indices, weights), one per entry
+        self._df = None  # indexed entries per feature (NumPy loads on first sync)
+        self._synced_at = 0.0
+        self._synced_ids: set = set()  # jobs indexed at exactly _synced_at
+
+    @staticmethod
+    def _request_key(user_input: UserInput) -> str:
+        """Options that must match exactly"""
+        return "|".join([user_input.paper_format, user_input.writing_style, user_input.length])
+
+    def _sync(self):
+        """Index generations finished since the last sync"""
+        import numpy as np
+
+        if self._df is None:
+            self._df = np.zeros(self.dimensions, dtype=np.int32)
+        # Jobs finishing in the same instant as the last synced one come
+        # back again; the ids seen at that instant filter them out
+        new_jobs = [
+            job for job in self.jobs.completed(since=self._synced_at, limit=self.max_entries)
+            if not (job.updated_at == self._synced_at and job.id in self._synced_ids)
+        ]
+        if not new_jobs:
+            return
+        if new_jobs[0].updated_at != self._synced_at:
+            self._synced_at = new_jobs[0].updated_at
+            self._synced_ids = set()
+        self._synced_ids.update(job.id for job in new_jobs if job.updated_at == self._synced_at)
+
+        # Oldest first, so the newest entries end up at the end
+        for job in reversed(new_jobs):
+            user_input = UserInput.from_dict(job.payload)
+            row = _hash_features(topic_features(user_input.topic), self.dimensions)
+            if not len(row[0]):
+                continue  # nothing but stopwords; can never match
+            self._entries.append((job.id, self._request_key(user_input), user_input.topic))
+            self._rows.append(row)
+            self._df[row[0]] += 1
+
+        excess = len(self._entries) - self.max_entries
+        if excess > 0:
+            for indices, _ in self._rows[:excess]:
+                self._df[indices] -= 1
+            del self._entries[:excess]
+            del self._rows[:excess]
+
+    def lookup(self, user_input: UserInput) -> Optional[SimilarMatch]:
+        """
+        Find the most similar earlier generation for a request
+
+        Args:
+            user_input: Request to match
+
+        Returns:
+            Best match at or above the threshold, or None
+        """
+        import numpy as np
+
+        with self._lock:
+            try:
+                self._sync()
+            except Exception as e:
+                print(f"Similarity Cache Error: {e}")
+                return None
+            if not self._entries:
+                return None
+
+            request_key = self._request_key(user_input)
+            candidates = np.array([entry[1] == request_key for entry in self._entries])
+            if not candidates.any():
+                return None
+
+            query_indices, query_weights = _hash_features(topic_features(user_input.topic), self.dimensions)
+            if not len(query_indices):
+                return None
+
+            # IDF over the indexed topics, so generic words like "impact" count less;
+            # features no indexed topic has are neutral rather than boosted
+            df = self._df
+            idf = np.where(df == 0, 1.0, np.log((1.0 + len(self._entries)) / (1.0 + df)) + 1.0)
+            query = np.zeros(self.dimensions, dtype=np.float32)
+            query[query_indices] = query_weights * idf[query_indices]
+
+            # Candidate rows laid end to end; reduceat sums each row's segment
+            rows = [row for row, c in zip(self._rows, candidates) if c]
+            indices = np.concatenate([row[0] for row in rows])
+            weights = np.concatenate([row[1] for row in rows]) * idf[indices]
+            starts = np.cumsum([0] + [len(row[0]) for row in rows[:-1]])
+
+            dots = np.add.reduceat(weights * query[indices], starts)
+            norms = np.sqrt(np.add.reduceat(weights * weights, starts)) * np.linalg.norm(query)
+            scores = dots / np.where(norms == 0, 1.0, norms)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            job_id, _, topic = [e for e, c in zip(self._entries, candidates) if c][best]
+            return SimilarMatch(job_id=job_id, topic=topic, similarity=float(scores[best]))
+
+    def forget(self, job_id: str):
+        """
+        Drop a generation from the index (e.g. after it was purged)
+
+        Args:
+            job_id: Job ID of the generation
+        """
+        with self._lock:
+            for i, entry in enumerate(self._entries):
+                if entry[0] == job_id:
+                    self._df[self._rows[i][0]] -= 1
+                    del self._entries[i]
+                    del self._rows[i]
+                    return
@@ -0,0 +1,52 @@
+"""
+Tests for the per-section rendering of results
+"""
+
+from data_models import GenerationResult
+from ui.content_renderer import attach_definitions, render_markdown_html, split_definitions, split_sections
+
+
+DOCUMENT = """# Title
+
+Intro with a note.[^1]
+
+## Methods
+
+See the [survey][s] and another note.[^2]
+
+## References
+
+[^1]: First note,
+    continued on an indented line.
+[^2]: Second note.
+[s]: https://example.com/survey
+"""
+
+
+def test_definitions_move_to_the_sections_that_use_them():
+    intro, methods, references = split_sections(GenerationResult(content=DOCUMENT, model="m"))
+    assert "[^1]: First note,\n    continued on an indented line." in intro
+    assert "[^2]" not in intro
+    assert "[^2]: Second note." in methods and "[s]: https://example.com/survey" in methods
+    assert "[^1]:" not in methods
+    assert references.strip() == "## References"
+
+
+def test_footnote_defined_at_the_end_renders_in_its_section():
+    intro, methods, _ = split_sections(GenerationResult(content=DOCUMENT, model="m"))
+    html = render_markdown_html(intro, "s0-")
+    assert "[^1]" not in html
+    assert "continued on an indented line" in html
+    assert 'id="s0-fn1"' in html
+
+    html = render_markdown_html(methods, "s1-")
+    assert 'href="https://example.com/survey"' in html
+    assert "[s]" not in html
+
+
+def test_attach_definitions_skips_unused_and_duplicates():
+    body, definitions = split_definitions("Text.[^a]\n\n[^a]: Note.\n[^b]: Unused.\n")
+    assert body.strip() == "Text.[^a]"
+    assert attach_definitions(body, definitions + definitions).count("[^a]: Note.") == 1
+    assert "Unused" not in attach_definitions(body, definitions)
+    assert attach_definitions("No notes.", definitions) == "No notes."
@@ -0,0 +1,108 @@
+"""
+Tests for the local corpus index
+"""
+
+import os
+
+import pytest
+
+from retrieval.corpus_index import CorpusIndex, format_citation, parse_bibtex
+
+
+BIBTEX = """
+@article{shor1997,
+  author = {Peter W. Shor},
+  title = {Polynomial-Time Algorithms for {Prime} Factorization},
+  journal = "SIAM Journal on Computing",
+  year = 1997,
+  abstract = {Quantum computers factor integers efficiently.}
+}
+
+@book{nielsen2010, author={Michael Nielsen and Isaac Chuang}, title={Quantum Computation}, year={2010}}
+"""
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    return str(tmp_path / "corpus")
+
+
+@pytest.fixture
+def index(tmp_path, corpus):
+    os.makedirs(corpus, exist_ok=True)
+    return CorpusIndex(corpus_dir=corpus, index_dir=str(tmp_path / "index"))
+
+
+def test_parse_bibtex_reads_braced_quoted_and_bare_values():
+    first, second = parse_bibtex(BIBTEX)
+    assert first["type"] == "article"
+    assert first["key"] == "shor1997"
+    assert first["title"] == "Polynomial-Time Algorithms for Prime Factorization"
+    assert first["journal"] == "SIAM Journal on Computing"
+    assert first["year"] == "1997"
+    assert second["key"] == "nielsen2010"
+    assert second["author"] == "Michael Nielsen and Isaac Chuang"
+
+
+def test_format_citation():
+    first, second = parse_bibtex(BIBTEX)
+    assert format_citation(first) == (
+        "Peter W. Shor (1997). Polynomial-Time Algorithms for Prime Factorization. SIAM Journal on Computing."
+    )
+    assert format_citation(second).startswith("Michael Nielsen and Isaac Chuang (2010)")
+
+
+def test_search_ranks_relevant_passages_first(index, corpus):
+    write(os.path.join(corpus, "quantum.md"), "# Quantum Notes\n\nQuantum computers threaten RSA encryption.\n")
+    write(os.path.join(corpus, "climate.md"), "# Climate\n\nRising sea levels and carbon emissions.\n")
+    write(os.path.join(corpus, "refs.bib"), BIBTEX)
+    assert index.refresh(force=True) == 3
+
+    results = index.search("quantum encryption")
+    assert results[0].citation == "Quantum Notes"
+    assert results[0].source == "quantum.md"
+    assert "climate.md" not in [r.source for r in results]
+    assert results == sorted(results, key=lambda r: -r.score)
+    assert index.search("photosynthesis") == []
+
+
+def test_refresh_reindexes_only_changes(index, corpus):
+    path = os.path.join(corpus, "notes.md")
+    write(path, "# Notes\n\nQuantum computing.\n")
+    assert index.refresh(force=True) == 1
+    assert index.refresh(force=True) == 0
+
+    write(path, "# Notes\n\nPhotosynthesis in plants, a longer text.\n")
+    assert index.refresh(force=True) == 1
+    assert index.search("quantum") == []
+    assert index.search("photosynthesis")[0].source == "notes.md"
+
+    os.remove(path)
+    assert index.refresh(force=True) == 1
+    assert index.search("photosynthesis") == []
+
+
+def test_refresh_keeps_only_the_current_generation(index, corpus):
+    write(os.path.join(corpus, "a.md"), "# A\n\nQuantum.\n")
+    index.refresh(force=True)
+    write(os.path.join(corpus, "b.md"), "# B\n\nClimate.\n")
+    index.refresh(force=True)
+
+    generations = [n for n in os.listdir(index.index_dir) if n.startswith("index-")]
+    assert generations == [index._current()]
+
+
+def test_refresh_is_skipped_while_another_process_holds_the_lease(index, corpus):
+    write(os.path.join(corpus, "a.md"), "# A\n\nQuantum.\n")
+    other = CorpusIndex(corpus_dir=corpus, index_dir=index.index_dir)
+    assert other._acquire_lease()
+
+    assert index.refresh(force=True) == 0
+    other._release_lease()
+    assert index.refresh(force=True) == 1
@@ -0,0 +1,180 @@
+"""
+Tests for the agent DAG executor
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agents.base_agent import BaseAgent
+from data_models import EngineeredPrompt
+from shared_store import get_shared_store
+from agents.dag_executor import CACHED, EMPTY, FAILED, SKIPPED, SUCCEEDED, TIMED_OUT, DagExecutor, Node
+
+
+class FnAgent(BaseAgent):
+    """Agent computing its single output with a function of its inputs"""
+
+    def __init__(self, name, inputs, output, fn, optional_inputs=()):
+        super().__init__(name=name)
+        self.inputs = tuple(inputs)
+        self.optional_inputs = tuple(optional_inputs)
+        self.outputs = (output,)
+        self.fn = fn
+        self.calls = 0
+
+    def run(self, **kwargs):
+        self.calls += 1
+        return self.fn(**kwargs)
+
+
+@pytest.fixture
+def pool():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def test_runs_nodes_in_dependency_order(pool):
+    order = []
+
+    def step(name, fn):
+        def run(**kwargs):
+            order.append(name)
+            return fn(**kwargs)
+        return run
+
+    nodes = [
+        Node("c", FnAgent("c", ["a", "b"], "c", step("c", lambda a, b: a + b))),
+        Node("a", FnAgent("a", ["x"], "a", step("a", lambda x: x + 1))),
+        Node("b", FnAgent("b", ["x"], "b", step("b", lambda x: x * 2))),
+    ]
+    run = DagExecutor(nodes, pool=pool).run({"x": 3})
+
+    assert run.values["c"] == 10
+    assert order[-1] == "c"
+    assert all(run.traces[n].status == SUCCEEDED for n in "abc")
+
+
+def test_known_outputs_are_not_recomputed(pool):
+    agent = FnAgent("a", ["x"], "a", lambda x: x + 1)
+    run = DagExecutor([Node("a", agent)], pool=pool).run({"x": 1, "a": 41})
+    assert run.values["a"] == 41
+    assert agent.calls == 0
+
+
+def test_dependents_of_empty_and_failed_nodes_are_skipped(pool):
+    def boom(x):
+        raise RuntimeError("boom")
+
+    nodes = [
+        Node("empty", FnAgent("empty", ["x"], "e", lambda x: None)),
+        Node("after_empty", FnAgent("after_empty", ["e"], "f", lambda e: e)),
+        Node("broken", FnAgent("broken", ["x"], "g", boom)),
+        Node("after_broken", FnAgent("after_broken", ["g"], "h", lambda g: g)),
+        Node("optional", FnAgent("optional", ["x"], "i", lambda x, e: (x, e), optional_inputs=["e"])),
+    ]
+    run = DagExecutor(nodes, pool=pool).run({"x": 1})
+
+    assert run.traces["empty"].status == EMPTY
+    assert run.traces["after_empty"].status == SKIPPED
+    assert run.traces["broken"].status == FAILED
+    assert run.traces["broken"].error == "boom"
+    assert run.traces["after_broken"].status == SKIPPED
+    # Missing optional inputs do not block a node
+    assert run.values["i"] == (1, None)
+
+
+def test_timeout_cancels_the_node(pool):
+    stopped = threading.Event()
+
+    def slow(x, cancel_scope):
+        cancel_scope.on_cancel(stopped.set)
+        stopped.wait(5)
+        return x
+
+    node = Node("slow", FnAgent("slow", ["x"], "y", slow, optional_inputs=["cancel_scope"]), timeout=0.2)
+    started = time.time()
+    run = DagExecutor([node], pool=pool).run({"x": 1})
+
+    assert run.traces["slow"].status == TIMED_OUT
+    assert "y" not in run.values
+    assert stopped.wait(1)
+    assert time.time() - started < 2
+
+
+def test_cacheable_nodes_reuse_results(pool):
+    agent = FnAgent("a", ["x"], "a", lambda x: x + 1)
+    executor = DagExecutor([Node("a", agent, cacheable=True)], pool=pool)
+
+    assert executor.run({"x": 1}).values["a"] == 2
+    run = executor.run({"x": 1})
+    assert run.values["a"] == 2
+    assert run.traces["a"].status == CACHED
+    assert executor.run({"x": 2}).values["a"] == 3
+    assert agent.calls == 2
+
+
+def test_cached_results_are_shared_between_executors(pool):
+    first = FnAgent("a", ["x"], "a", lambda x: x + 1)
+    DagExecutor([Node("a", first, cacheable=True)], pool=pool).run({"x": 1})
+
+    second = FnAgent("a", ["x"], "a", lambda x: x + 1)
+    run = DagExecutor([Node("a", second, cacheable=True)], pool=pool).run({"x": 1})
+    assert run.traces["a"].status == CACHED
+    assert second.calls == 0
+
+
+def test_shared_results_are_stored_as_json(pool):
+    def engineer(topic):
+        return EngineeredPrompt(original_topic=topic, formatted_prompt=f"Write about {topic}", metadata={"n": 1})
+
+    first = DagExecutor([Node("prompt", FnAgent("prompt", ["topic"], "prompt", engineer), cacheable=True)], pool=pool)
+    first.run({"topic": "tides"})
+
+    key = first._cache_key(first.nodes["prompt"], {"topic": "tides"})
+    assert get_shared_store().get_json("dag", key)["prompt"]["type"] == "EngineeredPrompt"
+
+    second = FnAgent("prompt", ["topic"], "prompt", engineer)
+    run = DagExecutor([Node("prompt", second, cacheable=True)], pool=pool).run({"topic": "tides"})
+    assert run.traces["prompt"].status == CACHED
+    assert run.values["prompt"] == engineer("tides")
+    assert second.calls == 0
+
+
+def test_unserializable_outputs_are_not_shared(pool):
+    first = FnAgent("a", ["x"], "a", lambda x: {x})
+    DagExecutor([Node("a", first, cacheable=True)], pool=pool).run({"x": 1})
+
+    second = FnAgent("a", ["x"], "a", lambda x: {x})
+    run = DagExecutor([Node("a", second, cacheable=True)], pool=pool).run({"x": 1})
+    assert run.traces["a"].status == SUCCEEDED
+    assert second.calls == 1
+
+
+def test_fresh_runs_bypass_the_cache(pool):
+    agent = FnAgent("a", ["x"], "a", lambda x: x + agent.calls)
+    executor = DagExecutor([Node("a", agent, cacheable=True)], pool=pool)
+
+    assert executor.run({"x": 1}).values["a"] == 2
+    run = executor.run({"x": 1}, use_cache=False)
+    assert run.traces["a"].status == SUCCEEDED
+    assert run.values["a"] == 3
+    # The fresh result replaces the cached one
+    assert executor.run({"x": 1}).values["a"] == 3
+    assert agent.calls == 2
+
+
+def test_rejects_cycles_and_duplicate_outputs():
+    with pytest.raises(ValueError):
+        DagExecutor([
+            Node("a", FnAgent("a", ["b"], "a", lambda b: b)),
+            Node("b", FnAgent("b", ["a"], "b", lambda a: a)),
+        ])
+    with pytest.raises(ValueError):
+        DagExecutor([
+            Node("a", FnAgent("a", ["x"], "y", lambda x: x)),
+            Node("b", FnAgent("b", ["x"], "y", lambda x: x)),
+        ])
@@ -0,0 +1,60 @@
+"""
+Tests for the delta transport diffing
+"""
+
+from ui.delta_transport import compute_ops
+
+
+def apply(ops, shown):
+    """Apply ops the way the browser component does"""
+    html = dict(shown)
+    order = [item_id for item_id, _ in shown]
+    for op in ops:
+        if op[0] == "put":
+            if op[1] not in html:
+                order.append(op[1])
+            html[op[1]] = op[2]
+        elif op[0] == "del":
+            html.pop(op[1])
+            order.remove(op[1])
+        elif op[0] == "order":
+            order = op[1]
+    return [(item_id, html[item_id]) for item_id in order]
+
+
+def test_first_render_puts_every_item():
+    items = [("0", "<p>a</p>"), ("1", "<p>b</p>")]
+    ops, digests = compute_ops({}, [], items)
+    assert ops == [["put", "0", "<p>a</p>"], ["put", "1", "<p>b</p>"]]
+    assert set(digests) == {"0", "1"}
+
+
+def test_unchanged_items_send_nothing():
+    items = [("0", "<p>a</p>"), ("1", "<p>b</p>")]
+    _, digests = compute_ops({}, [], items)
+    assert compute_ops(digests, ["0", "1"], items)[0] == []
+
+
+def test_appended_item_is_the_only_op():
+    items = [("0", "<p>a</p>")]
+    _, digests = compute_ops({}, [], items)
+    ops, _ = compute_ops(digests, ["0"], items + [("1", "<p>b</p>")])
+    assert ops == [["put", "1", "<p>b</p>"]]
+
+
+def test_changed_and_removed_items():
+    old = [("0", "<p>a</p>"), ("1", "<p>b</p>"), ("2", "<p>c</p>")]
+    _, digests = compute_ops({}, [], old)
+    new = [("0", "<p>a</p>"), ("2", "<p>C</p>")]
+    ops, _ = compute_ops(digests, ["0", "1", "2"], new)
+    assert ops == [["put", "2", "<p>C</p>"], ["del", "1"]]
+    assert apply(ops, old) == new
+
+
+def test_reordering_sends_the_order():
+    old = [("0", "<p>a</p>"), ("1", "<p>b</p>")]
+    _, digests = compute_ops({}, [], old)
+    new = [("new", "<p>n</p>"), ("1", "<p>b</p>"), ("0", "<p>a</p>")]
+    ops, _ = compute_ops(digests, ["0", "1"], new)
+    assert ops[-1] == ["order", ["new", "1", "0"]]
+    assert apply(ops, old) == new
@@ -0,0 +1,96 @@
+"""
+Tests for the searchable generation history
+"""
+
+import pytest
+
+from data_models import GenerationResult
+from history.generation_history import GenerationHistory, _match_expression
+
+
+def make_result(title: str, body: str, topic: str = "topic") -> GenerationResult:
+    return GenerationResult(
+        content=f"# {title}\n\n{body}\n",
+        model="test/model",
+        metadata={"original_topic": topic, "paper_format": "Essay", "writing_style": "Academic", "length": "Short"}
+    )
+
+
+OWNER = "library-a"
+
+
+@pytest.fixture
+def history(tmp_path):
+    return GenerationHistory(str(tmp_path / "history.db"))
+
+
+def add(history, result, owner=OWNER):
+    history.add(result)
+    history.keep(owner, result.result_id)
+
+
+def test_match_expression_quotes_words_and_prefixes_the_last():
+    assert _match_expression("quantum crypto") == '"quantum" "crypto"*'
+    # FTS5 operators and quotes in user input are not interpreted
+    assert _match_expression('AND "x" OR -y*') == '"AND" "x" "OR" "y"*'
+    assert _match_expression("  !? ") is None
+
+
+def test_search_finds_title_topic_and_content(history):
+    add(history, make_result("Quantum Computing", "Qubits and superposition.", topic="quantum"))
+    add(history, make_result("Climate Policy", "Carbon taxes reduce emissions."))
+
+    assert [e.title for e in history.page(OWNER, "quantum")] == ["Quantum Computing"]
+    assert [e.title for e in history.page(OWNER, "carbon")] == ["Climate Policy"]
+    # Prefix match while typing, porter stemming for whole words
+    assert history.count(OWNER, "superpos") == 1
+    assert history.count(OWNER, "emission") == 1
+    assert history.count(OWNER, "") == 2
+
+
+def test_search_returns_snippets(history):
+    add(history, make_result("Climate Policy", "Carbon taxes reduce emissions."))
+    entry = history.page(OWNER, "carbon")[0]
+    assert "**Carbon**" in entry.snippet
+
+
+def test_adding_twice_is_a_no_op(history):
+    result = make_result("Quantum Computing", "Qubits.")
+    add(history, result)
+    add(history, result)
+    assert history.count(OWNER) == 1
+    assert history.count(OWNER, "qubits") == 1
+
+
+def test_delete_removes_from_the_index(history):
+    result = make_result("Quantum Computing", "Qubits.")
+    add(history, result)
+    history.delete(result.result_id)
+
+    assert history.count(OWNER) == 0
+    assert history.count(OWNER, "qubits") == 0
+    assert history.get(OWNER, result.result_id) is None
+
+
+def test_get_round_trips_the_result(history):
+    result = make_result("Quantum Computing", "Qubits.")
+    add(history, result)
+    loaded = history.get(OWNER, result.result_id)
+    assert loaded.content == result.content
+    assert loaded.metadata == result.metadata
+    assert loaded.model == result.model
+
+
+def test_libraries_only_see_their_own_documents(history):
+    mine = make_result("Quantum Computing", "Qubits.")
+    theirs = make_result("Quantum Sensing", "Qubits as sensors.")
+    add(history, mine)
+    add(history, theirs, owner="library-b")
+
+    assert [e.title for e in history.page(OWNER)] == ["Quantum Computing"]
+    assert history.count(OWNER, "qubits") == 1
+    assert history.get(OWNER, theirs.result_id) is None
+    # A shared generation appears in every library that keeps it
+    history.keep("library-b", mine.result_id)
+    assert history.count("library-b") == 2
+    assert history.get("library-b", mine.result_id).content == mine.content
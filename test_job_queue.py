@@ -0,0 +1,128 @@
+"""
+Tests for the durable job queue
+"""
+
+import subprocess
+import sys
+import time
+from contextlib import closing
+
+from jobs.job_queue import DONE, QUEUED, RUNNING, JobQueue
+
+
+PAYLOAD = {"topic": "Quantum computing"}
+
+
+def make_queue(tmp_path) -> JobQueue:
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_submit_deduplicates_active_jobs(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.submit("key", PAYLOAD)
+    assert queue.submit("key", PAYLOAD) == first
+    assert queue.submit("other", PAYLOAD) != first
+
+
+def test_submit_after_completion_creates_new_job(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.submit("key", PAYLOAD)
+    queue.claim()
+    queue.complete(first, {"content": "done"})
+    assert queue.submit("key", PAYLOAD) != first
+
+
+def test_claim_takes_oldest_queued_job_once(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.submit("a", PAYLOAD)
+    second = queue.submit("b", PAYLOAD)
+
+    job = queue.claim()
+    assert job.id == first
+    assert job.status == RUNNING
+    assert job.payload == PAYLOAD
+    assert queue.claim().id == second
+    assert queue.claim() is None
+
+
+def test_checkpoint_merges_data(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("key", PAYLOAD)
+    queue.checkpoint(job_id, "prompt", {"engineered_prompt": "p"})
+    queue.checkpoint(job_id, "research", {"partial_content": "c"})
+
+    job = queue.get(job_id)
+    assert job.stage == "research"
+    assert job.checkpoint == {"engineered_prompt": "p", "partial_content": "c"}
+
+
+def test_recover_requeues_jobs_of_dead_workers(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("key", PAYLOAD)
+    queue.claim()
+    assert queue.recover() == 0  # this process is alive
+
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    with closing(queue._connect()) as conn:
+        conn.execute("UPDATE jobs SET worker_pid = ?, worker_token = 'old' WHERE id = ?", (dead.pid, job_id))
+
+    assert queue.recover() == 1
+    job = queue.get(job_id)
+    assert job.status == QUEUED
+    assert job.worker_pid is None
+    assert queue.claim().id == job_id
+
+
+def test_recover_requeues_jobs_of_a_previous_process_with_our_pid(tmp_path):
+    # After a container restart the new process often gets the same PID
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("key", PAYLOAD)
+    queue.claim()
+    with closing(queue._connect()) as conn:
+        conn.execute("UPDATE jobs SET worker_token = 'previous boot' WHERE id = ?", (job_id,))
+
+    assert queue.recover() == 1
+    assert queue.get(job_id).status == QUEUED
+
+
+def test_recover_requeues_stale_jobs_of_live_processes(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("key", PAYLOAD)
+    queue.claim()
+    with closing(queue._connect()) as conn:
+        conn.execute(
+            "UPDATE jobs SET worker_pid = 1, worker_token = 'other', updated_at = ? WHERE id = ?",
+            (time.time() - 600, job_id)
+        )
+    assert queue.recover(stale_after=60) == 1
+
+    queue.claim()
+    with closing(queue._connect()) as conn:
+        conn.execute("UPDATE jobs SET worker_pid = 1, worker_token = 'other' WHERE id = ?", (job_id,))
+    assert queue.recover(stale_after=60) == 0  # recently updated: still being worked on
+
+
+def test_heartbeat_keeps_own_jobs_fresh(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("key", PAYLOAD)
+    queue.claim()
+    with closing(queue._connect()) as conn:
+        conn.execute("UPDATE jobs SET updated_at = 0 WHERE id = ?", (job_id,))
+    queue.heartbeat()
+    assert queue.get(job_id).updated_at > time.time() - 60
+    assert queue.recover(stale_after=60) == 0
+
+
+def test_completed_lists_done_jobs_newest_first(tmp_path):
+    queue = make_queue(tmp_path)
+    ids = [queue.submit(str(i), PAYLOAD) for i in range(3)]
+    for job_id in ids:
+        queue.claim()
+        queue.complete(job_id, {})
+
+    jobs = queue.completed()
+    assert [job.id for job in jobs] == ids[::-1]
+    assert all(job.status == DONE for job in jobs)
+    # Inclusive, so jobs finishing in the same instant are not skipped
+    assert jobs[0].id in [job.id for job in queue.completed(since=jobs[0].updated_at)]
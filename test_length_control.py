@@ -0,0 +1,169 @@
+"""
+Tests for the length control helpers of Agent 2
+"""
+
+from agents.agent2_research import (
+    ReasoningFilter, ResearchGeneratorAgent, WordCounter, join_continuation, length_target,
+    strip_reasoning, trim_to_length
+)
+from config import Config
+from data_models import EngineeredPrompt, GenerationResult, TokenUsage
+
+
+def paragraph(words: int, word: str = "word") -> str:
+    return " ".join([word] * (words - 1)) + " end."
+
+
+def test_word_counter_counts_words_split_across_chunks():
+    counter = WordCounter("Hello wor")
+    assert counter.count == 2
+    assert counter.feed("ld and ") == 3
+    assert counter.feed("") == 3
+    assert counter.feed("more\ntext") == 5
+    assert WordCounter("a b c").count == len("a b c".split())
+
+
+def test_length_target_uses_the_prompt_metadata():
+    option = Config.LENGTH_OPTIONS[0]
+    prompt = EngineeredPrompt(original_topic="t", formatted_prompt="p", metadata={"length": option})
+    assert length_target(prompt) == Config.LENGTH_TARGETS[option]
+    assert length_target(None) is None
+    assert length_target(EngineeredPrompt("t", "p", {"length": "unknown"})) is None
+
+
+def test_trim_removes_a_cut_off_paragraph():
+    # The stream stopped at the word limit, in the middle of a sentence
+    text = "# Title\n\n" + paragraph(10) + "\n\nThe stream stopped in the"
+    assert trim_to_length(text, 100) == "# Title\n\n" + paragraph(10)
+
+
+def test_trim_cuts_at_a_paragraph_boundary():
+    text = "\n\n".join([paragraph(30), paragraph(30, "second"), paragraph(30, "third")])
+    trimmed = trim_to_length(text, 70, min_words=40)
+    assert trimmed == "\n\n".join([paragraph(30), paragraph(30, "second")])
+
+
+def test_trim_falls_back_to_a_sentence_boundary():
+    text = paragraph(30) + " " + paragraph(30, "more") + " " + paragraph(30, "last")
+    trimmed = trim_to_length(text, 70, min_words=40)
+    assert trimmed.endswith("end.")
+    assert len(trimmed.split()) == 60
+
+
+def test_trim_drops_a_heading_without_body():
+    text = paragraph(30) + "\n\n## Next Section\n\n" + paragraph(30, "body")
+    assert trim_to_length(text, 40) == paragraph(30)
+
+
+def test_join_continuation_removes_the_repeated_ending():
+    text = "First paragraph.\n\nThe quantum computer uses qubits to"
+    part = "The quantum computer uses qubits to factor integers."
+    assert join_continuation(text, part) == "First paragraph.\n\nThe quantum computer uses qubits to factor integers."
+
+
+def test_join_continuation_separates_new_paragraphs():
+    assert join_continuation("Complete sentence.", "## Next") == "Complete sentence.\n\n## Next"
+    assert join_continuation("Cut off in the", "middle of it.") == "Cut off in the middle of it."
+    assert join_continuation("Ends with space ", "  next") == "Ends with space next"
+
+
+class FakeStream:
+    """CompletionStream stand-in yielding fixed chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.parts = []
+        self.cancelled = False
+        self.callbacks = []
+        self.usage = TokenUsage()
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.cancelled:
+                break
+            self.parts.append(chunk)
+            yield chunk
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def cancel(self):
+        self.cancelled = True
+        for callback in self.callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        self.callbacks.append(callback)
+
+    def to_result(self):
+        return GenerationResult(content=self.text, model="m", usage=self.usage, timings={"api": 0.0})
+
+
+class FakeClient:
+    """API client whose continuations are counted, never needed here"""
+
+    def __init__(self):
+        self.continuations = 0
+
+    def stream_completion(self, prompt, system_prompt=None):
+        self.continuations += 1
+        return FakeStream([])
+
+
+def reasoning_stream(reasoning_words: int, document: str) -> FakeStream:
+    """Chunks of a thinking model: reasoning first, tags split across chunks"""
+    text = "<think>" + paragraph(reasoning_words, "hmm") + "</think>\n\n" + document
+    return FakeStream([text[i:i + 7] for i in range(0, len(text), 7)])
+
+
+def short_prompt() -> EngineeredPrompt:
+    return EngineeredPrompt("t", "p", {"length": "Short (500 words)"})
+
+
+def test_reasoning_is_not_counted_towards_the_length():
+    low, high = Config.LENGTH_TARGETS["Short (500 words)"]
+    document = "# Title\n\n" + "\n\n".join(paragraph(50) for _ in range((low + 100) // 50))
+    client = FakeClient()
+    result = ResearchGeneratorAgent(client).finish(reasoning_stream(high + 200, document), None, short_prompt())
+
+    assert result.content == document
+    assert client.continuations == 0
+    assert result.metadata["length_control"]["trimmed"] is False
+
+
+def test_trimming_never_leaves_reasoning_behind():
+    low, high = Config.LENGTH_TARGETS["Short (500 words)"]
+    document = "# Title\n\n" + "\n\n".join(paragraph(50) for _ in range(high // 50 + 4))
+    result = ResearchGeneratorAgent(FakeClient()).finish(reasoning_stream(300, document), None, short_prompt())
+
+    assert "<think>" not in result.content and "hmm" not in result.content
+    assert low <= len(result.content.split()) - 2 <= high
+    assert result.metadata["length_control"]["trimmed"] is True
+
+
+def test_reasoning_filter_handles_tags_split_across_chunks():
+    reasoning = ReasoningFilter()
+    chunks = ["Intro <thi", "nk>secret</th", "ink> visible <", "b>"]
+    assert "".join(reasoning.feed(c) for c in chunks) + reasoning.flush() == "Intro  visible <b>"
+    assert strip_reasoning("<think>unfinished reasoning") == ""
+
+
+def test_cancelling_the_document_closes_its_continuation():
+    origin = FakeStream(["# Title\n\nToo short."])
+
+    class CancellingStream(FakeStream):
+        """Continuation during which the document gets cancelled"""
+
+        def __iter__(self):
+            yield "More text "
+            origin.cancel()  # e.g. the speculative run is discarded from another thread
+            assert self.cancelled  # closed right away, not at the next chunk
+            yield "never read"
+
+    continuation = CancellingStream([])
+    client = FakeClient()
+    client.stream_completion = lambda prompt, system_prompt=None: continuation
+
+    assert ResearchGeneratorAgent(client).finish(origin, None, short_prompt()) is None
+    assert continuation.cancelled
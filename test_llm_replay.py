@@ -0,0 +1,76 @@
+"""
+Tests for recording and replaying LLM calls
+"""
+
+import json
+
+import httpx
+from openai import OpenAI
+
+from llm_replay import Cassette, RecordingTransport, ReplayTransport, request_key
+
+
+URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+def sse(*texts: str) -> bytes:
+    """Streamed chat completion body with one chunk per text"""
+    events = [
+        {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": "m",
+         "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]}
+        for text in texts
+    ]
+    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+    return body.encode("utf-8")
+
+
+def provider(request: httpx.Request) -> httpx.Response:
+    """Fake provider streaming the same non-ASCII answer to every request"""
+    return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=sse("Hello", " wörld"))
+
+
+def client(transport: httpx.BaseTransport) -> OpenAI:
+    return OpenAI(api_key="test", base_url="https://openrouter.ai/api/v1",
+                  http_client=httpx.Client(transport=transport), max_retries=0)
+
+
+def stream_text(openai_client: OpenAI, prompt: str) -> str:
+    stream = openai_client.chat.completions.create(
+        model="m", messages=[{"role": "user", "content": prompt}], stream=True
+    )
+    return "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+
+
+def test_request_key_ignores_headers_and_key_order():
+    first = httpx.Request("POST", URL, json={"a": 1, "b": 2}, headers={"Authorization": "Bearer x"})
+    second = httpx.Request("POST", URL, content=b'{"b": 2, "a": 1}')
+    assert request_key(first) == request_key(second)
+    assert request_key(first) != request_key(httpx.Request("POST", URL, json={"a": 2, "b": 2}))
+
+
+def test_record_then_replay_round_trip(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    recorder = RecordingTransport(Cassette(path))
+    recorder._inner = httpx.MockTransport(provider)
+    assert stream_text(client(recorder), "hi") == "Hello wörld"
+    assert len(Cassette(path)) == 1
+
+    # Replayed from the file alone, without the provider
+    replayed = client(ReplayTransport(Cassette(path), time_scale=0))
+    assert stream_text(replayed, "hi") == "Hello wörld"
+
+
+def test_identical_requests_replay_in_recording_order(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"))
+    for text in ("first", "second"):
+        cassette.append({"key": "k", "status": 200, "content_type": "text/plain", "latency": 0, "chunks": [[0, text]]})
+
+    assert [cassette.next("k")["chunks"][0][1] for _ in range(3)] == ["first", "second", "second"]
+    assert cassette.next("missing") is None
+
+
+def test_unrecorded_requests_fail_without_network(tmp_path):
+    transport = ReplayTransport(Cassette(str(tmp_path / "empty.jsonl")), time_scale=0)
+    response = httpx.Client(transport=transport).post(URL, json={"model": "m"})
+    assert response.status_code == 404
+    assert "No recorded response" in response.json()["error"]["message"]
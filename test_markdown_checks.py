@@ -0,0 +1,29 @@
+"""
+Tests for the local Markdown checks
+"""
+
+from markdown_checks import check_markdown, find_issues
+
+
+def test_currency_is_not_math():
+    assert find_issues("The license costs $5 per seat for the my_app tier.") == []
+    assert find_issues("Revenue grew from $3 million to $5 million in Q_1.") == []
+    assert find_issues("Prices in $ and € for snake_case ids.") == []
+
+
+def test_unclosed_inline_math_is_reported_but_not_blocking():
+    issues = find_issues(r"The energy $E = mc^2 is famous.")
+    assert [issue.message for issue in issues] == ["Unclosed $ inline math"]
+    assert not issues[0].blocking
+
+
+def test_latex_errors_inside_math_are_blocking():
+    issues = find_issues(r"Water is $\ce{H2O}$ and $\frac{1}{2$.")
+    assert [issue.message for issue in issues] == ["Unsupported macro \\ce", "Unbalanced braces"]
+    assert all(issue.blocking for issue in issues)
+
+
+def test_auto_fix_rewrites_delimiters_and_macros():
+    report = check_markdown(r"#Title" + "\n" + r"Let \(x \in \R\) hold.")
+    assert report.content == "# Title\n" + r"Let $x \in \mathbb{R}$ hold."
+    assert report.ok
@@ -0,0 +1,24 @@
+"""
+Tests for the warm PDF rendering service helpers
+"""
+
+import os
+
+from export import pdf_service
+
+
+def test_worker_dir_is_cleared_between_documents(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_service, "_worker_dir", str(tmp_path))
+    for name in ("document.aux", "document.toc", "document.pdf"):
+        (tmp_path / name).write_text("previous document")
+    (tmp_path / "_minted-document").mkdir()
+
+    pdf_service._clear_worker_dir()
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_first_error_reads_the_tex_error_line():
+    log = b"This is XeTeX\n! Undefined control sequence.\nl.12 \\foo\n! Emergency stop.\n"
+    assert pdf_service._first_error(log) == "Undefined control sequence."
+    assert pdf_service._first_error(b"Output written on document.pdf\n") is None
@@ -0,0 +1,87 @@
+"""
+Tests for the shared rate limiter
+"""
+
+import math
+
+import pytest
+
+import rate_limiter
+from config import Config
+from rate_limiter import RateLimiter, limit_key
+
+
+MODEL = "some/model:free"
+
+
+@pytest.fixture
+def limiter(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "RATE_LIMITS", {"free": (3, 5)})
+    return RateLimiter(str(tmp_path / "rate_limits.db"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the limiter"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: now[0])
+    return now
+
+
+def test_free_models_share_one_budget():
+    assert limit_key("a/b:free") == limit_key("c/d:free") == "free"
+    assert limit_key("a/b") == "a/b"
+
+
+def test_unlimited_models_are_always_admitted(limiter):
+    assert limiter.try_acquire("paid/model") == (True, 0.0)
+    assert not limiter.status("paid/model").limited
+
+
+def test_bucket_empties_and_refills(limiter, clock):
+    for _ in range(3):
+        assert limiter.try_acquire(MODEL)[0]
+
+    acquired, retry_after = limiter.try_acquire(MODEL)
+    assert not acquired
+    assert retry_after == pytest.approx(20.0)  # 3 per minute: one token every 20 s
+
+    clock[0] += 20.0
+    assert limiter.try_acquire(MODEL)[0]
+
+
+def test_daily_quota_is_counted_across_refills(limiter, clock):
+    for _ in range(5):
+        assert limiter.try_acquire(MODEL)[0]
+        clock[0] += 60.0
+
+    acquired, retry_after = limiter.try_acquire(MODEL)
+    assert not acquired
+    assert math.isinf(retry_after)
+
+    status = limiter.status(MODEL)
+    assert status.day_remaining == 0
+    assert status.per_day == 5
+
+
+def test_status_does_not_consume(limiter, clock):
+    limiter.try_acquire(MODEL)
+    for _ in range(3):
+        status = limiter.status(MODEL)
+    assert status.minute_remaining == 2
+    assert status.day_remaining == 4
+
+
+def test_backoff_drains_the_bucket(limiter, clock):
+    limiter.backoff(MODEL, seconds=60)
+    acquired, retry_after = limiter.try_acquire(MODEL)
+    assert not acquired
+    assert retry_after == pytest.approx(80.0)  # 60 s backoff plus one token
+
+    clock[0] += 80.0
+    assert limiter.try_acquire(MODEL)[0]
+
+
+def test_acquire_sheds_requests_that_would_wait_too_long(limiter, clock):
+    limiter.backoff(MODEL, seconds=60)
+    assert not limiter.acquire(MODEL, max_wait=1)
@@ -0,0 +1,72 @@
+"""
+Tests for the shared local store
+"""
+
+import pytest
+
+import shared_store
+from config import Config
+from shared_store import SharedStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SHARED_STORE_LIMITS", {"small": 2, "other": 2})
+    return SharedStore(str(tmp_path / "store.db"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the store"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(shared_store.time, "time", lambda: now[0])
+    return now
+
+
+def test_values_are_namespaced(store):
+    store.set("a", "key", b"1")
+    store.set("b", "key", b"2")
+    assert store.get("a", "key") == b"1"
+    assert store.get("b", "key") == b"2"
+    store.delete("a", "key")
+    assert store.get("a", "key") is None
+    assert store.get_json("b", "missing") is None
+
+
+def test_json_round_trip(store):
+    store.set_json("chat", "session", {"messages": [1, 2]})
+    assert store.get_json("chat", "session") == {"messages": [1, 2]}
+
+
+def test_entries_expire(store, clock):
+    store.set("a", "key", b"1", ttl=10)
+    clock[0] += 9
+    assert store.get("a", "key") == b"1"
+    clock[0] += 2
+    assert store.get("a", "key") is None
+    assert store.evict("a") == 1
+
+
+def test_evict_keeps_the_most_recently_used(store, clock):
+    for key in ("old", "mid", "new"):
+        store.set("small", key, b"x")
+        clock[0] += Config.SHARED_STORE_TOUCH_INTERVAL + 1
+    store.get("small", "old")  # now the most recently used
+
+    assert store.evict("small") == 1
+    assert store.get("small", "mid") is None
+    assert store.get("small", "old") == b"x"
+    assert store.get("small", "new") == b"x"
+
+
+def test_writes_trigger_eviction_per_namespace(store, clock, monkeypatch):
+    monkeypatch.setattr(Config, "SHARED_STORE_EVICT_EVERY", 3)
+    # Interleaved writes: each namespace still gets its own eviction pass
+    for i in range(3):
+        for namespace in ("small", "other"):
+            store.set(namespace, str(i), b"x")
+            clock[0] += 1
+
+    for namespace in ("small", "other"):
+        assert store.get(namespace, "0") is None
+        assert store.get(namespace, "2") == b"x"
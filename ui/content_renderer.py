@@ -0,0 +1,194 @@
+"""
+Pre-rendered HTML for the results pane
+Markdown is converted once per section and cached by content hash,
+in this process and in the store shared with the other worker processes
+"""
+
+import hashlib
+import html
+import re
+from typing import List, Optional, Tuple
+
+import streamlit as st
+
+from config import Config
+from utils import load_pandoc
+from shared_store import get_shared_store
+from data_models import GenerationResult
+from ui.delta_transport import render_delta_view
+
+
+# Footnote ([^1]: ...) and reference link ([id]: url) definitions
+DEFINITION_START = re.compile(r'^ {0,3}\[([^\]]+)\]:')
+INDENTED_LINE = re.compile(r'^(?: {4}|\t)\S')
+
+
+@st.cache_data(max_entries=Config.RENDER_CACHE_SIZE, show_spinner=False)
+def render_markdown_html(markdown_text: str, id_prefix: str = "") -> Optional[str]:
+    """
+    Convert Markdown to sanitized HTML with pre-rendered math
+
+    Raw HTML in the source is disabled, so it is escaped rather than
+    passed through; math is emitted as MathML and needs no client script.
+
+    Args:
+        markdown_text: Markdown text
+        id_prefix: Prefix of element IDs, so footnote anchors of fragments
+            shown on one page do not collide
+
+    Returns:
+        HTML fragment, or None if conversion failed
+    """
+    store = get_shared_store()
+    key = hashlib.sha256(f"{id_prefix}\0{markdown_text}".encode("utf-8")).hexdigest()
+    cached = store.get("render", key)
+    if cached is not None:
+        return cached.decode("utf-8")
+
+    try:
+        html = load_pandoc().convert_text(
+            markdown_text,
+            to="html5",
+            format="markdown-raw_html-raw_attribute-blank_before_header",
+            extra_args=["--mathml"] + ([f"--id-prefix={id_prefix}"] if id_prefix else [])
+        )
+    except Exception as e:
+        print(f"[Render Error] {e}")
+        return None
+    store.set("render", key, html.encode("utf-8"))
+    return html
+
+
+def split_definitions(markdown_text: str) -> Tuple[str, List[str]]:
+    """
+    Take footnote and reference link definitions out of Markdown
+
+    Args:
+        markdown_text: Markdown text
+
+    Returns:
+        (text without the definitions, each definition with its indented continuation lines)
+    """
+    lines = markdown_text.split("\n")
+    body, definitions = [], []
+    i = 0
+    while i < len(lines):
+        if not DEFINITION_START.match(lines[i]):
+            body.append(lines[i])
+            i += 1
+            continue
+        block = [lines[i]]
+        i += 1
+        while i < len(lines) and (
+            INDENTED_LINE.match(lines[i])
+            or (not lines[i].strip() and i + 1 < len(lines) and INDENTED_LINE.match(lines[i + 1]))
+        ):
+            block.append(lines[i])
+            i += 1
+        definitions.append("\n".join(block))
+    return "\n".join(body), definitions
+
+
+def attach_definitions(markdown_text: str, definitions: List[str]) -> str:
+    """
+    Append the definitions a piece of Markdown refers to
+
+    Args:
+        markdown_text: Markdown text without definitions
+        definitions: Definitions from anywhere in the document
+
+    Returns:
+        Text that renders its footnotes and reference links on its own
+    """
+    lowered = markdown_text.lower()
+    used = [
+        d for d in dict.fromkeys(definitions)
+        if f"[{DEFINITION_START.match(d).group(1).lower()}]" in lowered
+    ]
+    if not used:
+        return markdown_text
+    return markdown_text.rstrip("\n") + "\n\n" + "\n\n".join(used) + "\n"
+
+
+def split_sections(result: GenerationResult) -> List[str]:
+    """
+    Split the document at its top-level headings
+
+    Footnote and link definitions (usually all in the last section) are
+    moved to the sections that use them, since each section is rendered
+    on its own.
+
+    Args:
+        result: Generated research result
+
+    Returns:
+        Markdown text of each section, in document order
+    """
+    boundaries = [
+        s.start for s in result.sections
+        if s.level <= Config.RESULTS_PAGE_HEADING_LEVEL and s.start > 0
+    ]
+    starts = [0] + boundaries
+    ends = boundaries + [len(result.content)]
+    pieces = [split_definitions(result.content[a:b]) for a, b in zip(starts, ends)]
+    definitions = [d for _, found in pieces for d in found]
+    return [attach_definitions(body, definitions) for body, _ in pieces if body.strip()]
+
+
+def split_pages(result: GenerationResult) -> List[List[str]]:
+    """
+    Group the document into pages of top-level sections
+
+    Args:
+        result: Generated research result
+
+    Returns:
+        Markdown sections of each page, in document order
+    """
+    chunks = split_sections(result)
+    per_page = Config.RESULTS_SECTIONS_PER_PAGE
+    return [
+        chunks[i:i + per_page]
+        for i in range(0, len(chunks), per_page)
+    ] or [[result.content]]
+
+
+def display_rendered(result: GenerationResult):
+    """
+    Display a result from cached HTML, one page at a time
+
+    With the delta transport the browser keeps the rendered sections, and
+    only sections that differ from those already shown are sent.
+
+    Args:
+        result: Generated research result
+    """
+    pages = split_pages(result)
+
+    page = 0
+    if len(pages) > 1:
+        page = st.radio(
+            "Page",
+            options=range(len(pages)),
+            format_func=lambda i: f"{i + 1}",
+            horizontal=True,
+            key=f"results_page_{result.result_id}",
+            label_visibility="collapsed"
+        )
+
+    if Config.DELTA_TRANSPORT_ENABLED:
+        items = []
+        for i, section in enumerate(pages[page]):
+            rendered = render_markdown_html(section, f"s{i}-")
+            items.append((str(i), rendered if rendered is not None else f"<pre>{html.escape(section)}</pre>"))
+        render_delta_view("document_view", items, "document")
+        return
+
+    # One definition per note, even when several sections of the page use it
+    body, definitions = split_definitions("".join(pages[page]))
+    markdown_text = attach_definitions(body, definitions)
+    rendered = render_markdown_html(markdown_text)
+    if rendered is None:
+        st.markdown(markdown_text)
+    else:
+        st.html(rendered)
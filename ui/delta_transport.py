@@ -0,0 +1,103 @@
+"""
+Delta transport for the chat and results panes
+A small custom component keeps the rendered items in the browser; each rerun
+sends only the items that were added, changed or removed since the last one
+"""
+
+import hashlib
+import json
+import os
+import zlib
+from typing import Dict, List, Tuple
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from config import Config
+
+
+_delta_view = components.declare_component(
+    "delta_view",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "delta_view")
+)
+
+
+def _digest(html: str) -> str:
+    """Short fingerprint of an item's HTML"""
+    return hashlib.blake2b(html.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def compute_ops(sent: Dict[str, str], order: List[str],
+                items: List[Tuple[str, str]]) -> Tuple[List[list], Dict[str, str]]:
+    """
+    Diff the items against what the browser already has
+
+    Args:
+        sent: Fingerprint of each item the browser holds, by item ID
+        order: Item IDs in the order the browser shows them
+        items: (item ID, HTML) pairs to show, in order
+
+    Returns:
+        (operations, fingerprints of the items): ["put", id, html] and
+        ["del", id] entries, plus ["order", ids] only when the items are
+        not simply the kept ones followed by the new ones
+    """
+    digests = {item_id: _digest(html) for item_id, html in items}
+    ops: List[list] = [
+        ["put", item_id, html] for item_id, html in items if sent.get(item_id) != digests[item_id]
+    ]
+    ops += [["del", item_id] for item_id in order if item_id not in digests]
+
+    # The browser appends items it has not seen before
+    new_order = [item_id for item_id, _ in items]
+    expected = [item_id for item_id in order if item_id in digests]
+    expected += [item_id for item_id in new_order if item_id not in sent]
+    if expected != new_order:
+        ops.append(["order", new_order])
+    return ops, digests
+
+
+def render_delta_view(key: str, items: List[Tuple[str, str]], css_class: str = ""):
+    """
+    Show HTML items, sending the browser only what changed
+
+    The browser acknowledges nothing on success; if its copy does not match
+    the version an update was computed against (e.g. after the iframe was
+    remounted) it asks for a full resync, which costs one extra rerun.
+
+    Args:
+        key: Stable widget key; one view per key
+        items: (item ID, HTML) pairs in display order
+        css_class: Layout class of the view ("chat" or "document")
+    """
+    state_key = f"_delta_view_{key}"
+    state = st.session_state.get(state_key)
+    resync = st.session_state.get(key)
+
+    reset = (
+        state is None
+        or (isinstance(resync, dict) and resync.get("resync") != state["resync"])
+    )
+    if reset:
+        state = {
+            "version": state["version"] if state else 0,
+            "sent": {},
+            "order": [],
+            "resync": resync.get("resync") if isinstance(resync, dict) else None
+        }
+
+    ops, digests = compute_ops(state["sent"], state["order"], items)
+    base = state["version"]
+    if ops or reset:
+        state["version"] += 1
+    state["sent"] = digests
+    state["order"] = [item_id for item_id, _ in items]
+    st.session_state[state_key] = state
+
+    update = {"base": base, "version": state["version"], "reset": reset, "view": css_class}
+    payload = json.dumps(ops, separators=(",", ":")).encode("utf-8")
+    if len(payload) < Config.TRANSPORT_COMPRESS_MIN_BYTES:
+        _delta_view(update=update, ops=ops, key=key, default=None)
+    else:
+        # Bytes arguments travel as binary, without JSON or base64 overhead
+        _delta_view(update=update, z=zlib.compress(payload), key=key, default=None)
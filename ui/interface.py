@@ -4,10 +4,18 @@ Streamlit UI components and interface
 
 import streamlit as st
 from config import Config
-from data_models import UserInput
-from utils import markdown_to_pdf
+from data_models import UserInput, GenerationResult
+from export.export_service import export_service
+from ui.content_renderer import display_rendered, render_markdown_html
+from ui.delta_transport import render_delta_view
+from rate_limiter import QuotaStatus
+from similarity_cache import SimilarMatch
+from history.generation_history import HistoryEntry
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 import os
 import base64
+import html
 
 class UIInterface:
     """Handle Streamlit UI rendering"""
@@ -154,6 +162,108 @@ class UIInterface:
             use_container_width=True
         )
     
+    @staticmethod
+    def render_quota(status: QuotaStatus):
+        """
+        Show the remaining request budget
+        
+        Args:
+            status: Quota status of the generation model
+        """
+        if not status.limited:
+            return
+        st.caption(
+            f"Requests left: {status.minute_remaining}/{status.per_minute} this minute · "
+            f"{status.day_remaining}/{status.per_day} today"
+        )
+    
+    @staticmethod
+    def render_similar_offer(match: SimilarMatch):
+        """
+        Offer an earlier generation for a near-duplicate request
+        
+        Args:
+            match: The most similar earlier generation
+            
+        Returns:
+            "reuse", "fresh", or None while the user has not chosen
+        """
+        box = st.empty()
+        with box.container():
+            st.info(
+                f"📚 A paper on a very similar topic is ready: \"{match.topic}\" "
+                f"({match.similarity:.0%} match)"
+            )
+            col1, col2 = st.columns(2)
+            with col1:
+                reuse = st.button("📄 Open it now", key="similar_reuse", use_container_width=True)
+            with col2:
+                fresh = st.button("🔄 Generate fresh", key="similar_fresh", use_container_width=True)
+        
+        if reuse or fresh:
+            box.empty()
+        return "reuse" if reuse else "fresh" if fresh else None
+    
+    @staticmethod
+    def render_library_search() -> Optional[str]:
+        """
+        Render the library toggle and search box
+        
+        Returns:
+            Search text, or None while the library is closed
+        """
+        if not st.toggle("📚 Browse your library", key="library_open"):
+            return None
+        st.caption("Documents generated or opened from this link. Bookmark it to come back to your library.")
+        return st.text_input(
+            "Search your library",
+            key="library_search",
+            placeholder="Search titles, topics and full text..."
+        )
+    
+    @staticmethod
+    def render_library_page(entries: List[HistoryEntry], page: int, page_count: int) -> Tuple[Optional[str], int]:
+        """
+        Render one page of earlier documents
+        
+        Args:
+            entries: Documents on this page
+            page: Zero-based page number
+            page_count: Total number of pages
+            
+        Returns:
+            Tuple of (result ID the user opened or None, page to show next)
+        """
+        if not entries:
+            st.caption("No documents found.")
+            return None, page
+        
+        opened = None
+        for entry in entries:
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                created = datetime.fromtimestamp(entry.created_at).strftime("%Y-%m-%d %H:%M")
+                st.markdown(f"**{entry.title}**")
+                st.caption(f"{entry.paper_format} · {entry.writing_style} · {entry.length} · {created}")
+                if entry.snippet:
+                    st.caption(" ".join(entry.snippet.split()))
+            with col2:
+                if st.button("Open", key=f"library_open_{entry.result_id}", use_container_width=True):
+                    opened = entry.result_id
+        
+        requested = page
+        if page_count > 1:
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("◀ Newer", key="library_prev", disabled=page == 0, use_container_width=True):
+                    requested = page - 1
+            with col2:
+                st.caption(f"Page {page + 1} of {page_count}")
+            with col3:
+                if st.button("Older ▶", key="library_next", disabled=page >= page_count - 1, use_container_width=True):
+                    requested = page + 1
+        return opened, requested
+    
     @staticmethod
     def show_progress(message: str):
         """
@@ -209,19 +319,80 @@ class UIInterface:
             st.metric("Topic", truncate_text(metadata['original_topic']))
     
     @staticmethod
-    def display_content(research_content: str):
+    def render_chat_messages(messages: List[Dict]):
+        """
+        Render the chat history
+        
+        With the delta transport only messages added since the last rerun
+        are sent to the browser.
+        
+        Args:
+            messages: Chat messages with "role" and "content"
+        """
+        if not Config.DELTA_TRANSPORT_ENABLED:
+            for msg in messages:
+                st.markdown('---')
+                with st.chat_message(msg["role"]):
+                    st.write(msg["content"])
+            return
+        
+        items = []
+        for i, msg in enumerate(messages):
+            body = render_markdown_html(msg["content"]) or f"<pre>{html.escape(msg['content'])}</pre>"
+            label = "You" if msg["role"] == "user" else "ScholarBot"
+            items.append((str(i), f'<div class="{msg["role"]}"><div class="role">{label}</div>{body}</div>'))
+        render_delta_view("chat_view", items, "chat")
+    
+    @staticmethod
+    def display_content(result: GenerationResult):
+        """
+        Display research content from its cached HTML render
+        
+        Args:
+            result: The generated research result
+        """
+        display_rendered(result)
+    
+    @staticmethod
+    def _render_export_buttons(converters: list, futures: list):
         """
-        Display research content
+        Render a download button per converted format, or a placeholder while pending
         
         Args:
-            research_content: The generated research content
+            converters: Export converters
+            futures: Conversion futures, in the same order
         """
-        st.markdown(research_content)
+        columns = st.columns(len(converters))
+        for column, converter, future in zip(columns, converters, futures):
+            with column:
+                if not future.done():
+                    st.button(
+                        f"⏳ Preparing {converter.extension.upper()}…",
+                        key=f"download_btn_{converter.key}",
+                        disabled=True,
+                        use_container_width=True
+                    )
+                    continue
+                data = future.result()
+                if data is None:
+                    st.caption(f"{converter.extension.upper()} export unavailable")
+                    continue
+                st.download_button(
+                    label=converter.label,
+                    data=data,
+                    file_name=f"research_content.{converter.extension}",
+                    mime=converter.mime,
+                    key=f"download_btn_{converter.key}",
+                    use_container_width=True
+                )
     
     @staticmethod
     def render_download_button(research_content: str):
         """
-        Render download button
+        Render download buttons for every export format
+        
+        Cheap formats are converted in the background and cached by
+        content hash; the PDF is only compiled when the user asks for it.
         
         Args:
             research_content: Content to download
@@ -237,17 +408,44 @@ class UIInterface:
         )
         
         st.markdown("### Export Options")
-    
-        pdf_bytes = markdown_to_pdf(research_content)
 
-        st.download_button(
-                label="📄 Download as PDF",
-                data=pdf_bytes,
-                file_name="research_content.pdf",
-                mime="application/pdf"
-        )
-        
-        
-       
+        # Start all cheap conversions at once; the page never waits for them
+        cheap_formats = export_service.formats(expensive=False)
+        futures = [export_service.submit(research_content, c.key) for c in cheap_formats]
+
+        if all(future.done() for future in futures):
+            UIInterface._render_export_buttons(cheap_formats, futures)
+        else:
+            # Only this section reruns until the conversions finish, then the page
+            @st.fragment(run_every=Config.EXPORT_POLL_INTERVAL)
+            def pending_exports():
+                if all(future.done() for future in futures):
+                    st.rerun()
+                UIInterface._render_export_buttons(cheap_formats, futures)
             
-    
+            pending_exports()
+
+        for converter in export_service.formats(expensive=True):
+            data = export_service.get_cached(research_content, converter.key)
+
+            if data is None and export_service.failed(research_content, converter.key):
+                st.caption(f"{converter.extension.upper()} export is unavailable for this document")
+            elif data is None and st.button(
+                f"⚙️ Prepare {converter.extension.upper()}",
+                key=f"prepare_btn_{converter.key}",
+                use_container_width=True
+            ):
+                with st.spinner(f"Compiling {converter.extension.upper()}..."):
+                    data = export_service.convert(research_content, converter.key)
+                if data is None:
+                    UIInterface.show_error(f"❌ {converter.extension.upper()} export failed for this document.")
+
+            if data is not None:
+                st.download_button(
+                    label=converter.label,
+                    data=data,
+                    file_name=f"research_content.{converter.extension}",
+                    mime=converter.mime,
+                    key=f"download_btn_{converter.key}",
+                    use_container_width=True
+                )
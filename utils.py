@@ -2,16 +2,12 @@
 Utility functions for the Research Tool
 """
 
-import regex as re
-from dotenv import load_dotenv
-import streamlit as st
 import os
-import subprocess
-import pypandoc
-import tempfile
+import shutil
+from config import Config
 
-
-os.environ["PATH"] += os.pathsep + r"C:\Program Files\Pandoc"
+# Heavy dependencies (regex, dotenv, streamlit, pypandoc) are imported on
+# first use, so worker processes and CLI runs only load what they need.
 
 
 def remove_think_tags(text: str) -> str:
@@ -24,16 +20,22 @@ def remove_think_tags(text: str) -> str:
     Returns:
         Cleaned text without <think> tags
     """
+    import regex as re
+    
     text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
     return text.strip()
 
 
 def load_environment():
     """Load environment variables from .env file"""
+    from dotenv import load_dotenv
+    
     load_dotenv()
 
 
 def get_api_key() -> str:
+    import streamlit as st
+    
     # Try Streamlit secrets first (production)
     try:
         return st.secrets["OPENROUTER_API_KEY"]
@@ -47,6 +49,24 @@ def get_api_key() -> str:
     return api_key
 
 
+def load_pandoc():
+    """
+    Import pypandoc on first use
+    
+    On Windows, the default Pandoc install directory is added to PATH
+    when pandoc is not already on it.
+    
+    Returns:
+        The pypandoc module
+    """
+    if (os.name == "nt" and shutil.which("pandoc") is None
+            and Config.WINDOWS_PANDOC_DIR not in os.environ["PATH"].split(os.pathsep)):
+        os.environ["PATH"] += os.pathsep + Config.WINDOWS_PANDOC_DIR
+    
+    import pypandoc
+    return pypandoc
+
+
 def truncate_text(text: str, max_length: int = 20) -> str:
     """
     Truncate text to max length with ellipsis
@@ -67,49 +87,18 @@ def markdown_to_pdf(markdown_text: str) -> bytes | None:
     Convert Markdown text to a PDF for Streamlit deployment.
     Handles Greek, Chinese, and math symbols using a Unicode-safe font.
     
+    Rendering happens in the warm PDF service (see export/pdf_service.py).
+    
     Returns:
         PDF file bytes, or None if conversion failed.
     """
-    import tempfile
-    import pypandoc
-    import os
+    from export.pdf_service import DocumentError, render_pdf
 
-    # Pick a single Unicode-safe font known to exist on Streamlit Cloud
-    unicode_font = "Noto Serif"
-
-    tmp_file = None
     try:
-        # Create temporary PDF file
-        tmp_file = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
-        pdf_path = tmp_file.name
-        tmp_file.close()  # close so Pandoc can write
-
-        # Convert Markdown -> PDF
-        pypandoc.convert_text(
-            markdown_text,
-            to="pdf",
-            format="md",
-            outputfile=pdf_path,
-            extra_args=[
-                "--pdf-engine=xelatex",
-                "-V", f"mainfont={unicode_font}",
-                "-V", f"mathfont={unicode_font}"
-            ]
-        )
-
-        # Read PDF bytes
-        with open(pdf_path, "rb") as f:
-            pdf_bytes = f.read()
-
-        return pdf_bytes
-
-    except Exception as e:
-        # Print full exception for debugging
+        pdf_bytes = render_pdf(markdown_text)
+    except DocumentError as e:
         print(f"[PDF Generation Error] {e}")
-        print("➡️ Ensure that .streamlit/packages.sh installs XeLaTeX and texlive fonts")
         return None
-
-    finally:
-        # Clean up temporary file
-        if tmp_file and os.path.exists(pdf_path):
-            os.remove(pdf_path)
+    if pdf_bytes is None:
+        print("➡️ Ensure that .streamlit/packages.sh installs XeLaTeX and texlive fonts")
+    return pdf_bytes